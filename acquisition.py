@@ -0,0 +1,75 @@
+import threading
+
+from participant_demux import ParticipantDemux
+from sample_store import SampleStore
+from serial_reader import SerialReader
+
+
+class AcquisitionEngine:
+    """Coleta simultânea de várias portas seriais, uma thread por porta.
+
+    Todas as portas escrevem no mesmo `SampleStore`, carimbadas com o relógio
+    monotônico dele; o campo `source` indica o índice da porta em `ports` e
+    `participant` o participante, atribuído por um `ParticipantDemux` por porta.
+    `on_messages`, se informado, recebe as linhas de log de cada leitura e é
+    chamado a partir das threads das portas.
+    """
+
+    def __init__(self, ports, binary=False, store=None, on_messages=None, reader_factory=SerialReader, participants=1):
+        self.ports = list(ports)
+        self.binary = binary
+        self.participants = participants
+        self.store = store if store is not None else SampleStore()
+        self.on_messages = on_messages
+        self.reader_factory = reader_factory
+        self.stopped = threading.Event()
+        self.threads = []
+        self.errors = []
+
+    def start(self):
+        self.stopped.clear()
+        self.threads = [
+            threading.Thread(target=self._read_port, args=(source, port), daemon=True)
+            for source, port in enumerate(self.ports)
+        ]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def _read_port(self, source, port):
+        prefix = f"[{port}] " if len(self.ports) > 1 else ""
+        demux = ParticipantDemux(self.participants)
+        try:
+            with self.reader_factory(port, self.binary) as reader:
+                while not self.stopped.is_set():
+                    records = demux.assign(reader.read(), self.store.now())
+                    self.store.append(records, source=source)
+                    if self.on_messages and len(records):
+                        self.on_messages([prefix + message for message in reader.messages(records)])
+        except Exception as e:
+            self.errors.append((port, e))
+
+    def alive(self):
+        return any(thread.is_alive() for thread in self.threads)
+
+    def stop(self):
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join()
+
+    def run_until(self, done, tick=None, interval=0.05):
+        """Coleta até `done()` ser verdadeiro ou todas as portas falharem.
+
+        `tick()` é chamado a cada `interval` segundos na thread que chamou.
+        """
+        self.start()
+        try:
+            while not done() and self.alive():
+                if tick:
+                    tick()
+                self.stopped.wait(interval)
+        finally:
+            self.stop()
+        if tick:
+            tick()
+        return self.store
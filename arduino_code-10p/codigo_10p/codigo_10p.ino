@@ -11,6 +11,34 @@ long lastBeat[10];
 float beatsPerMinute[10];
 int beatAvg[10];
 
+// 1 = quadros binários de 16 bytes (formato em serial_protocol.py), 0 = texto "participante,ir,bpm,avg,gsr"
+#define BINARY_FRAMES 0
+uint16_t frameSeq = 0;
+
+void putU16(byte *dst, uint16_t value) {
+  dst[0] = value & 0xFF;
+  dst[1] = value >> 8;
+}
+
+void sendFrame(byte participant, uint32_t irValue, uint16_t bpm, uint16_t avg, uint16_t gsr) {
+  byte frame[16];
+  frame[0] = 0xAA;
+  frame[1] = 0x55;
+  putU16(frame + 2, frameSeq++);
+  frame[4] = participant;
+  putU16(frame + 5, irValue & 0xFFFF);
+  putU16(frame + 7, irValue >> 16);
+  putU16(frame + 9, bpm);
+  putU16(frame + 11, avg);
+  putU16(frame + 13, gsr);
+  byte checksum = 0;
+  for (byte k = 2; k < 15; k++) {
+    checksum += frame[k];
+  }
+  frame[15] = checksum;
+  Serial.write(frame, sizeof(frame));
+}
+
 void setup() {
   Serial.begin(115200);
 
@@ -47,12 +75,20 @@ void loop() {
         beatAvg[i] /= RATE_SIZE;
       }
     }
+#if BINARY_FRAMES
+    sendFrame(i, irValue, (uint16_t)beatsPerMinute[i], beatAvg[i], GSR);
+#else
+    Serial.print(i);
+    Serial.print(",");
+    Serial.print(irValue);
+    Serial.print(",");
     Serial.print((int)beatsPerMinute[i]);
     Serial.print(",");
     Serial.print(beatAvg[i]);
     Serial.print(",");
     Serial.print(GSR); // GSR
     Serial.println();
+#endif
   }
   delay(50); // Small delay to avoid overwhelming the serial buffer
 }
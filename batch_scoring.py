@@ -0,0 +1,248 @@
+"""Previsão em lote de sessões gravadas, sem interface gráfica.
+
+    python batch_scoring.py sessoes/ [dados/*.csv] [--model trained_model.joblib] [--output previsoes_sessoes.jsonl] [--workers 4]
+
+Cada sessão (.mtv ou CSV) é prevista em um processo do pool, com a mesma
+regra do PredictionThread: o rótulo de cada participante é o mais frequente
+entre as janelas dele. O resultado de cada sessão é acrescentado ao arquivo
+de saída (JSON Lines) assim que fica pronto, com o rótulo, a média das
+probabilidades de cada classe e o número de janelas, da sessão e de cada
+participante. Sessões já previstas com o mesmo modelo (mesmo conteúdo do
+arquivo do modelo) são puladas, de modo que uma execução interrompida
+continua de onde parou e, depois de um novo treino, só o que falta é refeito.
+"""
+import argparse
+import json
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from compiled_forest import MODEL_FILE, load_model, model_file
+from dataset_cache import file_digest
+from features import predict_proba_samples
+from ingestion import expand_entries, load_dataset
+from session_log import EXPORT_CHUNK_SIZE, SESSION_EXTENSION, SessionReader, session_segments
+
+SCORES_FILE = 'previsoes_sessoes.jsonl'
+RAW_COLUMNS = ['beatsPerMinute', 'beatAvg', 'GSR']
+# Com menos sessões pendentes do que isso, a previsão é feita no próprio processo.
+MIN_PARALLEL_SESSIONS = 4
+
+_worker = {}
+
+
+def model_identity(path=MODEL_FILE):
+    """(versão, sha256) do modelo em `path`; o digest do arquivo distingue modelos com a mesma versão."""
+    model = load_model(path)
+    source = path if os.path.exists(path) else model_file(path)
+    return model, getattr(model, 'model_version_', None), file_digest(source)
+
+
+def session_signature(path):
+    """Tamanho, mtime e inode de cada segmento: identifica sem leitura um arquivo já previsto."""
+    segments = session_segments(path) if path.endswith(SESSION_EXTENSION) else [path]
+    signature = []
+    for segment in segments:
+        stat = os.stat(segment)
+        signature.append([stat.st_size, stat.st_mtime_ns, stat.st_ino])
+    return signature
+
+
+def session_chunks(path, digest):
+    """Blocos de amostras da sessão, o conteúdo registrado nela e os nomes dos participantes (None se não houver)."""
+    if path.endswith(SESSION_EXTENSION):
+        reader = SessionReader(path)
+        return reader.chunks(EXPORT_CHUNK_SIZE), reader.header.get('content'), reader.header.get('people')
+    df = load_dataset(path, digest)
+    content = None
+    if 'Content' in df.columns and len(df):
+        content = str(df['Content'].value_counts().idxmax())
+    return [df], content, None
+
+
+def summarize(classes, counts, sums, windows):
+    label = classes[int(np.argmax(counts))] if windows else None
+    probabilities = sums / windows if windows else np.zeros(len(classes))
+    return {
+        'label': None if label is None else str(label),
+        'windows': int(windows),
+        'probabilities': {str(name): round(float(value), 6) for name, value in zip(classes, probabilities)},
+    }
+
+
+def score_session(model, path, digest=None, raw_columns=RAW_COLUMNS):
+    """Rótulo e probabilidades médias da sessão toda e de cada participante."""
+    digest = digest or file_digest(path)
+    start = time.perf_counter()
+    chunks, content, people = session_chunks(path, digest)
+    classes = model.classes_
+    extractors = {}
+    counts, sums = {}, {}
+    samples = 0
+    for chunk in chunks:
+        samples += len(chunk)
+        proba, owners = predict_proba_samples(model, chunk, raw_columns, extractors)
+        if not len(proba):
+            continue
+        winners = np.argmax(proba, axis=1)
+        for participant in np.unique(owners):
+            mask = owners == participant
+            participant = int(participant)
+            counts.setdefault(participant, np.zeros(len(classes), dtype=np.int64))
+            counts[participant] += np.bincount(winners[mask], minlength=len(classes))
+            sums.setdefault(participant, np.zeros(len(classes)))
+            sums[participant] += proba[mask].sum(axis=0)
+    participants = []
+    for participant in sorted(counts):
+        result = {'participant': participant}
+        if people and participant < len(people) and people[participant]:
+            result['person'] = people[participant]
+        result.update(summarize(classes, counts[participant], sums[participant], counts[participant].sum()))
+        participants.append(result)
+    total_counts = sum(counts.values(), np.zeros(len(classes), dtype=np.int64))
+    total_sums = sum(sums.values(), np.zeros(len(classes)))
+    return {
+        'path': path,
+        'digest': digest,
+        'content': content,
+        'samples': int(samples),
+        **summarize(classes, total_counts, total_sums, total_counts.sum()),
+        'participants': participants,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def _init_worker(model_path, done_digests, raw_columns):
+    # Ctrl+C é tratado só pelo processo principal, que cancela o pool.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    model = load_model(model_path)
+    # Um processo por núcleo: a floresta sklearn não deve abrir as próprias threads.
+    if hasattr(model, 'n_jobs'):
+        model.n_jobs = 1
+    _worker.update(model=model, done=done_digests, raw_columns=raw_columns)
+
+
+def _score_in_worker(path):
+    try:
+        signature = session_signature(path)
+        digest = file_digest(path)
+        if digest in _worker['done']:
+            return {'path': path, 'digest': digest, 'signature': signature, 'skipped': True}
+        result = score_session(_worker['model'], path, digest, _worker['raw_columns'])
+        result['signature'] = signature
+        return result
+    except Exception as e:
+        return {'path': path, 'error': str(e) or type(e).__name__}
+
+
+def read_scores(output):
+    """Registros já gravados em `output`; uma última linha incompleta (execução interrompida) é descartada."""
+    if not os.path.exists(output):
+        return []
+    with open(output, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            f.truncate(end)
+    records = []
+    for line in data[:end].splitlines():
+        if line.strip():
+            records.append(json.loads(line))
+    return records
+
+
+def score_sessions(entries, model_path=MODEL_FILE, output=SCORES_FILE, workers=None, raw_columns=RAW_COLUMNS,
+                   on_result=None):
+    """Prevê as sessões de `entries` que ainda não têm resultado com o modelo atual e devolve (previstas, puladas, erros).
+
+    `on_result(registro)` é chamado a cada sessão prevista ou com erro, depois de o registro ser gravado.
+    """
+    model, version, model_digest = model_identity(model_path)
+    done = [record for record in read_scores(output)
+            if record.get('model_digest') == model_digest and not record.get('error')]
+    done_digests = {record['digest'] for record in done}
+    done_signatures = {(record['path'], json.dumps(record.get('signature'))) for record in done}
+    pending, skipped = [], 0
+    for path in expand_entries(entries):
+        try:
+            signature = json.dumps(session_signature(path))
+        except OSError:
+            signature = None
+        if (path, signature) in done_signatures:
+            skipped += 1
+        else:
+            pending.append(path)
+
+    scored, errors = 0, 0
+    with open(output, 'a') as f:
+        def record(result):
+            nonlocal scored, skipped, errors
+            if result.get('skipped'):
+                skipped += 1
+                return
+            result.update(model_version=version, model_digest=model_digest, scored_at=time.strftime('%Y-%m-%dT%H:%M:%S'))
+            f.write(json.dumps(result, ensure_ascii=False) + '\n')
+            f.flush()
+            if result.get('error'):
+                errors += 1
+            else:
+                scored += 1
+                done_digests.add(result['digest'])
+            if on_result:
+                on_result(result)
+
+        workers = workers or os.cpu_count()
+        if workers > 1 and len(pending) >= MIN_PARALLEL_SESSIONS:
+            del model
+            with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                     initargs=(model_path, done_digests, raw_columns)) as executor:
+                futures = [executor.submit(_score_in_worker, path) for path in pending]
+                try:
+                    for future in as_completed(futures):
+                        result = future.result()
+                        # Cópias idênticas previstas ao mesmo tempo em processos diferentes.
+                        if result.get('digest') in done_digests and not result.get('error'):
+                            result['skipped'] = True
+                        record(result)
+                except BaseException:
+                    executor.shutdown(cancel_futures=True)
+                    raise
+        else:
+            _worker.update(model=model, done=done_digests, raw_columns=raw_columns)
+            for path in pending:
+                record(_score_in_worker(path))
+    return scored, skipped, errors
+
+
+def format_result(result):
+    if result.get('error'):
+        return f"{result['path']}: erro: {result['error']}"
+    people = ', '.join(f"P{participant['participant'] + 1}={participant['label']}" for participant in result['participants'])
+    return f"{result['path']}: {result['label']} ({result['windows']} janelas; {people})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('entries', nargs='+', help="sessões .mtv, CSVs, pastas ou padrões glob")
+    parser.add_argument('--model', default=MODEL_FILE)
+    parser.add_argument('--output', default=SCORES_FILE, help="arquivo JSON Lines com um registro por sessão")
+    parser.add_argument('--workers', type=int, help="processos de previsão (padrão: um por núcleo)")
+    parser.add_argument('--columns', nargs='+', default=RAW_COLUMNS, help="colunas usadas por modelos antigos, sem janelas")
+    parser.add_argument('--quiet', action='store_true', help="não mostra o resultado de cada sessão")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        scored, skipped, errors = score_sessions(args.entries, args.model, args.output, args.workers, args.columns,
+                                                 None if args.quiet else lambda result: print(format_result(result), flush=True))
+    except KeyboardInterrupt:
+        raise SystemExit(f"\nInterrompido; execute novamente para continuar de onde parou ({args.output}).")
+    print(f"{scored} sessão(ões) prevista(s), {skipped} já prevista(s) com este modelo, {errors} erro(s) "
+          f"em {time.perf_counter() - start:.1f} s; resultados em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
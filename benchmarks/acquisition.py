@@ -0,0 +1,252 @@
+"""Benchmark de ponta a ponta da coleta: dispositivo simulado -> DataCollectionThread -> log e disco.
+
+Cada caso roda em um processo próprio (CPU e memória de pico isolados), com o
+dispositivo simulado em um processo filho. São medidos: amostras por segundo
+decodificadas, latência do envio do byte até a linha chegar ao log da
+interface, CPU do processo de coleta por porta, memória de pico e taxa de
+perda. Sessões de 1/5/60 minutos são comprimidas no tempo por `--time-scale`
+(o dispositivo envia `time_scale` vezes mais rápido pelo mesmo número de
+amostras). O resultado é gravado em JSON em benchmarks/results/.
+
+Execute a partir da raiz do repositório:
+
+    python -m benchmarks.acquisition [--minutes 1 5 60] [--time-scale 60] [--baseline anterior.json]
+"""
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from fake_serial_device import SAMPLES_PER_MINUTE, FakeSerialDevice
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+THROUGHPUT_SECONDS = 5.0
+# O irValue leva um número de sequência (exato em float32 até 2**24) e o GSR o
+# instante de envio em ms módulo 2**16, ambos preservados no log e na sessão.
+SEQ_MODULO = 1 << 24
+STAMP_MODULO = 1 << 16
+NUMBER = re.compile(r'\d+')
+
+
+def stamp_ms():
+    return int(time.monotonic() * 1000) % STAMP_MODULO
+
+
+class TimestampedDevice(FakeSerialDevice):
+    """Dispositivo simulado que marca cada amostra com sequência e instante de envio."""
+
+    def __init__(self, sent, **kwargs):
+        super().__init__(**kwargs)
+        self.sent = sent
+
+    def sample(self, participant):
+        return self.seq % SEQ_MODULO, 80, 78, stamp_ms()
+
+    def run(self):
+        # Gera cada ciclo só no instante de envio, para que a marca de tempo seja a do write.
+        start = time.monotonic()
+        n = 0
+        while not self.stopped.is_set():
+            if self.rate:
+                delay = start + n / self.rate - time.monotonic()
+                if delay > 0 and self.stopped.wait(delay):
+                    break
+            try:
+                self.write(self.cycle())
+            except OSError:
+                break
+            self.sent.value = self.seq
+            n += 1
+
+
+def serve_device(case, rate, links, sent, stop):
+    with TimestampedDevice(sent, binary=case['binary'], participants=case['participants'], rate=rate) as device:
+        links.put(device.link)
+        stop.wait()
+
+
+def load_collection_thread(participants):
+    if participants == 1:
+        from main_app import DataCollectionThread
+        return DataCollectionThread
+    spec = importlib.util.spec_from_file_location('main_10p', os.path.join(ROOT, 'main-10p.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.DataCollectionThread
+
+
+def run_case(case):
+    """Executa um caso no processo atual e devolve as métricas."""
+    from session_log import SessionReader
+
+    DataCollectionThread = load_collection_thread(case['participants'])
+    if case['samples_per_minute']:
+        rate = case['samples_per_minute'] / 60.0 * case['time_scale']
+        duration = case['minutes'] * 60.0 / case['time_scale']
+    else:
+        rate, duration = 0, THROUGHPUT_SECONDS
+
+    context = multiprocessing.get_context('fork')
+    links, sent, stop = context.Queue(), context.Value('q', 0), context.Event()
+    device = context.Process(target=serve_device, args=(case, rate, links, sent, stop), daemon=True)
+    device.start()
+    latencies = []
+
+    def on_log(text):
+        now = stamp_ms()
+        for line in text.splitlines():
+            numbers = NUMBER.findall(line.rpartition('] ')[2])
+            if len(numbers) == 4:
+                latencies.append((now - int(numbers[3])) % STAMP_MODULO)
+
+    with tempfile.TemporaryDirectory() as directory:
+        session_path = os.path.join(directory, 'bench.mtv')
+        thread = DataCollectionThread([links.get(timeout=10)], duration, case['binary'], session_path)
+        thread.log_signal.connect(on_log)
+        baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        usage_start = resource.getrusage(resource.RUSAGE_SELF)
+        wall_start = time.monotonic()
+        thread.run()
+        wall = time.monotonic() - wall_start
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        stop.set()
+        device.join(5)
+        seqs = SessionReader(session_path).column('irValue', np.int64)
+
+    cpu = (usage.ru_utime - usage_start.ru_utime) + (usage.ru_stime - usage_start.ru_stime)
+    received = len(np.unique(seqs))
+    expected = int(seqs.max() - seqs.min() + 1) if len(seqs) else 0
+    latencies = np.array(latencies, dtype=float)
+    return {
+        **case,
+        'wall_seconds': wall,
+        'samples': int(len(seqs)),
+        'samples_sent': int(sent.value),
+        'samples_per_second': len(seqs) / wall,
+        'drop_rate': 1.0 - received / expected if expected else None,
+        'latency_ms_p50': float(np.percentile(latencies, 50)) if len(latencies) else None,
+        'latency_ms_p99': float(np.percentile(latencies, 99)) if len(latencies) else None,
+        'latency_ms_max': float(latencies.max()) if len(latencies) else None,
+        'cpu_percent_per_stream': 100.0 * cpu / wall,
+        # ru_maxrss é em KiB no Linux.
+        'peak_rss_mb': usage.ru_maxrss / 1024.0,
+        'rss_growth_mb': (usage.ru_maxrss - baseline_rss) / 1024.0,
+    }
+
+
+def cases(args):
+    for participants in args.participants:
+        for binary in args.protocols:
+            yield {'participants': participants, 'binary': binary, 'samples_per_minute': None,
+                   'minutes': None, 'time_scale': None}
+            for samples_per_minute in args.samples_per_minute:
+                for minutes in args.minutes:
+                    yield {'participants': participants, 'binary': binary,
+                           'samples_per_minute': samples_per_minute, 'minutes': minutes,
+                           'time_scale': args.time_scale}
+
+
+def case_key(result):
+    return (result['participants'], result['binary'], result['samples_per_minute'], result['minutes'])
+
+
+def describe(result):
+    protocol = 'bin' if result['binary'] else 'ascii'
+    if result['samples_per_minute'] is None:
+        return f"{result['participants']:>2}p {protocol:5} vazão máxima"
+    return f"{result['participants']:>2}p {protocol:5} {result['samples_per_minute']:>3}/min {result['minutes']:>3} min"
+
+
+def fmt(value, spec):
+    return format(value, spec) if value is not None else '-'.rjust(len(format(0, spec)))
+
+
+def print_results(results, baseline=None):
+    previous = {case_key(result): result for result in (baseline or [])}
+    print(f"{'caso':28} {'amostras/s':>11} {'perda %':>8} {'lat p50':>8} {'lat p99':>8} {'CPU %':>6} {'RSS MB':>7}")
+    for result in results:
+        drop = result['drop_rate'] * 100 if result['drop_rate'] is not None else None
+        print(f"{describe(result):28} {result['samples_per_second']:11.0f} {fmt(drop, '8.3f')} "
+              f"{fmt(result['latency_ms_p50'], '8.1f')} {fmt(result['latency_ms_p99'], '8.1f')} "
+              f"{result['cpu_percent_per_stream']:6.1f} {result['peak_rss_mb']:7.1f}")
+        old = previous.get(case_key(result))
+        if old:
+            changes = []
+            for metric in ('samples_per_second', 'latency_ms_p99', 'cpu_percent_per_stream', 'peak_rss_mb'):
+                if old.get(metric) and result.get(metric) is not None:
+                    changes.append(f"{metric} {100.0 * (result[metric] - old[metric]) / old[metric]:+.0f}%")
+            print(f"{'':28} vs. referência: {', '.join(changes)}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--participants', type=int, nargs='+', default=[1, 10])
+    parser.add_argument('--samples-per-minute', type=int, nargs='+', default=SAMPLES_PER_MINUTE)
+    parser.add_argument('--minutes', type=float, nargs='+', default=[1, 5, 60])
+    parser.add_argument('--time-scale', type=float, default=60.0,
+                        help="fator de compressão do tempo das sessões (1 = tempo real)")
+    parser.add_argument('--protocols', choices=['ascii', 'binary'], nargs='+', default=['ascii', 'binary'])
+    parser.add_argument('--output', help="arquivo JSON de saída (padrão: benchmarks/results/acquisition-DATA.json)")
+    parser.add_argument('--baseline', help="resultado anterior para comparação")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_case(json.loads(args.worker))))
+        return
+
+    args.protocols = [protocol == 'binary' for protocol in args.protocols]
+    results = []
+    for case in cases(args):
+        process = subprocess.run([sys.executable, '-m', 'benchmarks.acquisition', '--worker', json.dumps(case)],
+                                 cwd=ROOT, capture_output=True, text=True, env={**os.environ, 'QT_QPA_PLATFORM': 'offscreen'})
+        if process.returncode:
+            print(f"{case}: falhou\n{process.stderr}", file=sys.stderr)
+            continue
+        results.append(json.loads(process.stdout.splitlines()[-1]))
+        print_results(results[-1:])
+
+    report = {
+        'benchmark': 'acquisition',
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime('acquisition-%Y%m%d-%H%M%S.json'))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print()
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    print_results(results, baseline)
+    print(f"\nResultados gravados em {output}")
+
+
+if __name__ == '__main__':
+    main()
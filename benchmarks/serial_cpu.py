@@ -0,0 +1,69 @@
+"""Uso de CPU e vazão da leitura serial: espera ativa x leitura em blocos.
+
+Execute a partir da raiz do repositório:
+
+    python -m benchmarks.serial_cpu [--seconds 5]
+"""
+import argparse
+import time
+
+import serial
+
+from fake_serial_device import FakeSerialDevice
+from serial_reader import SerialReader
+
+
+def busy_wait_loop(port, seconds):
+    # Laço original de coleta_inicial.py: consulta in_waiting sem pausa e lê linha a linha.
+    ser = serial.Serial(port, 115200)
+    samples = 0
+    start = time.monotonic()
+    while time.monotonic() - start < seconds:
+        if ser.in_waiting > 0:
+            line = ser.readline().decode('utf-8').strip()
+            if ',' in line:
+                [float(value) for value in line.split(',')]
+                samples += 1
+    ser.close()
+    return samples
+
+
+def reader_loop(port, seconds):
+    samples = 0
+    with SerialReader(port) as reader:
+        start = time.monotonic()
+        while time.monotonic() - start < seconds:
+            samples += len(reader.read())
+    return samples
+
+
+def measure(loop, rate, participants, seconds):
+    with FakeSerialDevice(participants=participants, rate=rate, seed=0) as device:
+        cpu_start = time.thread_time()
+        wall_start = time.monotonic()
+        samples = loop(device.port, seconds)
+        wall = time.monotonic() - wall_start
+        cpu = time.thread_time() - cpu_start
+    return {'cpu_percent': 100.0 * cpu / wall, 'samples_per_second': samples / wall}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    scenarios = [
+        ("ocioso (sem dados)", 1e-3, 1),
+        ("1 participante, 20 Hz", 20.0, 1),
+        ("10 participantes, 20 Hz", 20.0, 10),
+        ("vazão máxima", 0, 10),
+    ]
+    print(f"{'cenário':28} {'laço':10} {'CPU %':>8} {'amostras/s':>12}")
+    for name, rate, participants in scenarios:
+        for label, loop in (("in_waiting", busy_wait_loop), ("blocos", reader_loop)):
+            result = measure(loop, rate, participants, args.seconds)
+            print(f"{name:28} {label:10} {result['cpu_percent']:8.1f} {result['samples_per_second']:12.0f}")
+
+
+if __name__ == '__main__':
+    main()
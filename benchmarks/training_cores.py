@@ -0,0 +1,54 @@
+"""Tempo de treinamento da floresta em função do número de núcleos.
+
+Execute a partir da raiz do repositório:
+
+    python -m benchmarks.training_cores [--samples 200000] [--trees 100]
+"""
+import argparse
+import os
+
+import numpy as np
+
+from training import ForestTrainer
+
+
+def synthetic_dataset(samples, seed=0):
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, 5, samples)
+    X = np.column_stack([
+        rng.normal(80000, 15000, samples),
+        rng.normal(70 + 3 * labels, 8),
+        rng.normal(68 + 3 * labels, 6),
+        rng.normal(300 + 20 * labels, 40),
+    ]).astype(np.float32)
+    return X, labels
+
+
+def core_counts():
+    counts, n = [], 1
+    while n < os.cpu_count():
+        counts.append(n)
+        n *= 2
+    return counts + [os.cpu_count()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--samples', type=int, default=200000)
+    parser.add_argument('--trees', type=int, default=100)
+    args = parser.parse_args()
+
+    X, y = synthetic_dataset(args.samples)
+    print(f"{args.samples} amostras, {args.trees} árvores")
+    print(f"{'núcleos':>8} {'tempo (s)':>10} {'aceleração':>11} {'eficiência':>11}")
+    baseline = None
+    for cores in core_counts():
+        trainer = ForestTrainer(n_estimators=args.trees, n_jobs=cores)
+        trainer.fit(X, y)
+        baseline = baseline or trainer.seconds
+        speedup = baseline / trainer.seconds
+        print(f"{cores:8d} {trainer.seconds:10.2f} {speedup:10.2f}x {100 * speedup / cores:10.0f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""Benchmark do pipeline de treinamento em escala, com dados sintéticos.
+
+Para cada tamanho de conjunto (amostras) e número de núcleos, executa em um
+processo próprio as etapas do TrainingThread: leitura e conversão dos arquivos
+(`ingest`, com o cache vazio), carga das colunas (`load_dataset`), janelas e
+treino da floresta (`train_sessions`) e gravação do modelo. Depois mede a vazão
+de previsão (amostras e janelas por segundo) com o modelo sklearn e com a
+floresta compilada. São registrados os tempos de cada etapa e a memória de
+pico. Os conjuntos são gerados por `synthetic_data.py` e o resultado é gravado
+em JSON e CSV em benchmarks/results/.
+
+Execute a partir da raiz do repositório:
+
+    python -m benchmarks.training_scale [--rows 1000 10000 100000 1000000 10000000] [--cores 1 4] [--baseline anterior.json]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.acquisition import RESULTS_DIR, ROOT, git_commit
+from benchmarks.training_cores import core_counts
+from synthetic_data import generate_dataset
+
+PREDICT_ROWS = 1000000
+RAW_COLUMNS = ['beatsPerMinute', 'beatAvg', 'GSR']
+
+
+def peak_rss_mb():
+    # ru_maxrss é em KiB no Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def predict_throughput(model, samples):
+    from features import predict_samples
+
+    start = time.perf_counter()
+    predictions, _ = predict_samples(model, samples, RAW_COLUMNS)
+    seconds = time.perf_counter() - start
+    return len(samples) / seconds, len(predictions) / seconds
+
+
+def run_case(case):
+    """Executa um caso no processo atual (dentro de um diretório de trabalho vazio) e devolve as métricas."""
+    from compiled_forest import load_model, save_model
+    from features import FeatureConfig
+    from ingestion import ingest, load_dataset
+    from training import ForestTrainer, train_sessions
+
+    timings = {}
+    rss = {}
+
+    def stage(name, start):
+        timings[f'{name}_seconds'] = time.perf_counter() - start
+        rss[f'rss_after_{name}_mb'] = peak_rss_mb()
+
+    start = time.perf_counter()
+    report = ingest([case['data']], workers=case['cores'])
+    stage('ingest', start)
+    if report.errors:
+        raise RuntimeError(f"arquivos inválidos: {report.errors[:3]}")
+
+    start = time.perf_counter()
+    sessions = [(path, digest, load_dataset(path, digest)) for path, digest in report.files]
+    stage('load', start)
+
+    trainer = ForestTrainer(n_estimators=case['trees'], n_jobs=case['cores'])
+    start = time.perf_counter()
+    model = train_sessions(trainer, sessions, FeatureConfig())
+    stage('train', start)
+
+    start = time.perf_counter()
+    save_model(model)
+    stage('save', start)
+
+    samples = pd.concat([df for _, _, df in sessions], ignore_index=True).iloc[:PREDICT_ROWS]
+    sklearn_samples, sklearn_windows = predict_throughput(model, samples)
+    compiled_samples, compiled_windows = predict_throughput(load_model(), samples)
+    return {
+        **case,
+        'files': len(report.files),
+        'samples': int(report.rows),
+        'windows': int(model.windows_seen_),
+        'classes': len(model.classes_),
+        **timings,
+        'fit_seconds': trainer.seconds,
+        'features_seconds': timings['train_seconds'] - trainer.seconds,
+        'total_seconds': sum(timings.values()),
+        'predict_samples_per_second': sklearn_samples,
+        'predict_windows_per_second': sklearn_windows,
+        'compiled_samples_per_second': compiled_samples,
+        'compiled_windows_per_second': compiled_windows,
+        'peak_rss_mb': peak_rss_mb(),
+        **rss,
+    }
+
+
+def case_key(result):
+    return (result['rows'], result['cores'], result['format'])
+
+
+def describe(result):
+    return f"{result['rows']:>9} {result['format']:3} {result['cores']:>2} núcleo(s)"
+
+
+def print_results(results, baseline=None):
+    previous = {case_key(result): result for result in (baseline or [])}
+    print(f"{'caso':26} {'leitura s':>9} {'carga s':>8} {'janelas s':>9} {'treino s':>9} "
+          f"{'prev. jan/s':>11} {'compil. jan/s':>13} {'RSS MB':>7}")
+    for result in results:
+        print(f"{describe(result):26} {result['ingest_seconds']:9.2f} {result['load_seconds']:8.2f} "
+              f"{result['features_seconds']:9.2f} {result['fit_seconds']:9.2f} "
+              f"{result['predict_windows_per_second']:11.0f} {result['compiled_windows_per_second']:13.0f} "
+              f"{result['peak_rss_mb']:7.1f}")
+        old = previous.get(case_key(result))
+        if old:
+            changes = []
+            for metric in ('ingest_seconds', 'load_seconds', 'fit_seconds', 'total_seconds',
+                           'compiled_windows_per_second', 'peak_rss_mb'):
+                if old.get(metric) and result.get(metric) is not None:
+                    changes.append(f"{metric} {100.0 * (result[metric] - old[metric]) / old[metric]:+.0f}%")
+            print(f"{'':26} vs. referência: {', '.join(changes)}")
+
+
+def dataset(directory, rows, args):
+    """Diretório com o conjunto sintético de `rows` amostras, gerado se ainda não existir."""
+    path = os.path.join(directory, f"{rows}-{args.format}-p{args.participants}-n{args.noise:g}-s{args.seed}")
+    if not os.path.isdir(path):
+        start = time.perf_counter()
+        generate_dataset(path + '.tmp', rows, args.participants, noise=args.noise, file_format=args.format, seed=args.seed)
+        os.replace(path + '.tmp', path)
+        print(f"{rows} amostras geradas em {time.perf_counter() - start:.1f} s")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--cores', type=int, nargs='+', help="núcleos (padrão: 1, 2, 4, ... até todos)")
+    parser.add_argument('--trees', type=int, default=100)
+    parser.add_argument('--participants', type=int, default=4)
+    parser.add_argument('--noise', type=float, default=1.0)
+    parser.add_argument('--format', choices=['mtv', 'csv'], default='csv',
+                        help="formato dos arquivos gerados (csv inclui a conversão para o cache)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', help="onde guardar os conjuntos gerados, para reaproveitá-los (padrão: temporário)")
+    parser.add_argument('--output', help="arquivo JSON de saída (padrão: benchmarks/results/training_scale-DATA.json); "
+                                         "o CSV é gravado ao lado")
+    parser.add_argument('--baseline', help="resultado anterior para comparação")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        case = json.loads(args.worker)
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            result = run_case(case)
+        print(json.dumps(result))
+        return
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='mindtv-sintetico-')
+    results = []
+    try:
+        for rows in args.rows:
+            data = dataset(data_dir, rows, args)
+            for cores in args.cores or core_counts():
+                case = {'rows': rows, 'cores': cores, 'format': args.format, 'trees': args.trees,
+                        'participants': args.participants, 'noise': args.noise, 'data': os.path.abspath(data)}
+                process = subprocess.run([sys.executable, '-m', 'benchmarks.training_scale', '--worker', json.dumps(case)],
+                                         cwd=ROOT, capture_output=True, text=True)
+                if process.returncode:
+                    print(f"{describe(case)}: falhou\n{process.stderr}", file=sys.stderr)
+                    continue
+                results.append(json.loads(process.stdout.splitlines()[-1]))
+                print_results(results[-1:])
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        'benchmark': 'training_scale',
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime('training_scale-%Y%m%d-%H%M%S.json'))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    pd.DataFrame(results).drop(columns='data', errors='ignore').to_csv(os.path.splitext(output)[0] + '.csv', index=False)
+
+    print()
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    print_results(results, baseline)
+    print(f"\nResultados gravados em {output} e {os.path.splitext(output)[0]}.csv")
+
+
+if __name__ == '__main__':
+    main()
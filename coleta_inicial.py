@@ -1,41 +1,57 @@
 from builtins import Exception, int, list, str, super
 import sys
-import time
-import os
-import pandas as pd
-import serial
-import serial.tools.list_ports
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QPushButton, QLabel, QComboBox, QTextEdit
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QPushButton, QLabel, QComboBox, QListWidget, QAbstractItemView, QFileDialog
 from PyQt5.QtCore import QThread, pyqtSignal
+from acquisition import AcquisitionEngine
+from sample_store import SampleStore
+from serial_reader import list_serial_ports
+from session_log import SESSION_BUFFER_SAMPLES, SESSIONS_DIR, SessionWriter, export_session_csv, new_session_path, recover_session
+from ui_updates import LogOutput, UiThrottle
 
 class DataCollectionThread(QThread):
     log_signal = pyqtSignal(str)
-    data_signal = pyqtSignal(list)
+    data_signal = pyqtSignal(object)
 
-    def __init__(self, port, duration):
+    def __init__(self, ports, duration, binary=False, session_path=None, content=None):
         super().__init__()
-        self.port = port
+        self.ports = ports
         self.duration = duration
-        self.ser = None
+        self.binary = binary
+        self.session_path = session_path
+        self.content = content
+        self.engine = None
 
     def run(self):
+        writer = None
         try:
-            self.ser = serial.Serial(self.port, 115200)
             self.log_signal.emit("Iniciando coleta de dados...")
-            start_time = time.time()
-            data = []
-            while time.time() - start_time < self.duration:
-                if self.ser.in_waiting > 0:
-                    line = self.ser.readline().decode('utf-8').strip()
-                    if ',' in line:
-                        irValue, beatsPerMinute, beatAvg, GSR = line.split(',')
-                        data.append([irValue, beatsPerMinute, beatAvg, GSR])
-                        self.log_signal.emit(f"IR: {irValue}, BPM: {beatsPerMinute}, Avg BPM: {beatAvg}, GSR: {GSR}")
-            self.ser.close()
+            ui = UiThrottle(self.log_signal.emit)
+            store = None
+            if self.session_path:
+                writer = SessionWriter(self.session_path, {'ports': self.ports, 'binary': self.binary, 'content': self.content})
+                store = SampleStore(max_samples=SESSION_BUFFER_SAMPLES)
+            self.engine = AcquisitionEngine(self.ports, self.binary, store, ui.log_many)
+
+            def tick():
+                if writer:
+                    writer.drain(self.engine.store)
+                ui.poll()
+
+            data = self.engine.run_until(lambda: self.engine.store.now() >= self.duration, tick)
+            for port, error in self.engine.errors:
+                ui.log(f"Erro durante a coleta de dados ({port}): {str(error)}")
+            if writer:
+                writer.close()
+                if writer.lost:
+                    ui.log(f"Aviso: {writer.lost} amostras não foram gravadas em {self.session_path}.")
+            ui.flush()
             self.data_signal.emit(data)
             self.log_signal.emit("Coleta de dados concluída.")
         except Exception as e:
             self.log_signal.emit(f"Erro durante a coleta de dados: {str(e)}")
+        finally:
+            if writer:
+                writer.close()
 
 class MainWindow(QWidget):
     def __init__(self):
@@ -45,20 +61,23 @@ class MainWindow(QWidget):
     def initUI(self):
         layout = QVBoxLayout()
 
-        self.port_label = QLabel("Selecione a Porta Serial:")
+        self.port_label = QLabel("Selecione a(s) Porta(s) Serial(is):")
         layout.addWidget(self.port_label)
 
-        self.port_combo = QComboBox(self)
-        ports = serial.tools.list_ports.comports()
-        for port in ports:
-            self.port_combo.addItem(port.device)
-        layout.addWidget(self.port_combo)
+        self.port_list = QListWidget(self)
+        self.port_list.setSelectionMode(QAbstractItemView.MultiSelection)
+        for port in list_serial_ports():
+            self.port_list.addItem(port)
+        if self.port_list.count():
+            self.port_list.item(0).setSelected(True)
+        self.port_list.setMaximumHeight(100)
+        layout.addWidget(self.port_list)
 
         self.duration_label = QLabel("Tempo de Coleta (minutos):")
         layout.addWidget(self.duration_label)
 
         self.duration_combo = QComboBox(self)
-        self.duration_combo.addItems(["1", "2", "3", "4", "5"])
+        self.duration_combo.addItems(["1", "2", "3", "4", "5", "10", "15", "30", "60", "120"])
         layout.addWidget(self.duration_combo)
 
         self.content_label = QLabel("Tipo de Conteúdo Assistido:")
@@ -68,36 +87,54 @@ class MainWindow(QWidget):
         self.content_combo.addItems(["Reality Show", "Filme de Ação", "Filme de Comédia", "Programa de Política", "Jornal"])
         layout.addWidget(self.content_combo)
 
+        self.protocol_label = QLabel("Protocolo Serial:")
+        layout.addWidget(self.protocol_label)
+
+        self.protocol_combo = QComboBox(self)
+        self.protocol_combo.addItems(["Texto (ASCII)", "Binário"])
+        layout.addWidget(self.protocol_combo)
+
         self.collect_button = QPushButton('Iniciar Coleta', self)
         self.collect_button.clicked.connect(self.collect_data)
         layout.addWidget(self.collect_button)
 
+        self.open_session_button = QPushButton('Abrir Sessão Gravada', self)
+        self.open_session_button.clicked.connect(self.open_session)
+        layout.addWidget(self.open_session_button)
+
         self.export_button = QPushButton('Exportar CSV', self)
         self.export_button.clicked.connect(self.export_csv)
         self.export_button.setEnabled(False)
         layout.addWidget(self.export_button)
 
-        self.output = QTextEdit(self)
-        self.output.setReadOnly(True)  # Torna o campo de log somente leitura
+        self.output = LogOutput(self)  # Campo de log somente leitura, limitado às últimas linhas
         layout.addWidget(self.output)
 
         self.setLayout(layout)
         self.setWindowTitle('Coleta Inicial')
         self.show()
 
-    def get_selected_port(self):
-        return self.port_combo.currentText()
+    def get_selected_ports(self):
+        return [self.port_list.item(i).text() for i in range(self.port_list.count()) if self.port_list.item(i).isSelected()]
+
+    def get_binary_protocol(self):
+        return self.protocol_combo.currentText() == "Binário"
 
     def get_selected_duration(self):
         return int(self.duration_combo.currentText()) * 60
 
     def collect_data(self):
-        port = self.get_selected_port()
+        ports = self.get_selected_ports()
+        if not ports:
+            self.output.append("Erro: selecione pelo menos uma porta serial.")
+            return
         duration = self.get_selected_duration()
-        self.output.append(f"Iniciando coleta de dados na porta {port} por {duration // 60} minutos...")
+        self.output.append(f"Iniciando coleta de dados na(s) porta(s) {', '.join(ports)} por {duration // 60} minutos...")
         self.collect_button.setEnabled(False)  # Desabilita o botão após ser clicado
 
-        self.data_collection_thread = DataCollectionThread(port, duration)
+        self.session_path = new_session_path()
+        self.output.append(f"Gravando a sessão em {self.session_path}")
+        self.data_collection_thread = DataCollectionThread(ports, duration, self.get_binary_protocol(), self.session_path, self.content_combo.currentText())
         self.data_collection_thread.log_signal.connect(self.log_output)
         self.data_collection_thread.data_signal.connect(self.store_data)
         self.data_collection_thread.start()
@@ -111,22 +148,21 @@ class MainWindow(QWidget):
         self.collect_button.setEnabled(True)  # Reabilita o botão após a coleta ser concluída
         self.output.append("Coleta de dados armazenada.")
 
+    def open_session(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Abrir sessão gravada", SESSIONS_DIR, "Sessões MindTV (*.mtv);;All Files (*)")
+        if not path:
+            return
+        try:
+            count = recover_session(path)
+            self.session_path = path
+            self.export_button.setEnabled(True)
+            self.output.append(f"Sessão {path} aberta: {count} amostras.")
+        except Exception as e:
+            self.output.append(f"Erro ao abrir sessão: {str(e)}")
+
     def export_csv(self):
         try:
-            df = pd.DataFrame(self.data, columns=['irValue', 'beatsPerMinute', 'beatAvg', 'GSR'])
-            content_type = self.content_combo.currentText()
-            df['Content'] = content_type
-
-            # Verificar se já existe um arquivo com o mesmo nome e ajustar o nome do arquivo se necessário
-            base_filename = 'coleta_dados'
-            extension = '.csv'
-            filename = base_filename + extension
-            counter = 1
-            while os.path.exists(filename):
-                filename = f"{base_filename}({counter}){extension}"
-                counter += 1
-
-            df.to_csv(filename, index=False)
+            filename = export_session_csv(self.session_path, ['irValue', 'beatsPerMinute', 'beatAvg', 'GSR'], self.content_combo.currentText())
             self.output.append(f"Dados exportados para {filename}")
         except Exception as e:
             self.output.append(f"Erro ao exportar dados: {str(e)}")
@@ -0,0 +1,271 @@
+"""Floresta treinada em formato compacto para previsão, sem sklearn.
+
+    python compiled_forest.py [trained_model.joblib]
+
+exporta o modelo para trained_model.forest e compara tempo de carga e
+latência por janela com o modelo original.
+"""
+import argparse
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+# Arquivo: COMPILED_MAGIC, tamanho do cabeçalho (u32), cabeçalho JSON e os
+# arrays, cada um alinhado em ARRAY_ALIGNMENT bytes a partir do início do arquivo.
+COMPILED_MAGIC = b'MTVFOR1\n'
+COMPILED_HEADER = struct.Struct('<I')
+COMPILED_FORMAT = 1
+COMPILED_EXTENSION = '.forest'
+ARRAY_ALIGNMENT = 64
+MODEL_FILE = 'trained_model.joblib'
+# Atributos do modelo sklearn copiados para o cabeçalho.
+MODEL_ATTRIBUTES = ('feature_config_', 'model_version_')
+
+
+def compiled_path(model_path):
+    return os.path.splitext(model_path)[0] + COMPILED_EXTENSION
+
+
+def read_header(f):
+    if f.read(len(COMPILED_MAGIC)) != COMPILED_MAGIC:
+        raise ValueError(f"{f.name} não é uma floresta compilada do MindTV")
+    (size,) = COMPILED_HEADER.unpack(f.read(COMPILED_HEADER.size))
+    header = json.loads(f.read(size))
+    if header['format'] != COMPILED_FORMAT:
+        raise ValueError(f"Formato {header['format']} de {f.name} não suportado (esperado {COMPILED_FORMAT})")
+    return header
+
+
+class CompiledForest:
+    """RandomForestClassifier achatado em arrays contíguos.
+
+    Os nós internos de todas as árvores ficam em `feature`, `threshold`,
+    `left` e `right`; um filho negativo `~i` aponta para a folha `i`, cuja
+    distribuição de classes está em `leaf_values[i]`. `roots` tem o primeiro
+    nó de cada árvore (negativo se a árvore é uma única folha). As previsões
+    são as mesmas do modelo sklearn de origem: os limiares são arredondados
+    para baixo em float32, a precisão em que o sklearn compara os atributos.
+    """
+
+    def __init__(self, arrays, header):
+        self.arrays = arrays
+        self.header = header
+        self.roots = arrays['roots']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.leaf_values = arrays['leaf_values']
+        self.classes_ = np.array(header['classes'])
+        self.feature_names_in_ = header['feature_names']
+        self.n_features_in_ = header['n_features']
+        self.n_estimators = len(self.roots)
+        for name in MODEL_ATTRIBUTES:
+            if name in header:
+                setattr(self, name, header[name])
+
+    @classmethod
+    def from_sklearn(cls, model):
+        roots, feature, threshold, left, right, leaf_values = [], [], [], [], [], []
+        internal = leaves = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            is_leaf = tree.children_left < 0
+            # Nova numeração: nós internos e folhas contados separadamente, já com o deslocamento da árvore.
+            ids = np.where(is_leaf, ~(leaves + np.cumsum(is_leaf) - 1), internal + np.cumsum(~is_leaf) - 1)
+            nodes = np.flatnonzero(~is_leaf)
+            roots.append(ids[0])
+            feature.append(tree.feature[nodes])
+            threshold.append(tree.threshold[nodes])
+            left.append(ids[tree.children_left[nodes]])
+            right.append(ids[tree.children_right[nodes]])
+            values = tree.value[is_leaf, 0, :]
+            totals = values.sum(axis=1, keepdims=True)
+            leaf_values.append(values / np.where(totals == 0, 1, totals))
+            internal += len(nodes)
+            leaves += int(is_leaf.sum())
+        threshold = np.concatenate(threshold)
+        threshold32 = threshold.astype(np.float32)
+        threshold32 = np.where(threshold32 > threshold, np.nextafter(threshold32, np.float32(-np.inf)), threshold32)
+        arrays = {
+            'roots': np.array(roots, dtype=np.int32),
+            'feature': np.concatenate(feature).astype(np.int32),
+            'threshold': threshold32.astype(np.float32),
+            'left': np.concatenate(left).astype(np.int32),
+            'right': np.concatenate(right).astype(np.int32),
+            'leaf_values': np.concatenate(leaf_values).astype(np.float32),
+        }
+        names = getattr(model, 'feature_names_in_', None)
+        header = {
+            'format': COMPILED_FORMAT,
+            'classes': model.classes_.tolist(),
+            'feature_names': list(names) if names is not None else None,
+            'n_features': int(model.n_features_in_),
+            **{name: getattr(model, name) for name in MODEL_ATTRIBUTES if hasattr(model, name)},
+        }
+        return cls(arrays, header)
+
+    def save(self, path):
+        """Grava em um arquivo temporário e o renomeia, para nunca deixar um arquivo pela metade."""
+        header = dict(self.header, arrays={})
+        offset = 0
+        for name, array in self.arrays.items():
+            offset = -(-offset // ARRAY_ALIGNMENT) * ARRAY_ALIGNMENT
+            header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+            offset += array.nbytes
+        encoded = json.dumps(header).encode()
+        start = -(-(len(COMPILED_MAGIC) + COMPILED_HEADER.size + len(encoded)) // ARRAY_ALIGNMENT) * ARRAY_ALIGNMENT
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(COMPILED_MAGIC + COMPILED_HEADER.pack(len(encoded)) + encoded)
+            for name, array in self.arrays.items():
+                f.seek(start + header['arrays'][name]['offset'])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.truncate(start + offset)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Lê o arquivo; com `mmap` os arrays são mapeados em memória em vez de copiados."""
+        with open(path, 'rb') as f:
+            header = read_header(f)
+            start = -(-f.tell() // ARRAY_ALIGNMENT) * ARRAY_ALIGNMENT
+        raw = np.memmap(path, dtype=np.uint8, mode='r') if mmap else np.fromfile(path, dtype=np.uint8)
+        arrays = {}
+        for name, spec in header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape']))
+            begin = start + spec['offset']
+            arrays[name] = raw[begin:begin + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+        return cls(arrays, header)
+
+    def apply(self, X):
+        """Índice da folha alcançada por cada amostra em cada árvore (amostras x árvores).
+
+        Todos os pares (amostra, árvore) descem juntos, um nível por iteração;
+        os que chegam a uma folha saem do conjunto ativo.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_trees = len(self.roots)
+        flat = X.ravel()
+        leaves = np.empty(len(X) * n_trees, dtype=np.int32)
+        nodes = np.tile(self.roots, len(X))
+        pending = np.arange(len(nodes))
+        base = np.repeat(np.arange(len(X)) * X.shape[1], n_trees)
+        while len(pending):
+            done = nodes < 0
+            leaves[pending[done]] = ~nodes[done]
+            pending, nodes, base = pending[~done], nodes[~done], base[~done]
+            if not len(pending):
+                break
+            go_left = flat[base + self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return leaves.reshape(len(X), n_trees)
+
+    def predict_proba(self, X):
+        proba = np.zeros((len(X), len(self.classes_)))
+        for leaves in self.apply(X).T:
+            proba += self.leaf_values[leaves]
+        return proba / self.n_estimators
+
+    def predict(self, X):
+        if len(X) == 0:
+            return self.classes_[:0]
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def file_signature(path):
+    """(tamanho, mtime em ns, inode) de um arquivo, ou None se ele não existe."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+def export_model(model, path=MODEL_FILE):
+    """Grava a versão compilada de `model` ao lado do arquivo .joblib, que é registrado como origem."""
+    forest = CompiledForest.from_sklearn(model)
+    forest.header['source'] = file_signature(path)
+    forest.save(compiled_path(path))
+    return forest
+
+
+def save_model(model, path=MODEL_FILE):
+    """Salva o modelo sklearn (usado no treino incremental) e a versão compilada (usada na previsão).
+
+    Os dois arquivos são gravados em temporários e renomeados, de modo que um
+    leitor sempre encontra um arquivo completo, antigo ou novo.
+    """
+    from joblib import dump
+
+    temporary = path + '.tmp'
+    dump(model, temporary)
+    os.replace(temporary, path)
+    export_model(model, path)
+
+
+def model_file(path=MODEL_FILE):
+    """Arquivo a usar na previsão: o compilado, se foi gerado a partir do .joblib atual; senão o .joblib."""
+    compiled = compiled_path(path)
+    if os.path.exists(compiled):
+        source = file_signature(path)
+        if source is None:
+            return compiled
+        with open(compiled, 'rb') as f:
+            if read_header(f).get('source') == source:
+                return compiled
+    return path
+
+
+def load_model_file(file):
+    if file.endswith(COMPILED_EXTENSION):
+        return CompiledForest.load(file)
+    from joblib import load
+
+    return load(file)
+
+
+def load_model(path=MODEL_FILE):
+    return load_model_file(model_file(path))
+
+
+def main():
+    from joblib import load
+
+    parser = argparse.ArgumentParser(description="Exporta o modelo treinado para o formato compilado de previsão.")
+    parser.add_argument('model', nargs='?', default=MODEL_FILE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    model = load(args.model)
+    joblib_seconds = time.perf_counter() - start
+    forest = export_model(model, args.model)
+    start = time.perf_counter()
+    forest = CompiledForest.load(compiled_path(args.model))
+    compiled_seconds = time.perf_counter() - start
+
+    X = np.random.default_rng(0).normal(size=(1000, forest.header['n_features'])).astype(np.float32)
+    if forest.feature_names_in_ is not None:
+        import pandas as pd
+        X = pd.DataFrame(X, columns=forest.feature_names_in_)
+    if not np.array_equal(forest.predict(X), model.predict(X)):
+        raise SystemExit("As previsões da floresta compilada diferem das do modelo original")
+    timings = {}
+    for name, predictor in (('sklearn', model), ('compilado', forest)):
+        latencies = []
+        for index in range(50):
+            start = time.perf_counter()
+            predictor.predict(X[index:index + 1])
+            latencies.append(time.perf_counter() - start)
+        timings[name] = 1000 * float(np.median(latencies))
+    print(f"{compiled_path(args.model)}: {forest.n_estimators} árvores, {os.path.getsize(compiled_path(args.model)) / 1e6:.2f} MB")
+    print(f"carga: {joblib_seconds * 1000:.1f} ms (joblib) -> {compiled_seconds * 1000:.1f} ms (compilado)")
+    print(f"previsão de uma janela: {timings['sklearn']:.2f} ms -> {timings['compilado']:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from features import SENSOR_COLUMNS
+from session_log import SESSION_EXTENSION, session_segments
+
+# Cada arquivo de dados convertido fica em DATASET_CACHE_DIR/<sha256 do conteúdo>/,
+# com as colunas em um array estruturado (data.bin) e um meta.json com o tipo,
+# os nomes e as categorias. Entradas pequenas são lidas direto; as maiores, mapeadas em memória.
+DATASET_CACHE_DIR = 'cache_dados'
+CACHE_FORMAT = 2
+MMAP_MIN_BYTES = 1 << 20
+CSV_DTYPES = {**{column: np.float32 for column in SENSOR_COLUMNS}, 'Content': 'category'}
+
+
+def file_digest(path):
+    """sha256 do conteúdo de um CSV ou de todos os segmentos de uma sessão."""
+    digest = hashlib.sha256()
+    for segment in session_segments(path) if path.endswith(SESSION_EXTENSION) else [path]:
+        with open(segment, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_csv(path):
+    """Lê o CSV com tipos compactos: sensores e demais números reais em float32, textos como categorias."""
+    df = pd.read_csv(path, dtype=CSV_DTYPES)
+    for column in df.columns:
+        if df[column].dtype == np.float64:
+            df[column] = df[column].astype(np.float32)
+        elif df[column].dtype == object or pd.api.types.is_string_dtype(df[column].dtype):
+            df[column] = df[column].astype('category')
+    return df
+
+
+def _store(df, entry):
+    directory = tempfile.mkdtemp(prefix='.tmp-', dir=os.path.dirname(entry))
+    columns, arrays = [], []
+    for column in df.columns:
+        values = df[column]
+        meta = {'name': str(column)}
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories = values.cat.categories.to_numpy()
+            meta['categories'] = categories.astype(str).tolist() if categories.dtype == object else categories.tolist()
+            values = values.cat.codes
+        columns.append(meta)
+        arrays.append(values.to_numpy())
+    data = np.empty(len(df), dtype=[(f'c{index}', values.dtype) for index, values in enumerate(arrays)])
+    for index, values in enumerate(arrays):
+        data[f'c{index}'] = values
+    data.tofile(os.path.join(directory, 'data.bin'))
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump({'format': CACHE_FORMAT, 'rows': len(df), 'dtype': data.dtype.descr, 'columns': columns}, f)
+    try:
+        os.rename(directory, entry)
+    except OSError:
+        # Outro processo gravou a mesma entrada primeiro.
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _load(entry):
+    with open(os.path.join(entry, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta['format'] != CACHE_FORMAT:
+        return None
+    path = os.path.join(entry, 'data.bin')
+    dtype = np.dtype([tuple(field) for field in meta['dtype']])
+    if not meta['rows']:
+        data = np.zeros(0, dtype=dtype)
+    elif meta['rows'] * dtype.itemsize >= MMAP_MIN_BYTES:
+        data = np.memmap(path, dtype=dtype, mode='r', shape=(meta['rows'],))
+    else:
+        data = np.fromfile(path, dtype=dtype)
+    columns = {}
+    for index, column in enumerate(meta['columns']):
+        values = data[f'c{index}']
+        if 'categories' in column:
+            values = pd.Categorical.from_codes(values, column['categories'])
+        columns[column['name']] = values
+    return pd.DataFrame(columns, copy=False)
+
+
+def load_csv(path, digest=None, cache_dir=DATASET_CACHE_DIR):
+    """DataFrame de um CSV, convertido uma única vez e depois lido do cache (memmap).
+
+    A entrada é identificada pelo sha256 do conteúdo: um arquivo alterado gera
+    uma nova entrada, e o mesmo conteúdo em outro caminho reaproveita a existente.
+    """
+    digest = digest or file_digest(path)
+    entry = os.path.join(cache_dir, digest)
+    if os.path.exists(os.path.join(entry, 'meta.json')):
+        df = _load(entry)
+        if df is not None:
+            return df
+        shutil.rmtree(entry, ignore_errors=True)
+    df = parse_csv(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    _store(df, entry)
+    return df
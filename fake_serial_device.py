@@ -0,0 +1,265 @@
+import argparse
+import os
+import pty
+import random
+import select
+import struct
+import threading
+import time
+import tty
+
+import serial
+
+from serial_protocol import FRAME_SIZE, encode_frame
+from serial_reader import SIMULATED_PORTS_DIR
+
+RECORDING_MAGIC = b'MTVREC1\n'
+RECORDING_BLOCK = struct.Struct('<dI')
+SAMPLES_PER_MINUTE = [64, 128, 256]
+
+
+class FakeSerialDevice:
+    """Arduino simulado sobre um pseudo-terminal.
+
+    `port` pode ser aberto com `serial.Serial(port, 115200)` como uma porta real
+    e também aparece na lista de portas das interfaces enquanto o dispositivo
+    estiver aberto. `rate` é o número de ciclos (uma amostra por participante)
+    por segundo; `speed` acelera a reprodução (0 = o mais rápido possível).
+    `jitter` (segundos), `drop_rate` (fração de bytes descartados) e
+    `corrupt_rate` (fração de linhas/quadros corrompidos) simulam falhas do link.
+    """
+
+    def __init__(self, binary=False, participants=1, rate=20.0, seed=None,
+                 speed=1.0, jitter=0.0, drop_rate=0.0, corrupt_rate=0.0):
+        self.binary = binary
+        self.participants = participants
+        self.rate = rate
+        self.speed = speed
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self.random = random.Random(seed)
+        self.master_fd, self.slave_fd = pty.openpty()
+        tty.setraw(self.slave_fd)
+        os.set_blocking(self.master_fd, False)
+        self.port = os.ttyname(self.slave_fd)
+        self.link = None
+        self.seq = 0
+        self.bytes_written = 0
+        self.bytes_dropped = 0
+        self.corrupted = 0
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def sample(self, participant):
+        bpm = self.random.randint(60, 100)
+        return (
+            self.random.randint(50000, 120000),
+            bpm,
+            bpm - self.random.randint(0, 4),
+            250 + 30 * participant + self.random.randint(0, 50),
+        )
+
+    def encode(self, participant, ir_value, bpm, beat_avg, gsr):
+        if self.binary:
+            frame = encode_frame(self.seq, participant, ir_value, bpm, beat_avg, gsr)
+        else:
+            frame = f"{ir_value},{bpm},{beat_avg},{gsr}\r\n".encode()
+        self.seq += 1
+        return frame
+
+    def cycle(self):
+        return b''.join(self.encode(i, *self.sample(i)) for i in range(self.participants))
+
+    def chunks(self):
+        """Gera (instante em segundos, bytes) no tempo do dispositivo."""
+        n = 0
+        while True:
+            yield (n / self.rate if self.rate else 0.0), self.cycle()
+            n += 1
+
+    def impair(self, data):
+        if self.corrupt_rate:
+            data = bytearray(data)
+            units = data.count(b'\n') or len(data) // FRAME_SIZE
+            for _ in range(sum(self.random.random() < self.corrupt_rate for _ in range(max(units, 1)))):
+                data[self.random.randrange(len(data))] = self.random.randrange(256)
+                self.corrupted += 1
+        if self.drop_rate:
+            kept = bytes(byte for byte in data if self.random.random() >= self.drop_rate)
+            self.bytes_dropped += len(data) - len(kept)
+            data = kept
+        return bytes(data)
+
+    def write(self, data):
+        # O mestre é não bloqueante para que stop() funcione mesmo com o buffer do pty cheio.
+        view = memoryview(data)
+        while view and not self.stopped.is_set():
+            select.select([], [self.master_fd], [], 0.1)
+            try:
+                written = os.write(self.master_fd, view)
+            except BlockingIOError:
+                continue
+            self.bytes_written += written
+            view = view[written:]
+
+    def register(self):
+        os.makedirs(SIMULATED_PORTS_DIR, exist_ok=True)
+        n = 0
+        while True:
+            link = os.path.join(SIMULATED_PORTS_DIR, f'sim{n}')
+            try:
+                os.symlink(self.port, link)
+                break
+            except FileExistsError:
+                if not os.path.exists(os.path.realpath(link)):
+                    os.unlink(link)
+                    continue
+                n += 1
+        self.link = link
+
+    def start(self):
+        self.stopped.clear()
+        self.register()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self):
+        start = time.monotonic()
+        for t, data in self.chunks():
+            if self.stopped.is_set():
+                break
+            if self.speed:
+                delay = start + t / self.speed + self.random.uniform(0, self.jitter) - time.monotonic()
+                if delay > 0 and self.stopped.wait(delay):
+                    break
+            try:
+                self.write(self.impair(data))
+            except OSError:
+                break
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+
+    def close(self):
+        self.stop()
+        if self.link:
+            os.unlink(self.link)
+            self.link = None
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReplayDevice(FakeSerialDevice):
+    """Reproduz uma gravação feita com `record_session` em um pseudo-terminal."""
+
+    def __init__(self, path, loop=False, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.loop = loop
+
+    def chunks(self):
+        offset = 0.0
+        while True:
+            last = 0.0
+            for t, data in read_recording(self.path):
+                last = t
+                yield offset + t, data
+            if not self.loop:
+                return
+            offset += last
+
+
+def read_recording(path):
+    with open(path, 'rb') as f:
+        if f.read(len(RECORDING_MAGIC)) != RECORDING_MAGIC:
+            raise ValueError(f"{path} não é uma gravação serial do MindTV")
+        while True:
+            header = f.read(RECORDING_BLOCK.size)
+            if len(header) < RECORDING_BLOCK.size:
+                return
+            t, size = RECORDING_BLOCK.unpack(header)
+            data = f.read(size)
+            if len(data) < size:
+                return
+            yield t, data
+
+
+def record_session(port, path, duration, baudrate=115200):
+    """Grava os bytes brutos recebidos de `port` com o instante de chegada de cada bloco."""
+    total = 0
+    with serial.Serial(port, baudrate, timeout=0.1) as ser, open(path, 'wb') as f:
+        f.write(RECORDING_MAGIC)
+        start = time.monotonic()
+        while time.monotonic() - start < duration:
+            data = ser.read(max(1, ser.in_waiting))
+            if data:
+                f.write(RECORDING_BLOCK.pack(time.monotonic() - start, len(data)))
+                f.write(data)
+                total += len(data)
+    return total
+
+
+def serve(device):
+    with device:
+        print(f"Dispositivo simulado em {device.port} (Ctrl+C para encerrar)")
+        try:
+            while device.thread.is_alive():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        print(f"{device.bytes_written} bytes enviados, {device.bytes_dropped} descartados, {device.corrupted} corrompidos")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simula, grava e reproduz um Arduino MindTV em um pseudo-terminal.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    impairments = argparse.ArgumentParser(add_help=False)
+    impairments.add_argument('--speed', type=float, default=1.0, help="1 = tempo real, N = N vezes mais rápido, 0 = máximo")
+    impairments.add_argument('--jitter', type=float, default=0.0, help="atraso aleatório máximo por bloco, em segundos")
+    impairments.add_argument('--drop-rate', type=float, default=0.0, help="fração de bytes descartados")
+    impairments.add_argument('--corrupt-rate', type=float, default=0.0, help="fração de linhas/quadros corrompidos")
+    impairments.add_argument('--seed', type=int)
+
+    synth = commands.add_parser('synth', parents=[impairments], help="gera um fluxo sintético")
+    synth.add_argument('--binary', action='store_true', help="envia quadros binários em vez de texto")
+    synth.add_argument('--participants', type=int, default=1, choices=range(1, 11), metavar='1-10')
+    rate = synth.add_mutually_exclusive_group()
+    rate.add_argument('--rate', type=float, default=20.0, help="ciclos por segundo")
+    rate.add_argument('--samples-per-minute', type=int, choices=SAMPLES_PER_MINUTE)
+
+    record = commands.add_parser('record', help="grava uma sessão real")
+    record.add_argument('port')
+    record.add_argument('output')
+    record.add_argument('--seconds', type=float, default=60.0)
+
+    replay = commands.add_parser('replay', parents=[impairments], help="reproduz uma gravação")
+    replay.add_argument('recording')
+    replay.add_argument('--loop', action='store_true')
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        total = record_session(args.port, args.output, args.seconds)
+        print(f"{total} bytes gravados em {args.output}")
+        return
+    kwargs = dict(speed=args.speed, jitter=args.jitter, drop_rate=args.drop_rate,
+                  corrupt_rate=args.corrupt_rate, seed=args.seed)
+    if args.command == 'synth':
+        rate = args.samples_per_minute / 60.0 if args.samples_per_minute else args.rate
+        serve(FakeSerialDevice(args.binary, args.participants, rate, **kwargs))
+    else:
+        serve(ReplayDevice(args.recording, args.loop, **kwargs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+# Janela (em amostras de um mesmo participante) e passo entre janelas consecutivas.
+WINDOW = 32
+STEP = 8
+FEATURES_VERSION = 1
+FEATURE_NAMES = [
+    'gsr_mean', 'gsr_std', 'gsr_slope',
+    'bpm_mean', 'bpm_std', 'beat_avg_mean',
+    'ir_beats', 'ibi_mean', 'ibi_std',
+]
+SENSOR_COLUMNS = ['irValue', 'beatsPerMinute', 'beatAvg', 'GSR']
+# Grupo de uma janela em grouped_windows: índice do arquivo * FILE_GROUP_STRIDE + chave do fluxo.
+FILE_GROUP_STRIDE = 65536
+
+# Colunas das somas acumuladas mantidas por FeatureExtractor.
+_GSR, _GSR2, _KGSR, _BPM, _BPM2, _AVG, _BEAT, _IBI, _IBI2, _HAS_IBI = range(10)
+
+
+class FeatureConfig:
+    """Parâmetros das janelas; guardados no modelo treinado em `feature_config_`."""
+
+    def __init__(self, window=WINDOW, step=STEP):
+        self.window = window
+        self.step = step
+
+    def to_dict(self):
+        return {'version': FEATURES_VERSION, 'window': self.window, 'step': self.step, 'features': FEATURE_NAMES}
+
+    @classmethod
+    def from_dict(cls, config):
+        if config['version'] != FEATURES_VERSION:
+            raise ValueError(f"Versão de atributos {config['version']} não suportada (esperada {FEATURES_VERSION})")
+        return cls(config['window'], config['step'])
+
+
+def attach_config(model, config):
+    model.feature_config_ = config.to_dict()
+    return model
+
+
+def config_from_model(model):
+    """FeatureConfig do modelo, ou None para modelos antigos treinados com amostras brutas."""
+    config = getattr(model, 'feature_config_', None)
+    return FeatureConfig.from_dict(config) if config else None
+
+
+class FeatureExtractor:
+    """Atributos por janela deslizante de um fluxo de amostras de um participante.
+
+    `update` recebe um bloco de amostras (de qualquer tamanho) e devolve os
+    atributos de todas as janelas que terminaram nele. Cada janela é obtida
+    da diferença de duas somas acumuladas, e o estado carregado entre blocos
+    é só o das últimas `window` somas, a média exponencial do irValue e a
+    última batida; o custo é O(1) por amostra e por janela, e processar um
+    fluxo de uma vez ou em blocos dá o mesmo resultado.
+
+    Batidas são as subidas do irValue pela sua média exponencial; o intervalo
+    entre batidas (em amostras) é atribuído à amostra da batida que o fecha.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or FeatureConfig()
+        self.count = 0
+        self.prefix = np.zeros((1, _HAS_IBI + 1))
+        self.ema = None
+        self.last_detrended = 0.0
+        self.last_beat = -1
+        self.alpha = 2.0 / (self.config.window + 1)
+
+    def update(self, gsr, bpm, beat_avg, ir):
+        """Devolve (atributos, índice da última amostra de cada janela)."""
+        n = len(gsr)
+        if not n:
+            return np.zeros((0, len(FEATURE_NAMES)), dtype=np.float32), np.zeros(0, dtype=np.int64)
+        gsr, bpm, beat_avg = (np.asarray(values, dtype=np.float64) for values in (gsr, bpm, beat_avg))
+        ir = np.nan_to_num(np.asarray(ir, dtype=np.float64))
+        index = np.arange(self.count, self.count + n)
+
+        if self.ema is None:
+            self.ema = ir[0]
+        ema, _ = lfilter([self.alpha], [1.0, self.alpha - 1.0], ir, zi=[(1.0 - self.alpha) * self.ema])
+        detrended = ir - ema
+        previous = np.concatenate(([self.last_detrended], detrended[:-1]))
+        beats = (previous < 0) & (detrended >= 0)
+        beat_index = index[beats]
+        previous_beat = np.concatenate(([self.last_beat], beat_index[:-1]))
+        has_ibi = np.zeros(n)
+        ibi = np.zeros(n)
+        has_ibi[beats] = previous_beat >= 0
+        ibi[beats] = np.where(previous_beat >= 0, beat_index - previous_beat, 0)
+
+        values = np.column_stack((gsr, gsr * gsr, index * gsr, bpm, bpm * bpm, beat_avg,
+                                  beats, ibi, ibi * ibi, has_ibi))
+        prefix = np.vstack((self.prefix, self.prefix[-1] + np.cumsum(values, axis=0)))
+        first = self.count + 1 - len(self.prefix)
+
+        window, step = self.config.window, self.config.step
+        start = max(0, -(-(self.count + 1 - window) // step) * step)
+        starts = np.arange(start, self.count + n - window + 1, step)
+        sums = prefix[starts + window - first] - prefix[starts - first]
+        features = self._features(sums, starts)
+
+        self.count += n
+        self.prefix = prefix[-window:]
+        self.ema = ema[-1]
+        self.last_detrended = detrended[-1]
+        if len(beat_index):
+            self.last_beat = beat_index[-1]
+        return features, starts + window - 1
+
+    def _features(self, sums, starts):
+        w = self.config.window
+        gsr_mean = sums[:, _GSR] / w
+        bpm_mean = sums[:, _BPM] / w
+        # Inclinação por mínimos quadrados com j = 0..w-1 dentro da janela.
+        centered = sums[:, _KGSR] - (starts + (w - 1) / 2.0) * sums[:, _GSR]
+        ibis = sums[:, _HAS_IBI]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ibi_mean = np.where(ibis > 0, sums[:, _IBI] / ibis, 0.0)
+            ibi_var = np.where(ibis > 0, sums[:, _IBI2] / ibis - ibi_mean ** 2, 0.0)
+        return np.column_stack((
+            gsr_mean,
+            np.sqrt(np.maximum(sums[:, _GSR2] / w - gsr_mean ** 2, 0.0)),
+            centered / (w * (w * w - 1) / 12.0),
+            bpm_mean,
+            np.sqrt(np.maximum(sums[:, _BPM2] / w - bpm_mean ** 2, 0.0)),
+            sums[:, _AVG] / w,
+            sums[:, _BEAT],
+            ibi_mean,
+            np.sqrt(np.maximum(ibi_var, 0.0)),
+        )).astype(np.float32)
+
+    def update_samples(self, samples):
+        """`update` a partir de um array estruturado ou DataFrame com as colunas dos sensores."""
+        columns = [samples[column] if column in _names(samples) else np.zeros(len(samples)) for column in SENSOR_COLUMNS]
+        return self.update(columns[3], columns[1], columns[2], columns[0])
+
+
+def _names(samples):
+    return samples.dtype.names if isinstance(samples, np.ndarray) else samples.columns
+
+
+def stream_keys(samples):
+    """Identifica cada fluxo contínuo: porta de origem e participante, quando existirem."""
+    names = _names(samples)
+    keys = np.zeros(len(samples), dtype=np.int64)
+    if 'source' in names:
+        keys += np.asarray(samples['source'], dtype=np.int64) * 256
+    if 'participant' in names:
+        keys += np.asarray(samples['participant'], dtype=np.int64)
+    return keys
+
+
+def extract_features(samples, config=None, extractors=None):
+    """Atributos das janelas de cada fluxo em `samples`.
+
+    `extractors` (dicionário chave do fluxo -> FeatureExtractor) mantém o
+    estado entre chamadas para processamento incremental. Devolve um
+    DataFrame com FEATURE_NAMES, a chave do fluxo e a posição em `samples`
+    da última amostra de cada janela.
+    """
+    extractors = {} if extractors is None else extractors
+    keys = stream_keys(samples)
+    frames, owners, rows = [], [], []
+    for key in np.unique(keys):
+        positions = np.flatnonzero(keys == key)
+        extractor = extractors.setdefault(int(key), FeatureExtractor(config))
+        first = extractor.count
+        features, ends = extractor.update_samples(samples[positions] if isinstance(samples, np.ndarray) else samples.iloc[positions])
+        frames.append(features)
+        owners.append(np.full(len(features), key))
+        rows.append(positions[ends - first])
+    if not frames:
+        return pd.DataFrame(columns=FEATURE_NAMES, dtype=np.float32), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return pd.DataFrame(np.concatenate(frames), columns=FEATURE_NAMES), np.concatenate(owners), np.concatenate(rows)
+
+
+def training_windows(dfs, config=None):
+    """X (atributos) e y (Content da última amostra de cada janela) de vários arquivos.
+
+    Cada arquivo é um fluxo independente; janelas nunca cruzam arquivos.
+    """
+    X, y, _ = grouped_windows(dfs, config)
+    return X, y
+
+
+def grouped_windows(dfs, config=None):
+    """Como `training_windows`, mais o grupo de cada janela: arquivo e fluxo (porta e participante).
+
+    Janelas de um mesmo grupo são vizinhas no tempo e não devem ser separadas
+    entre treino e validação.
+    """
+    Xs, ys, groups = [], [], []
+    for index, df in enumerate(dfs):
+        X, keys, rows = extract_features(df.reset_index(drop=True), config)
+        Xs.append(X)
+        ys.append(df['Content'].to_numpy()[rows])
+        groups.append(index * FILE_GROUP_STRIDE + keys)
+    return pd.concat(Xs, ignore_index=True), np.concatenate(ys), np.concatenate(groups)
+
+
+def model_inputs(model, samples, raw_columns, extractors=None):
+    """Entradas do modelo e participante de cada uma, por janela ou por amostra.
+
+    Modelos com `feature_config_` recebem atributos por janela; modelos
+    antigos recebem as colunas `raw_columns` de cada amostra.
+    """
+    config = config_from_model(model)
+    if config is None:
+        X = pd.DataFrame({column: samples[column] for column in raw_columns})
+        owners = np.asarray(samples['participant']) if 'participant' in _names(samples) else np.zeros(len(samples), dtype=np.int64)
+    else:
+        X, keys, _ = extract_features(samples, config, extractors)
+        owners = keys % 256
+    return X, owners
+
+
+def predict_samples(model, samples, raw_columns, extractors=None):
+    """Previsões e participante de cada previsão, por janela ou por amostra (ver `model_inputs`)."""
+    X, owners = model_inputs(model, samples, raw_columns, extractors)
+    return (model.predict(X) if len(X) else np.zeros(0)), owners
+
+
+def predict_proba_samples(model, samples, raw_columns, extractors=None):
+    """Como `predict_samples`, com as probabilidades de cada classe (na ordem de `model.classes_`) no lugar do rótulo."""
+    X, owners = model_inputs(model, samples, raw_columns, extractors)
+    return (model.predict_proba(X) if len(X) else np.zeros((0, len(model.classes_)))), owners
+
+
+def sample_predictor(model, proba=False):
+    """`predict_samples` (ou `predict_proba_samples`, com `proba`) do modelo, como função (amostras, colunas, extratores).
+
+    Modelos por participante (personal_models.PersonalModels) fazem a própria
+    distribuição das janelas e fornecem o método de mesmo nome.
+    """
+    function = predict_proba_samples if proba else predict_samples
+    method = getattr(model, function.__name__, None)
+    return method if method is not None else partial(function, model)
@@ -0,0 +1,208 @@
+"""Busca de hiperparâmetros da floresta com validação cruzada agrupada por sessão e participante.
+
+Janelas vizinhas de uma mesma sessão são quase iguais; dividi-las
+aleatoriamente entre treino e teste superestima a acurácia. Aqui cada dobra
+deixa de fora sessões/participantes inteiros (GroupKFold). As configurações
+são avaliadas dobra a dobra em um pool de processos, e as que ficam mais de
+`prune_margin` abaixo da melhor média são abandonadas. O ranking é gravado em
+CSV com o tempo de treino e a latência de previsão de uma janela.
+
+    python hyperparam_search.py dados/ [--grid | --iterations 20] [--budget-ms 5] [--save]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import GroupKFold, ParameterGrid, ParameterSampler
+
+from compiled_forest import save_model
+from features import FILE_GROUP_STRIDE, FeatureConfig, attach_config, grouped_windows
+from ingestion import ingest, load_dataset
+from training import ForestTrainer, load_previous_model, update_history
+
+SEARCH_SPACE = {
+    'n_estimators': [50, 100, 200],
+    'max_depth': [None, 8, 16],
+    'min_samples_leaf': [1, 4, 16],
+    'max_features': ['sqrt', 0.5, None],
+}
+FOLDS = 5
+ITERATIONS = 20
+PRUNE_MARGIN = 0.05
+PREDICT_REPEATS = 20
+LEADERBOARD_FILE = 'busca_hiperparametros.csv'
+
+_data = {}
+
+
+def _init_worker(X, y):
+    _data['X'], _data['y'] = X, y
+
+
+def evaluate(params, train, test):
+    """Treina com `params` nas linhas `train` e devolve (acurácia, segundos de treino, ms por previsão)."""
+    X, y = _data['X'], _data['y']
+    model = RandomForestClassifier(random_state=42, n_jobs=1, **params)
+    start = time.perf_counter()
+    model.fit(X[train], y[train])
+    fit_seconds = time.perf_counter() - start
+    accuracy = float(np.mean(model.predict(X[test]) == y[test]))
+    # Latência de uma janela isolada, como na previsão ao vivo.
+    window = X[test[:1]]
+    latencies = []
+    for _ in range(PREDICT_REPEATS):
+        start = time.perf_counter()
+        model.predict(window)
+        latencies.append(time.perf_counter() - start)
+    return accuracy, fit_seconds, 1000 * float(np.median(latencies))
+
+
+class Candidate:
+    def __init__(self, params):
+        self.params = params
+        self.scores = []
+        self.fit_seconds = []
+        self.predict_ms = []
+        self.pruned = False
+
+    @property
+    def accuracy(self):
+        return float(np.mean(self.scores)) if self.scores else 0.0
+
+    @property
+    def latency_ms(self):
+        return float(np.median(self.predict_ms)) if self.predict_ms else 0.0
+
+    def rank_key(self):
+        # Configurações avaliadas em todas as dobras primeiro, por acurácia média e depois latência.
+        return (self.pruned, -self.accuracy, self.latency_ms)
+
+
+def candidates(grid=False, iterations=ITERATIONS, space=SEARCH_SPACE, seed=0):
+    params = ParameterGrid(space) if grid else ParameterSampler(space, iterations, random_state=seed)
+    return [Candidate(dict(p)) for p in params]
+
+
+def search(X, y, groups, candidates, folds=FOLDS, workers=None, prune_margin=PRUNE_MARGIN, on_round=None):
+    """Avalia `candidates` com GroupKFold, dobra a dobra, abandonando as configurações sem chance.
+
+    `on_round(dobra, dobras, restantes)` é chamado antes de cada dobra.
+    """
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y)
+    folds = min(folds, len(np.unique(groups)))
+    if folds < 2:
+        raise ValueError("São necessárias pelo menos 2 sessões ou participantes para a validação agrupada")
+    splits = list(GroupKFold(folds).split(X, y, groups))
+    workers = workers or os.cpu_count()
+    executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(X, y)) if workers > 1 else None
+    if executor is None:
+        _init_worker(X, y)
+    try:
+        for fold, (train, test) in enumerate(splits):
+            alive = [candidate for candidate in candidates if not candidate.pruned]
+            if on_round:
+                on_round(fold + 1, folds, len(alive))
+            jobs = [(candidate.params, train, test) for candidate in alive]
+            results = executor.map(evaluate, *zip(*jobs)) if executor else [evaluate(*job) for job in jobs]
+            for candidate, (accuracy, fit_seconds, predict_ms) in zip(alive, results):
+                candidate.scores.append(accuracy)
+                candidate.fit_seconds.append(fit_seconds)
+                candidate.predict_ms.append(predict_ms)
+            best = max(candidate.accuracy for candidate in alive)
+            for candidate in alive:
+                candidate.pruned = candidate.accuracy < best - prune_margin
+    finally:
+        if executor:
+            executor.shutdown()
+    return candidates
+
+
+def within_budget(candidate, budget_ms):
+    return budget_ms is None or candidate.latency_ms <= budget_ms
+
+
+def leaderboard(candidates, budget_ms=None):
+    """Ranking das configurações, com tempo de treino e latência ao lado da acurácia."""
+    ranked = sorted(candidates, key=Candidate.rank_key)
+    board = pd.DataFrame([{
+        'rank': rank,
+        'accuracy_mean': candidate.accuracy,
+        'accuracy_std': float(np.std(candidate.scores)),
+        'folds': len(candidate.scores),
+        'fit_seconds': float(np.mean(candidate.fit_seconds)),
+        'predict_ms': candidate.latency_ms,
+        'within_budget': within_budget(candidate, budget_ms),
+        'status': 'abandonada' if candidate.pruned else 'completa',
+    } for rank, candidate in enumerate(ranked, 1)])
+    for name in SEARCH_SPACE:
+        # object: mantém max_depth=None e inteiros sem conversão para float.
+        board[name] = pd.Series([candidate.params.get(name) for candidate in ranked], dtype=object)
+    return board
+
+
+def best_candidate(candidates, budget_ms=None):
+    """Melhor configuração avaliada em todas as dobras dentro do orçamento de latência (ou None)."""
+    eligible = [candidate for candidate in candidates if not candidate.pruned and within_budget(candidate, budget_ms)]
+    return min(eligible, key=Candidate.rank_key) if eligible else None
+
+
+def refit(params, X, y, groups, files, config, output='trained_model.joblib'):
+    """Treina a configuração escolhida com todos os dados e salva o modelo."""
+    params = dict(params)
+    n_estimators = params.pop('n_estimators')
+    trainer = ForestTrainer(n_estimators=n_estimators, params=params,
+                            on_progress=lambda percent: print(f"Treinamento: {percent}%"))
+    model = trainer.fit(X, y)
+    windows = np.bincount(groups // FILE_GROUP_STRIDE, minlength=len(files))
+    previous = load_previous_model(output)
+    records = [(path, digest, int(count)) for (path, digest), count in zip(files, windows)]
+    update_history(model, None, X, y, records, getattr(previous, 'model_version_', 0) + 1)
+    save_model(attach_config(model, config), output)
+    return model, trainer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('entries', nargs='+', help="arquivos, pastas ou padrões de dados de treino")
+    parser.add_argument('--grid', action='store_true', help="avalia toda a grade em vez de uma amostra aleatória")
+    parser.add_argument('--iterations', type=int, default=ITERATIONS, help="configurações sorteadas na busca aleatória")
+    parser.add_argument('--folds', type=int, default=FOLDS)
+    parser.add_argument('--workers', type=int, help="processos (padrão: um por núcleo)")
+    parser.add_argument('--prune-margin', type=float, default=PRUNE_MARGIN,
+                        help="abandona configurações abaixo da melhor média por mais que isso")
+    parser.add_argument('--budget-ms', type=float, help="latência máxima de previsão por janela")
+    parser.add_argument('--output', default=LEADERBOARD_FILE)
+    parser.add_argument('--save', action='store_true', help="treina a melhor configuração com todos os dados e salva o modelo")
+    args = parser.parse_args()
+
+    report = ingest(args.entries, args.workers)
+    for path, message in report.errors:
+        print(f"Arquivo ignorado: {path}: {message}")
+    print(report.summary())
+    config = FeatureConfig()
+    X, y, groups = grouped_windows([load_dataset(path, digest) for path, digest in report.files], config)
+    print(f"{len(X)} janelas em {len(np.unique(groups))} grupos (sessão e participante)")
+
+    found = search(X, y, groups, candidates(args.grid, args.iterations), args.folds, args.workers, args.prune_margin,
+                   on_round=lambda fold, folds, alive: print(f"Dobra {fold}/{folds}: {alive} configuração(ões)"))
+    board = leaderboard(found, args.budget_ms)
+    board.to_csv(args.output, index=False)
+    print(board.head(10).to_string(index=False))
+    print(f"Ranking gravado em {args.output}")
+
+    if args.save:
+        best = best_candidate(found, args.budget_ms)
+        if best is None:
+            print("Nenhuma configuração completa atende ao orçamento de latência; nenhum modelo foi salvo.")
+            return
+        model, trainer = refit(best.params, X, y, groups, report.files, config)
+        print(f"Modelo salvo como 'trained_model.joblib' (versão {model.model_version_}, {trainer.report(model)}): {best.params}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+import argparse
+import glob
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dataset_cache import file_digest
+from features import SENSOR_COLUMNS
+from session_log import SESSION_EXTENSION, SessionReader
+from training import read_training_file
+
+DATA_EXTENSIONS = ('.csv', SESSION_EXTENSION)
+# Nomes usados por collect_gsr_hr_data.py e pelo train_model.py original.
+SCHEMA_ALIASES = {'IR': 'irValue', 'BPM': 'beatsPerMinute', 'Avg_BPM': 'beatAvg', 'Label': 'Content'}
+REQUIRED_COLUMNS = ['GSR', 'Content']
+# Segmentos de sessão (sessao.1.mtv, ...) são lidos junto com o primeiro arquivo.
+SEGMENT_FILE = re.compile(r'\.\d+' + re.escape(SESSION_EXTENSION) + '$')
+# Abaixo disso os arquivos são verificados no próprio processo.
+MIN_PARALLEL_FILES = 8
+
+
+def _is_data_file(path):
+    return path.lower().endswith(DATA_EXTENSIONS) and not SEGMENT_FILE.search(path)
+
+
+def expand_entries(entries):
+    """Arquivos de dados de uma lista de arquivos, pastas (recursivamente) e padrões glob."""
+    paths = set()
+    for entry in entries:
+        if os.path.isdir(entry):
+            for directory, _, names in os.walk(entry):
+                paths.update(os.path.join(directory, name) for name in names if _is_data_file(name))
+        elif glob.has_magic(entry):
+            paths.update(path for path in glob.glob(entry, recursive=True) if _is_data_file(path))
+        else:
+            paths.add(entry)
+    return sorted(os.path.normpath(path) for path in paths)
+
+
+def normalize_columns(df):
+    return df.rename(columns=SCHEMA_ALIASES)
+
+
+def load_dataset(path, digest=None):
+    """Dados de um arquivo já no esquema único (irValue, beatsPerMinute, beatAvg, GSR, Content)."""
+    return normalize_columns(read_training_file(path, digest))
+
+
+def inspect_file(path):
+    """Verifica um arquivo (e converte CSVs para o cache); roda nos processos de leitura."""
+    result = {'path': path, 'digest': None, 'rows': 0, 'error': None, 'warnings': []}
+    try:
+        if path.endswith(SESSION_EXTENSION):
+            reader = SessionReader(path)
+            if not reader.header.get('content'):
+                raise ValueError("sessão sem conteúdo registrado (coluna Content)")
+            result['rows'] = len(reader)
+            result['digest'] = file_digest(path)
+        else:
+            result['digest'] = file_digest(path)
+            df = load_dataset(path, result['digest'])
+            missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+            if missing:
+                raise ValueError(f"colunas ausentes: {', '.join(missing)}")
+            for column in SENSOR_COLUMNS:
+                if column not in df.columns:
+                    result['warnings'].append(f"sem a coluna {column}; usando zeros")
+                elif df[column].dtype.kind not in 'iuf':
+                    raise ValueError(f"a coluna {column} não é numérica")
+            if df['Content'].isna().any():
+                raise ValueError("linhas sem Content")
+            result['rows'] = len(df)
+        if not result['rows']:
+            raise ValueError("arquivo sem amostras")
+    except Exception as e:
+        result['error'] = str(e) or type(e).__name__
+    return result
+
+
+class IngestReport:
+    """Resultado de `ingest`: arquivos aceitos (caminho, digest), erros e avisos por arquivo."""
+
+    def __init__(self):
+        self.files = []
+        self.errors = []
+        self.warnings = []
+        self.rows = 0
+
+    def summary(self):
+        return (f"{len(self.files)} arquivo(s) válidos com {self.rows} amostras, "
+                f"{len(self.errors)} ignorado(s), {len(self.warnings)} aviso(s)")
+
+
+def ingest(entries, workers=None, on_progress=None, cancelled=None):
+    """Localiza e verifica os arquivos de `entries` em paralelo.
+
+    Cada arquivo é verificado em um processo do pool (`workers`, padrão: um
+    por núcleo), que também converte os CSVs para o cache de `dataset_cache`;
+    depois disso `load_dataset` só mapeia as colunas já convertidas. Arquivos
+    inválidos ou com conteúdo repetido entram em `errors` em vez de
+    interromper a leitura. `on_progress(percentual)` é chamado a cada arquivo
+    e `cancelled` (threading.Event) interrompe a leitura.
+    """
+    paths = expand_entries(entries)
+    workers = workers or os.cpu_count()
+    results = [None] * len(paths)
+    finished = 0
+
+    def done(index, result):
+        nonlocal finished
+        results[index] = result
+        finished += 1
+        if on_progress:
+            on_progress(100 * finished // len(paths))
+
+    if workers > 1 and len(paths) >= MIN_PARALLEL_FILES:
+        with ProcessPoolExecutor(workers) as executor:
+            futures = {executor.submit(inspect_file, path): index for index, path in enumerate(paths)}
+            for future in as_completed(futures):
+                done(futures[future], future.result())
+                if cancelled is not None and cancelled.is_set():
+                    executor.shutdown(cancel_futures=True)
+                    break
+    else:
+        for index, path in enumerate(paths):
+            if cancelled is not None and cancelled.is_set():
+                break
+            done(index, inspect_file(path))
+
+    report = IngestReport()
+    seen = {}
+    for result in results:
+        if result is None:
+            continue
+        path = result['path']
+        if result['error']:
+            report.errors.append((path, result['error']))
+        elif result['digest'] in seen:
+            report.errors.append((path, f"conteúdo idêntico a {seen[result['digest']]}"))
+        else:
+            seen[result['digest']] = path
+            report.files.append((path, result['digest']))
+            report.warnings.extend((path, warning) for warning in result['warnings'])
+            report.rows += result['rows']
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica arquivos de treino (CSV e sessões .mtv) de pastas e padrões glob.")
+    parser.add_argument('entries', nargs='+', help="arquivos, pastas ou padrões como 'dados/**/*.csv'")
+    parser.add_argument('--workers', type=int, help="processos de leitura (padrão: um por núcleo)")
+    args = parser.parse_args()
+
+    report = ingest(args.entries, args.workers)
+    for path, message in report.errors:
+        print(f"Ignorado: {path}: {message}")
+    for path, message in report.warnings:
+        print(f"Aviso: {path}: {message}")
+    print(report.summary())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,349 @@
+"""Previsão ao vivo das janelas enquanto a coleta ainda está em andamento, com encerramento antecipado.
+
+    python live_prediction.py sessoes/ [--confidence 0.9 0.99 0.999] [--min-seconds 30]
+
+avalia o encerramento antecipado em sessões gravadas: para cada nível de
+confiança, o tempo de coleta economizado e a acurácia perdida em relação à
+previsão com a sessão inteira.
+"""
+import argparse
+from collections import deque
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from compiled_forest import MODEL_FILE
+from features import config_from_model, extract_features, sample_predictor
+from model_registry import get_model
+
+LIVE_CADENCE_SECONDS = 2.0
+# Janelas recentes de cada participante cuja média das probabilidades dá o rótulo atual.
+LIVE_HORIZON_WINDOWS = 8
+LIVE_TOP_CLASSES = 3
+EARLY_STOP_CONFIDENCE = 0.99
+EARLY_STOP_MIN_SECONDS = 30
+EARLY_STOP_MIN_WINDOWS = 8
+# Amostras por segundo assumidas para CSVs, que não registram o instante de cada amostra.
+CSV_SAMPLE_RATE = 256 / 60
+
+
+class ProbabilityTally:
+    """Somas das probabilidades de todas as janelas de um participante e dos seus produtos (matriz de Gram).
+
+    Bastam para a média e a variância da diferença de probabilidade entre
+    quaisquer duas classes, sem guardar as janelas.
+    """
+
+    def __init__(self, classes):
+        self.classes = classes
+        self.n = 0
+        self.sums = np.zeros(len(classes))
+        self.gram = np.zeros((len(classes), len(classes)))
+
+    def add(self, proba):
+        self.n += len(proba)
+        self.sums += proba.sum(axis=0)
+        self.gram += proba.T @ proba
+
+    def leader(self):
+        return self.classes[int(np.argmax(self.sums))]
+
+    def margin(self, overlap=1.0):
+        """Estatística z da vantagem da classe líder sobre a segunda colocada.
+
+        As janelas se sobrepõem (`overlap` = janela / passo) e não são
+        independentes; o tamanho efetivo da amostra é n / overlap.
+        """
+        if self.n < 2 or len(self.classes) < 2:
+            return 0.0
+        first, second = np.argsort(-self.sums)[:2]
+        mean = (self.sums[first] - self.sums[second]) / self.n
+        square = (self.gram[first, first] + self.gram[second, second] - 2 * self.gram[first, second]) / self.n
+        variance = max(square - mean ** 2, 0.0) * self.n / (self.n - 1)
+        if variance == 0.0:
+            return np.inf if mean > 0 else 0.0
+        return float(mean / np.sqrt(variance / (self.n / overlap)))
+
+
+class EarlyStopping:
+    """Decide quando a coleta pode terminar: todos os participantes com a classe líder definida.
+
+    A classe líder de um participante está definida quando a média da
+    diferença de probabilidade para a segunda colocada é positiva com
+    `confidence` (teste z unilateral), com pelo menos `min_windows` janelas.
+    Nada termina antes de `min_seconds` de coleta.
+    """
+
+    def __init__(self, confidence=EARLY_STOP_CONFIDENCE, min_seconds=EARLY_STOP_MIN_SECONDS,
+                 min_windows=EARLY_STOP_MIN_WINDOWS):
+        self.confidence = confidence
+        self.min_seconds = min_seconds
+        self.min_windows = min_windows
+        self.threshold = NormalDist().inv_cdf(confidence)
+
+    def settled(self, tally, overlap=1.0):
+        return tally.n >= self.min_windows and tally.margin(overlap) >= self.threshold
+
+    def should_stop(self, tallies, elapsed, overlap=1.0):
+        return (elapsed >= self.min_seconds and bool(tallies)
+                and all(self.settled(tally, overlap) for tally in tallies.values()))
+
+
+class LiveEstimate:
+    def __init__(self, participant, label, probabilities, windows, tally=None, settled=False):
+        self.participant = participant
+        self.label = label
+        self.probabilities = probabilities
+        self.windows = windows
+        self.tally = tally
+        self.settled = settled
+
+    def top(self, count=LIVE_TOP_CLASSES):
+        return sorted(self.probabilities.items(), key=lambda item: -item[1])[:count]
+
+
+class LivePredictor:
+    """Atributos e probabilidades calculados de forma incremental, bloco a bloco de amostras.
+
+    Cada chamada de `update` processa só as amostras novas: os extratores de
+    cada fluxo guardam o estado entre blocos, como em `session_log.predict_session`.
+    O rótulo de cada participante é a classe de maior probabilidade média nas
+    últimas `horizon` janelas; `tallies` acumula as probabilidades de todas
+    as janelas da sessão, usadas por `EarlyStopping`. `model` é o modelo da
+    previsão final da sessão (por exemplo, PersonalModels ou o RemoteModel do
+    serviço de previsão), para que o rótulo ao vivo seja o mesmo. Sem ele, o
+    modelo vem do registro a cada bloco; se o treinamento salvar um modelo
+    novo, a previsão passa a usá-lo.
+    """
+
+    def __init__(self, raw_columns, model_path=MODEL_FILE, horizon=LIVE_HORIZON_WINDOWS, early_stopping=None,
+                 model=None):
+        self.raw_columns = raw_columns
+        self.model_path = model_path
+        self.source = model
+        self.horizon = horizon
+        self.early_stopping = early_stopping
+        self.model = None
+        self.classes = None
+        self.feature_config = None
+        self.extractors = {}
+        self.recent = {}
+        self.tallies = {}
+
+    def reset(self):
+        """Descarta o estado das janelas em andamento (por exemplo, depois de amostras perdidas)."""
+        self.extractors.clear()
+
+    def _use(self, model):
+        # Compara classes e atributos, não o objeto: PersonalModels e RemoteModel podem trocar o modelo por dentro.
+        classes, feature_config = list(model.classes_), getattr(model, 'feature_config_', None)
+        if self.model is not None:
+            if classes != self.classes:
+                self.recent.clear()
+                self.tallies.clear()
+            if feature_config != self.feature_config:
+                self.reset()
+        self.model, self.classes, self.feature_config = model, classes, feature_config
+
+    def update(self, samples):
+        self._use(self.source if self.source is not None else get_model(self.model_path))
+        proba, owners = sample_predictor(self.model, proba=True)(samples, self.raw_columns, self.extractors)
+        if len(proba):
+            for participant in np.unique(owners):
+                recent = self.recent.setdefault(int(participant), deque(maxlen=self.horizon))
+                recent.extend(proba[owners == participant])
+                self.tallies.setdefault(int(participant), ProbabilityTally(self.model.classes_)).add(proba[owners == participant])
+        return self.estimates()
+
+    def overlap(self):
+        config = config_from_model(self.model) if self.model is not None else None
+        return config.window / config.step if config else 1.0
+
+    def should_stop(self, elapsed):
+        return self.early_stopping is not None and self.early_stopping.should_stop(self.tallies, elapsed, self.overlap())
+
+    def estimates(self):
+        classes = self.model.classes_ if self.model is not None else []
+        estimates = []
+        for participant, recent in sorted(self.recent.items()):
+            mean = np.mean(recent, axis=0)
+            tally = self.tallies.get(participant)
+            settled = bool(self.early_stopping and tally and self.early_stopping.settled(tally, self.overlap()))
+            estimates.append(LiveEstimate(participant, classes[int(np.argmax(mean))],
+                                          dict(zip(classes, mean.tolist())), len(recent), tally, settled))
+        return estimates
+
+
+def run_live(store, predictor, stopped, on_estimates, cadence=LIVE_CADENCE_SECONDS, on_settled=None):
+    """Prevê as amostras novas de `store` a cada `cadence` segundos, até `stopped` (threading.Event).
+
+    Com `predictor.early_stopping`, `on_settled()` é chamado uma vez, assim que
+    a previsão de todos os participantes estiver definida; cabe a quem o
+    recebe encerrar a coleta (e com ela `stopped`).
+
+    Roda na sua própria thread: as threads de leitura das portas só disputam
+    com ela o lock do `SampleStore` durante a cópia das amostras novas.
+    Amostras sobrescritas no buffer circular antes de serem lidas reiniciam as
+    janelas em andamento. Depois de `stopped`, as últimas amostras ainda são previstas.
+    """
+    cursor = 0
+    settled = False
+    while True:
+        finished = stopped.wait(cadence)
+        samples, lost = store.since(cursor)
+        cursor += len(samples) + lost
+        if lost:
+            predictor.reset()
+        if len(samples):
+            on_estimates(predictor.update(samples))
+            if not settled and predictor.should_stop(store.now()):
+                settled = True
+                if on_settled:
+                    on_settled()
+        if finished:
+            return
+
+
+def format_estimates(estimates, people=None):
+    """Texto das estimativas, uma linha por participante."""
+    if not estimates:
+        return "Ao vivo: aguardando a primeira janela de amostras..."
+    lines = []
+    for estimate in estimates:
+        name = f"Participante {estimate.participant + 1}"
+        if people and estimate.participant < len(people) and people[estimate.participant]:
+            name += f" ({people[estimate.participant]})"
+        top = ", ".join(f"{label} {100 * p:.0f}%" for label, p in estimate.top())
+        line = f"{name}: {estimate.label} [{top}]"
+        if estimate.tally is not None and estimate.tally.n:
+            line += f" | sessão: {estimate.tally.leader()}" + (" (definida)" if estimate.settled else "")
+        lines.append(line)
+    if len(lines) == 1 and not people:
+        return f"Ao vivo: {lines[0].partition(': ')[2]}"
+    return "Ao vivo:\n" + "\n".join(lines)
+
+
+def session_windows(model, path, digest=None, raw_columns=None, rate=CSV_SAMPLE_RATE):
+    """Probabilidades de cada janela de um arquivo gravado: (instantes, participantes, probabilidades, rótulos reais)."""
+    from ingestion import load_dataset
+    from session_log import SESSION_EXTENSION, SessionReader
+
+    df = load_dataset(path, digest)
+    times = SessionReader(path).column('t', np.float64) if path.endswith(SESSION_EXTENSION) else np.arange(len(df)) / rate
+    config = config_from_model(model)
+    if config is None:
+        X = df[raw_columns]
+        owners = df['participant'].to_numpy(np.int64) if 'participant' in df.columns else np.zeros(len(df), dtype=np.int64)
+        rows = np.arange(len(df))
+    else:
+        X, keys, rows = extract_features(df, config)
+        owners = keys % 256
+    truth = df['Content'].to_numpy()[rows] if 'Content' in df.columns else np.full(len(rows), None)
+    proba = model.predict_proba(X) if len(X) else np.zeros((0, len(model.classes_)))
+    return times[rows], owners, proba, truth
+
+
+def majority(labels):
+    values, counts = np.unique(labels, return_counts=True)
+    return values[np.argmax(counts)] if len(values) else None
+
+
+def simulate_early_stop(times, owners, proba, classes, early_stopping, overlap=1.0, cadence=LIVE_CADENCE_SECONDS):
+    """Repete a coleta ao vivo de uma sessão gravada e devolve o instante em que ela teria sido encerrada."""
+    order = np.argsort(times, kind='stable')
+    times, owners, proba = times[order], owners[order], proba[order]
+    duration = float(times[-1]) if len(times) else 0.0
+    tallies = {}
+    added = 0
+    for tick in np.arange(cadence, duration + cadence, cadence):
+        end = np.searchsorted(times, tick, side='right')
+        for participant in np.unique(owners[added:end]):
+            mask = owners[added:end] == participant
+            tallies.setdefault(int(participant), ProbabilityTally(classes)).add(proba[added:end][mask])
+        added = end
+        if early_stopping.should_stop(tallies, tick, overlap):
+            return float(tick), duration
+    return duration, duration
+
+
+def evaluate_early_stop(model, files, confidences, min_seconds=EARLY_STOP_MIN_SECONDS, cadence=LIVE_CADENCE_SECONDS,
+                        raw_columns=None, rate=CSV_SAMPLE_RATE):
+    """Uma linha por sessão, participante e confiança: duração, instante de encerramento e previsões com e sem ele."""
+    config = config_from_model(model)
+    overlap = config.window / config.step if config else 1.0
+    classes = np.asarray(model.classes_)
+    records = []
+    for path, digest in files:
+        times, owners, proba, truth = session_windows(model, path, digest, raw_columns, rate)
+        votes = classes[np.argmax(proba, axis=1)] if len(proba) else np.array([])
+        for confidence in confidences:
+            stop, duration = simulate_early_stop(times, owners, proba, classes,
+                                                 EarlyStopping(confidence, min_seconds), overlap, cadence)
+            for participant in np.unique(owners):
+                mine = owners == participant
+                records.append({
+                    'file': path,
+                    'participant': int(participant) + 1,
+                    'confidence': confidence,
+                    'duration_seconds': duration,
+                    'stop_seconds': stop,
+                    'truth': majority(truth[mine]),
+                    'full_prediction': majority(votes[mine]),
+                    'early_prediction': majority(votes[mine & (times <= stop)]),
+                })
+    return pd.DataFrame(records)
+
+
+def summarize_early_stop(results):
+    """Por confiança: tempo economizado e acurácia com a sessão inteira e com o encerramento antecipado."""
+    rows = []
+    for confidence, group in results.groupby('confidence'):
+        sessions = group.drop_duplicates('file')
+        known = group[group['truth'].notna()]
+        full = float((known['full_prediction'] == known['truth']).mean()) if len(known) else None
+        early = float((known['early_prediction'] == known['truth']).mean()) if len(known) else None
+        rows.append({
+            'confidence': confidence,
+            'sessions': len(sessions),
+            'participants': len(group),
+            'mean_minutes': sessions['duration_seconds'].mean() / 60,
+            'mean_stop_minutes': sessions['stop_seconds'].mean() / 60,
+            'time_saved_percent': 100 * (1 - sessions['stop_seconds'].sum() / sessions['duration_seconds'].sum()),
+            'agreement_percent': 100 * float((group['early_prediction'] == group['full_prediction']).mean()),
+            'accuracy_full_percent': 100 * full if full is not None else None,
+            'accuracy_early_percent': 100 * early if early is not None else None,
+            'accuracy_lost_points': 100 * (full - early) if full is not None else None,
+        })
+    return pd.DataFrame(rows)
+
+
+def main():
+    from compiled_forest import load_model
+    from ingestion import ingest
+
+    parser = argparse.ArgumentParser(description="Avalia o encerramento antecipado da coleta em sessões gravadas.")
+    parser.add_argument('entries', nargs='+', help="sessões .mtv ou CSVs (de preferência não usados no treino)")
+    parser.add_argument('--model', default=MODEL_FILE)
+    parser.add_argument('--confidence', type=float, nargs='+', default=[0.9, 0.95, EARLY_STOP_CONFIDENCE, 0.999])
+    parser.add_argument('--min-seconds', type=float, default=EARLY_STOP_MIN_SECONDS, help="duração mínima da coleta")
+    parser.add_argument('--cadence', type=float, default=LIVE_CADENCE_SECONDS, help="intervalo entre previsões ao vivo")
+    parser.add_argument('--rate', type=float, default=CSV_SAMPLE_RATE, help="amostras por segundo dos CSVs")
+    parser.add_argument('--output', help="CSV com o resultado de cada sessão e participante")
+    args = parser.parse_args()
+
+    report = ingest(args.entries)
+    for path, message in report.errors:
+        print(f"Arquivo ignorado: {path}: {message}")
+    results = evaluate_early_stop(load_model(args.model), report.files, args.confidence, args.min_seconds,
+                                  args.cadence, ['beatsPerMinute', 'beatAvg', 'GSR'], args.rate)
+    if results.empty:
+        raise SystemExit("Nenhuma janela de previsão nas sessões informadas")
+    if args.output:
+        results.to_csv(args.output, index=False)
+    print(summarize_early_stop(results).to_string(index=False, float_format=lambda value: f"{value:.1f}",
+                                                  formatters={'confidence': '{:g}'.format}))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,43 +1,66 @@
 import sys
-from PyQt5.QtWidgets import QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout, QLabel, QComboBox, QPushButton, QTextEdit, QSpinBox, QFileDialog, QProgressBar, QDialog
+import threading
+from PyQt5.QtWidgets import QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout, QLabel, QComboBox, QPushButton, QSpinBox, QFileDialog, QProgressBar, QDialog, QListWidget, QAbstractItemView, QCheckBox, QLineEdit
 from PyQt5.QtCore import QThread, pyqtSignal, QTimer
-import pandas as pd
-import serial
-import serial.tools.list_ports
-from joblib import load, dump
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
+from compiled_forest import save_model
+from model_registry import get_model
+from prediction_cache import window_probabilities
+from prediction_service import remote_model
+from live_prediction import EARLY_STOP_MIN_SECONDS, LIVE_CADENCE_SECONDS, EarlyStopping, LivePredictor, format_estimates, run_live
+from acquisition import AcquisitionEngine
+from sample_store import SampleStore
+from serial_reader import list_serial_ports
+from session_log import SESSION_BUFFER_SAMPLES, SESSIONS_DIR, SessionWriter, export_session_csv, new_session_path, recover_session
+from features import FeatureConfig
+from ingestion import ingest, load_dataset
+from training import ForestTrainer, can_extend, load_previous_model, train_sessions, unseen_files
+from ui_updates import LogOutput, UiThrottle
 
 # Coleta Inicial
 class DataCollectionThread(QThread):
     log_signal = pyqtSignal(str)
-    data_signal = pyqtSignal(list)
+    data_signal = pyqtSignal(object)
     progress_signal = pyqtSignal(int)
 
-    def __init__(self, port, duration):
+    def __init__(self, ports, duration, binary=False, session_path=None, content=None):
         super().__init__()
-        self.port = port
+        self.ports = ports
         self.duration = duration
+        self.binary = binary
+        self.session_path = session_path
+        self.content = content
+        self.store = SampleStore(max_samples=SESSION_BUFFER_SAMPLES) if session_path else SampleStore()
         self.collecting = True
 
     def run(self):
+        writer = None
         try:
-            ser = serial.Serial(self.port, 115200)
-            collected_data = []
-            start_time = pd.Timestamp.now()
-            while (pd.Timestamp.now() - start_time).seconds < self.duration:
-                data = ser.readline().decode('utf-8').strip()
-                self.log_signal.emit(data)
-                data_split = data.split(',')
-                if len(data_split) == 4:
-                    collected_data.append([float(data_split[0]), float(data_split[1]), float(data_split[2]), float(data_split[3])])
-                elapsed_time = (pd.Timestamp.now() - start_time).seconds
-                progress = int((elapsed_time / self.duration) * 100)
-                self.progress_signal.emit(progress)
-            self.data_signal.emit(collected_data)
-            ser.close()
+            ui = UiThrottle(self.log_signal.emit, self.progress_signal.emit)
+            if self.session_path:
+                writer = SessionWriter(self.session_path, {'ports': self.ports, 'binary': self.binary, 'content': self.content})
+            engine = AcquisitionEngine(self.ports, self.binary, self.store, ui.log_many)
+            store = engine.store
+
+            def tick():
+                if writer:
+                    writer.drain(store)
+                ui.set_progress(min(store.now() / self.duration, 1.0) * 100)
+                ui.poll()
+
+            engine.run_until(lambda: not self.collecting or store.now() >= self.duration, tick)
+            for port, error in engine.errors:
+                ui.log(f"Erro durante a coleta de dados ({port}): {str(error)}")
+            if writer:
+                writer.close()
+                if writer.lost:
+                    ui.log(f"Aviso: {writer.lost} amostras não foram gravadas em {self.session_path}.")
+            ui.flush()
+            self.data_signal.emit(store)
         except Exception as e:
             self.log_signal.emit(f"Erro durante a coleta de dados: {str(e)}")
+        finally:
+            if writer:
+                writer.close()
 
     def stop(self):
         self.collecting = False
@@ -50,20 +73,23 @@ class ColetaInicial(QWidget):
     def initUI(self):
         layout = QVBoxLayout()
 
-        self.port_label = QLabel("Selecione a Porta Serial:")
+        self.port_label = QLabel("Selecione a(s) Porta(s) Serial(is):")
         layout.addWidget(self.port_label)
 
-        self.port_combo = QComboBox(self)
-        ports = serial.tools.list_ports.comports()
-        for port in ports:
-            self.port_combo.addItem(port.device)
-        layout.addWidget(self.port_combo)
+        self.port_list = QListWidget(self)
+        self.port_list.setSelectionMode(QAbstractItemView.MultiSelection)
+        for port in list_serial_ports():
+            self.port_list.addItem(port)
+        if self.port_list.count():
+            self.port_list.item(0).setSelected(True)
+        self.port_list.setMaximumHeight(100)
+        layout.addWidget(self.port_list)
 
         self.duration_label = QLabel("Tempo de Coleta (minutos):")
         layout.addWidget(self.duration_label)
 
         self.duration_combo = QComboBox(self)
-        self.duration_combo.addItems(["1", "2", "3", "4", "5"])
+        self.duration_combo.addItems(["1", "2", "3", "4", "5", "10", "15", "30", "60", "120"])
         layout.addWidget(self.duration_combo)
 
         self.content_label = QLabel("Tipo de Conteúdo Assistido:")
@@ -73,10 +99,21 @@ class ColetaInicial(QWidget):
         self.content_combo.addItems(["Reality Show", "Filme de Ação", "Filme de Comédia", "Programa de Política", "Jornal"])
         layout.addWidget(self.content_combo)
 
+        self.protocol_label = QLabel("Protocolo Serial:")
+        layout.addWidget(self.protocol_label)
+
+        self.protocol_combo = QComboBox(self)
+        self.protocol_combo.addItems(["Texto (ASCII)", "Binário"])
+        layout.addWidget(self.protocol_combo)
+
         self.collect_button = QPushButton('Iniciar Coleta', self)
         self.collect_button.clicked.connect(self.collect_data)
         layout.addWidget(self.collect_button)
 
+        self.open_session_button = QPushButton('Abrir Sessão Gravada', self)
+        self.open_session_button.clicked.connect(self.open_session)
+        layout.addWidget(self.open_session_button)
+
         self.export_button = QPushButton('Exportar CSV', self)
         self.export_button.clicked.connect(self.export_csv)
         self.export_button.setEnabled(False)
@@ -85,27 +122,34 @@ class ColetaInicial(QWidget):
         self.progress_bar = QProgressBar(self)
         layout.addWidget(self.progress_bar)
 
-        self.output = QTextEdit(self)
-        self.output.setReadOnly(True)
+        self.output = LogOutput(self)
         layout.addWidget(self.output)
 
         self.setLayout(layout)
         self.setWindowTitle('Coleta Inicial')
         self.show()
 
-    def get_selected_port(self):
-        return self.port_combo.currentText()
+    def get_selected_ports(self):
+        return [self.port_list.item(i).text() for i in range(self.port_list.count()) if self.port_list.item(i).isSelected()]
+
+    def get_binary_protocol(self):
+        return self.protocol_combo.currentText() == "Binário"
 
     def get_selected_duration(self):
         return int(self.duration_combo.currentText()) * 60
 
     def collect_data(self):
-        port = self.get_selected_port()
+        ports = self.get_selected_ports()
+        if not ports:
+            self.output.append("Erro: selecione pelo menos uma porta serial.")
+            return
         duration = self.get_selected_duration()
-        self.output.append(f"Iniciando coleta de dados na porta {port} por {duration // 60} minutos...")
+        self.output.append(f"Iniciando coleta de dados na(s) porta(s) {', '.join(ports)} por {duration // 60} minutos...")
         self.collect_button.setEnabled(False)
 
-        self.data_collection_thread = DataCollectionThread(port, duration)
+        self.session_path = new_session_path()
+        self.output.append(f"Gravando a sessão em {self.session_path}")
+        self.data_collection_thread = DataCollectionThread(ports, duration, self.get_binary_protocol(), self.session_path, self.content_combo.currentText())
         self.data_collection_thread.log_signal.connect(self.log_output)
         self.data_collection_thread.data_signal.connect(self.store_data)
         self.data_collection_thread.progress_signal.connect(self.update_progress)
@@ -124,21 +168,21 @@ class ColetaInicial(QWidget):
     def update_progress(self, value):
         self.progress_bar.setValue(value)
 
+    def open_session(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Abrir sessão gravada", SESSIONS_DIR, "Sessões MindTV (*.mtv);;All Files (*)")
+        if not path:
+            return
+        try:
+            count = recover_session(path)
+            self.session_path = path
+            self.export_button.setEnabled(True)
+            self.output.append(f"Sessão {path} aberta: {count} amostras.")
+        except Exception as e:
+            self.output.append(f"Erro ao abrir sessão: {str(e)}")
+
     def export_csv(self):
         try:
-            df = pd.DataFrame(self.data, columns=['irValue', 'beatsPerMinute', 'beatAvg', 'GSR'])
-            content_type = self.content_combo.currentText()
-            df['Content'] = content_type
-
-            base_filename = 'coleta_dados'
-            extension = '.csv'
-            filename = base_filename + extension
-            counter = 1
-            while os.path.exists(filename):
-                filename = f"{base_filename}({counter}){extension}"
-                counter += 1
-
-            df.to_csv(filename, index=False)
+            filename = export_session_csv(self.session_path, ['irValue', 'beatsPerMinute', 'beatAvg', 'GSR'], self.content_combo.currentText())
             self.output.append(f"Dados exportados para {filename}")
         except Exception as e:
             self.output.append(f"Erro ao exportar dados: {str(e)}")
@@ -147,29 +191,51 @@ class ColetaInicial(QWidget):
 # Treinamento da Rede
 class TrainingThread(QThread):
     log_signal = pyqtSignal(str)
+    progress_signal = pyqtSignal(int)
 
-    def __init__(self, file_paths):
+    def __init__(self, entries, keep_partial=True, incremental=False):
         super().__init__()
-        self.file_paths = file_paths
+        self.entries = entries
+        self.keep_partial = keep_partial
+        self.incremental = incremental
+        self.trainer = ForestTrainer(on_progress=self.progress_signal.emit)
+
+    def cancel(self):
+        self.trainer.cancel()
 
     def run(self):
         try:
-            dfs = []
-            for file_path in self.file_paths:
-                if file_path:
-                    df = pd.read_csv(file_path)
-                    if 'Content' not in df.columns:
-                        self.log_signal.emit(f"Erro: o arquivo {file_path} não contém a coluna 'Content'.")
-                        return
-                    dfs.append(df)
-            data = pd.concat(dfs, ignore_index=True)
-            X = data[['irValue', 'beatsPerMinute', 'beatAvg', 'GSR']]
-            y = data['Content']
-            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-            model = RandomForestClassifier(n_estimators=100, random_state=42)
-            model.fit(X_train, y_train)
-            dump(model, 'trained_model.joblib')
-            self.log_signal.emit("Treinamento concluído e modelo salvo como 'trained_model.joblib'.")
+            config = FeatureConfig()
+            previous = load_previous_model()
+            incremental = self.incremental and can_extend(previous, config)
+            if self.incremental and not incremental:
+                self.log_signal.emit("O modelo atual não permite treino incremental; treinando do zero.")
+            self.log_signal.emit("Lendo os arquivos de dados...")
+            report = ingest(self.entries, on_progress=self.progress_signal.emit, cancelled=self.trainer.cancelled)
+            for path, message in report.errors:
+                self.log_signal.emit(f"Arquivo ignorado: {path}: {message}")
+            for path, message in report.warnings:
+                self.log_signal.emit(f"Aviso: {path}: {message}")
+            self.log_signal.emit(report.summary())
+            if self.trainer.cancelled.is_set():
+                self.log_signal.emit("Treinamento cancelado; nenhum modelo foi salvo.")
+                return
+            files = unseen_files(previous, report.files) if incremental else report.files
+            if len(files) < len(report.files):
+                self.log_signal.emit(f"{len(report.files) - len(files)} arquivo(s) já usado(s) pelo modelo atual ignorado(s).")
+            if not files:
+                self.log_signal.emit("Nenhuma sessão nova para treinar.")
+                return
+            sessions = [(path, digest, load_dataset(path, digest)) for path, digest in files]
+            model = train_sessions(self.trainer, sessions, config, previous, incremental)
+            if not self.trainer.cancelled.is_set():
+                save_model(model)
+                self.log_signal.emit(f"Treinamento concluído e modelo salvo como 'trained_model.joblib' (versão {model.model_version_}, {self.trainer.report(model)}).")
+            elif model is not None and self.keep_partial:
+                save_model(model)
+                self.log_signal.emit(f"Treinamento cancelado; modelo parcial salvo como 'trained_model.joblib' (versão {model.model_version_}, {self.trainer.report(model)}).")
+            else:
+                self.log_signal.emit("Treinamento cancelado; nenhum modelo foi salvo.")
         except Exception as e:
             self.log_signal.emit(f"Erro durante o treinamento: {str(e)}")
 
@@ -181,47 +247,109 @@ class TreinamentoRede(QWidget):
     def initUI(self):
         layout = QVBoxLayout()
 
-        self.import_buttons = []
-        for i in range(5):
-            import_button = QPushButton(f'Selecionar arquivo CSV {i+1}', self)
-            import_button.clicked.connect(lambda _, x=i: self.import_csv(x))
-            layout.addWidget(import_button)
-            self.import_buttons.append(import_button)
+        self.entries_list = QListWidget(self)
+        layout.addWidget(self.entries_list)
+
+        self.add_files_button = QPushButton('Adicionar arquivos CSV ou sessões', self)
+        self.add_files_button.clicked.connect(self.add_files)
+        layout.addWidget(self.add_files_button)
+
+        self.add_folder_button = QPushButton('Adicionar pasta', self)
+        self.add_folder_button.clicked.connect(self.add_folder)
+        layout.addWidget(self.add_folder_button)
+
+        self.pattern_input = QLineEdit(self)
+        self.pattern_input.setPlaceholderText('Padrão de arquivos, ex.: dados/**/*.csv')
+        self.pattern_input.returnPressed.connect(self.add_pattern)
+        layout.addWidget(self.pattern_input)
+
+        self.add_pattern_button = QPushButton('Adicionar padrão', self)
+        self.add_pattern_button.clicked.connect(self.add_pattern)
+        layout.addWidget(self.add_pattern_button)
+
+        self.clear_entries_button = QPushButton('Limpar lista', self)
+        self.clear_entries_button.clicked.connect(self.clear_entries)
+        layout.addWidget(self.clear_entries_button)
 
         self.train_button = QPushButton('Treinar Modelo', self)
         self.train_button.clicked.connect(self.train_model)
         layout.addWidget(self.train_button)
 
-        self.output = QTextEdit(self)
-        self.output.setReadOnly(True)
+        self.incremental_check = QCheckBox('Treino incremental (acrescentar sessões novas ao modelo atual)', self)
+        layout.addWidget(self.incremental_check)
+
+        self.keep_partial_check = QCheckBox('Manter modelo parcial ao cancelar', self)
+        self.keep_partial_check.setChecked(True)
+        layout.addWidget(self.keep_partial_check)
+
+        self.cancel_button = QPushButton('Cancelar Treinamento', self)
+        self.cancel_button.clicked.connect(self.cancel_training)
+        self.cancel_button.setEnabled(False)
+        layout.addWidget(self.cancel_button)
+
+        self.train_progress_bar = QProgressBar(self)
+        layout.addWidget(self.train_progress_bar)
+
+        self.output = LogOutput(self)
         layout.addWidget(self.output)
 
         self.setLayout(layout)
         self.setWindowTitle('Treinamento da Rede')
         self.show()
 
-        self.file_paths = [None] * 5
+        self.entries = []
 
-    def import_csv(self, index):
+    def add_files(self):
         options = QFileDialog.Options()
-        file_path, _ = QFileDialog.getOpenFileName(self, "Selecionar arquivo CSV", "", "CSV Files (*.csv);;All Files (*)", options=options)
-        if file_path:
-            self.file_paths[index] = file_path
-            self.output.append(f"Arquivo {index+1} selecionado: {file_path}")
+        file_paths, _ = QFileDialog.getOpenFileNames(self, "Selecionar arquivos de dados", "", "CSV ou Sessões MindTV (*.csv *.mtv);;All Files (*)", options=options)
+        for file_path in file_paths:
+            self.add_entry(file_path)
+
+    def add_folder(self):
+        directory = QFileDialog.getExistingDirectory(self, "Selecionar pasta com arquivos de dados")
+        if directory:
+            self.add_entry(directory)
+
+    def add_pattern(self):
+        pattern = self.pattern_input.text().strip()
+        if pattern:
+            self.add_entry(pattern)
+            self.pattern_input.clear()
+
+    def add_entry(self, entry):
+        if entry not in self.entries:
+            self.entries.append(entry)
+            self.entries_list.addItem(entry)
+
+    def clear_entries(self):
+        self.entries.clear()
+        self.entries_list.clear()
 
     def train_model(self):
-        if not self.file_paths[0]:
-            self.output.append("Erro: pelo menos um arquivo CSV deve ser selecionado.")
+        if not self.entries:
+            self.output.append("Erro: selecione pelo menos um arquivo, pasta ou padrão de arquivos.")
             return
         self.output.append("Iniciando o treinamento do modelo...")
         self.train_button.setEnabled(False)
-        self.training_thread = TrainingThread(self.file_paths)
+        self.cancel_button.setEnabled(True)
+        self.train_progress_bar.setValue(0)
+        self.training_thread = TrainingThread(self.entries, self.keep_partial_check.isChecked(), self.incremental_check.isChecked())
         self.training_thread.log_signal.connect(self.log_output)
+        self.training_thread.progress_signal.connect(self.train_progress_bar.setValue)
+        self.training_thread.finished.connect(self.training_finished)
         self.training_thread.start()
 
+    def cancel_training(self):
+        self.training_thread.cancel()
+        self.cancel_button.setEnabled(False)
+        self.output.append("Cancelando o treinamento após o bloco de árvores atual...")
+
+    def training_finished(self):
+        self.train_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+
     def log_output(self, message):
         self.output.append(message)
-        self.train_button.setEnabled(True)
 
 
 # Previsão de Conteúdo
@@ -229,23 +357,50 @@ class PredictionThread(QThread):
     log_signal = pyqtSignal(str)
     prediction_signal = pyqtSignal(str)
 
-    def __init__(self, model, data):
+    def __init__(self, model, session_path):
         super().__init__()
         self.model = model
-        self.data = data
+        self.session_path = session_path
 
     def run(self):
         try:
-            df = pd.DataFrame(self.data, columns=['irValue', 'beatsPerMinute', 'beatAvg', 'GSR'])
-            predictions = self.model.predict(df)
-            prediction_counts = pd.Series(predictions).value_counts()
-            most_common = prediction_counts.idxmax()
+            probabilities = window_probabilities(self.model, self.session_path, ['irValue', 'beatsPerMinute', 'beatAvg', 'GSR'])
+            if probabilities.cached:
+                self.log_signal.emit("Previsão reaproveitada do cache (mesmas amostras e mesmo modelo).")
+            most_common = probabilities.majority()
+            if most_common is None:
+                raise ValueError("nenhuma amostra coletada")
             result_message = f"Tipo de conteúdo previsto: {most_common}"
             self.prediction_signal.emit(result_message)
             self.log_signal.emit(result_message)
         except Exception as e:
             self.log_signal.emit(f"Erro durante a previsão: {str(e)}")
 
+class LivePredictionThread(QThread):
+    log_signal = pyqtSignal(str)
+    prediction_signal = pyqtSignal(str)
+    settled_signal = pyqtSignal()
+
+    def __init__(self, store, raw_columns, cadence=LIVE_CADENCE_SECONDS, early_stopping=None, model=None):
+        super().__init__()
+        self.store = store
+        self.raw_columns = raw_columns
+        self.cadence = cadence
+        self.early_stopping = early_stopping
+        self.model = model
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            run_live(self.store, LivePredictor(self.raw_columns, early_stopping=self.early_stopping, model=self.model), self.stopped,
+                     lambda estimates: self.prediction_signal.emit(format_estimates(estimates)), self.cadence,
+                     self.settled_signal.emit)
+        except Exception as e:
+            self.log_signal.emit(f"Erro durante a previsão ao vivo: {str(e)}")
+
+    def stop(self):
+        self.stopped.set()
+
 class PredictionResultDialog(QDialog):
     def __init__(self, message):
         super().__init__()
@@ -263,22 +418,55 @@ class MindTVApp(QWidget):
     def initUI(self):
         layout = QVBoxLayout()
 
-        self.port_label = QLabel("Selecione a Porta Serial:")
+        self.port_label = QLabel("Selecione a(s) Porta(s) Serial(is):")
         layout.addWidget(self.port_label)
 
-        self.port_combo = QComboBox(self)
-        ports = serial.tools.list_ports.comports()
-        for port in ports:
-            self.port_combo.addItem(port.device)
-        layout.addWidget(self.port_combo)
+        self.port_list = QListWidget(self)
+        self.port_list.setSelectionMode(QAbstractItemView.MultiSelection)
+        for port in list_serial_ports():
+            self.port_list.addItem(port)
+        if self.port_list.count():
+            self.port_list.item(0).setSelected(True)
+        self.port_list.setMaximumHeight(100)
+        layout.addWidget(self.port_list)
 
         self.duration_label = QLabel("Selecione a duração da coleta (minutos):")
         layout.addWidget(self.duration_label)
 
         self.duration_spin = QSpinBox(self)
-        self.duration_spin.setRange(1, 5)
+        self.duration_spin.setRange(1, 120)
         layout.addWidget(self.duration_spin)
 
+        self.protocol_label = QLabel("Protocolo Serial:")
+        layout.addWidget(self.protocol_label)
+
+        self.protocol_combo = QComboBox(self)
+        self.protocol_combo.addItems(["Texto (ASCII)", "Binário"])
+        layout.addWidget(self.protocol_combo)
+
+        self.live_checkbox = QCheckBox("Previsão ao vivo durante a coleta", self)
+        self.live_checkbox.setChecked(True)
+        layout.addWidget(self.live_checkbox)
+
+        self.cadence_label = QLabel("Intervalo da previsão ao vivo (segundos):")
+        layout.addWidget(self.cadence_label)
+
+        self.cadence_spin = QSpinBox(self)
+        self.cadence_spin.setRange(1, 60)
+        self.cadence_spin.setValue(int(LIVE_CADENCE_SECONDS))
+        layout.addWidget(self.cadence_spin)
+
+        self.early_stop_checkbox = QCheckBox("Encerrar a coleta assim que a previsão estiver definida", self)
+        layout.addWidget(self.early_stop_checkbox)
+
+        self.min_duration_label = QLabel("Duração mínima com encerramento antecipado (segundos):")
+        layout.addWidget(self.min_duration_label)
+
+        self.min_duration_spin = QSpinBox(self)
+        self.min_duration_spin.setRange(10, 3600)
+        self.min_duration_spin.setValue(EARLY_STOP_MIN_SECONDS)
+        layout.addWidget(self.min_duration_spin)
+
         self.collect_button = QPushButton('Iniciar Coleta', self)
         self.collect_button.clicked.connect(self.collect_data)
         layout.addWidget(self.collect_button)
@@ -291,47 +479,67 @@ class MindTVApp(QWidget):
         self.progress_bar = QProgressBar(self)
         layout.addWidget(self.progress_bar)
 
-        self.output = QTextEdit(self)
-        self.output.setReadOnly(True)
+        self.live_label = QLabel("", self)
+        layout.addWidget(self.live_label)
+
+        self.output = LogOutput(self)
         layout.addWidget(self.output)
 
         self.setLayout(layout)
         self.setWindowTitle('MindTV App')
         self.show()
 
-    def get_selected_port(self):
-        return self.port_combo.currentText()
+    def get_selected_ports(self):
+        return [self.port_list.item(i).text() for i in range(self.port_list.count()) if self.port_list.item(i).isSelected()]
+
+    def get_binary_protocol(self):
+        return self.protocol_combo.currentText() == "Binário"
 
     def get_duration(self):
         return self.duration_spin.value()
 
     def collect_data(self):
-        port = self.get_selected_port()
+        ports = self.get_selected_ports()
+        if not ports:
+            self.output.append("Erro: selecione pelo menos uma porta serial.")
+            return
         duration = self.get_duration() * 60  # Convert to seconds
-        self.output.append(f"Iniciando coleta de dados na porta {port} por {self.get_duration()} minutos...")
+        self.output.append(f"Iniciando coleta de dados na(s) porta(s) {', '.join(ports)} por {self.get_duration()} minutos...")
 
         self.collect_button.setEnabled(False)
-        self.data_collection_thread = DataCollectionThread(port, duration)
+        self.session_path = new_session_path()
+        self.data_collection_thread = DataCollectionThread(ports, duration, self.get_binary_protocol(), self.session_path)
         self.data_collection_thread.log_signal.connect(self.log_output)
         self.data_collection_thread.data_signal.connect(self.save_data)
         self.data_collection_thread.progress_signal.connect(self.update_progress)
+        if self.live_checkbox.isChecked() or self.early_stop_checkbox.isChecked():
+            early_stopping = EarlyStopping(min_seconds=self.min_duration_spin.value()) if self.early_stop_checkbox.isChecked() else None
+            self.live_label.setText(format_estimates([]))
+            self.live_thread = LivePredictionThread(self.data_collection_thread.store, ['irValue', 'beatsPerMinute', 'beatAvg', 'GSR'], self.cadence_spin.value(), early_stopping, remote_model())
+            self.live_thread.log_signal.connect(self.log_output)
+            self.live_thread.prediction_signal.connect(self.live_label.setText)
+            self.live_thread.settled_signal.connect(self.stop_early)
+            self.data_collection_thread.finished.connect(self.live_thread.stop)
+            self.live_thread.start()
         self.data_collection_thread.start()
 
     def save_data(self, data):
-        df = pd.DataFrame(data, columns=['irValue', 'beatsPerMinute', 'beatAvg', 'GSR'])
-        df.to_csv('collected_data.csv', index=False)
-        self.output.append("Dados coletados e salvos em collected_data.csv")
+        self.samples = data
+        self.output.append(f"Coleta concluída: {data.total} amostras armazenadas.")
         self.collect_button.setEnabled(True)
         self.predict_button.setEnabled(True)
 
     def update_progress(self, value):
         self.progress_bar.setValue(value)
 
+    def stop_early(self):
+        self.output.append("Previsão definida para todos os participantes; encerrando a coleta antes do tempo máximo.")
+        self.data_collection_thread.stop()
+
     def predict_content(self):
         try:
-            model = load('trained_model.joblib')
-            data = pd.read_csv('collected_data.csv')
-            self.prediction_thread = PredictionThread(model, data)
+            model = remote_model() or get_model()
+            self.prediction_thread = PredictionThread(model, self.session_path)
             self.prediction_thread.log_signal.connect(self.log_output)
             self.prediction_thread.prediction_signal.connect(self.show_prediction_result)
             self.prediction_thread.start()
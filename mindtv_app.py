@@ -1,60 +1,115 @@
 import sys
-import pandas as pd
-import serial
-import serial.tools.list_ports
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QPushButton, QLabel, QComboBox, QTextEdit, QSpinBox, QProgressBar, QDialog, QHBoxLayout
+import threading
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QPushButton, QLabel, QComboBox, QSpinBox, QProgressBar, QDialog, QHBoxLayout, QListWidget, QAbstractItemView, QCheckBox
 from PyQt5.QtCore import QThread, pyqtSignal, QTimer
-from joblib import load
+from model_registry import get_model
+from prediction_cache import window_probabilities
+from prediction_service import remote_model
+from acquisition import AcquisitionEngine
+from live_prediction import EARLY_STOP_MIN_SECONDS, LIVE_CADENCE_SECONDS, EarlyStopping, LivePredictor, format_estimates, run_live
+from sample_store import SampleStore
+from serial_reader import list_serial_ports
+from session_log import SESSION_BUFFER_SAMPLES, SessionWriter, new_session_path
+from ui_updates import LogOutput, UiThrottle
 
 class DataCollectionThread(QThread):
     log_signal = pyqtSignal(str)
-    data_signal = pyqtSignal(list)
+    data_signal = pyqtSignal(object)
     progress_signal = pyqtSignal(int)
 
-    def __init__(self, port, frequency):
+    def __init__(self, ports, frequency, binary=False, session_path=None):
         super().__init__()
-        self.port = port
+        self.ports = ports
         self.frequency = frequency
+        self.binary = binary
+        self.session_path = session_path
+        self.store = SampleStore(max_samples=SESSION_BUFFER_SAMPLES) if session_path else SampleStore()
         self.collecting = True
 
     def run(self):
+        writer = None
         try:
-            ser = serial.Serial(self.port, 115200)
-            collected_data = []
-            for sample_num in range(self.frequency):
-                data = ser.readline().decode('utf-8').strip()
-                self.log_signal.emit(data)
-                data_split = data.split(',')
-                if len(data_split) == 4:
-                    collected_data.append([float(data_split[0]), float(data_split[1]), float(data_split[2]), float(data_split[3])])
-                progress = int(((sample_num + 1) / self.frequency) * 100)
-                self.progress_signal.emit(progress)
-            self.data_signal.emit(collected_data)
-            ser.close()
+            ui = UiThrottle(self.log_signal.emit, self.progress_signal.emit)
+            if self.session_path:
+                writer = SessionWriter(self.session_path, {'ports': self.ports, 'binary': self.binary})
+            engine = AcquisitionEngine(self.ports, self.binary, self.store, ui.log_many)
+            store = engine.store
+
+            def tick():
+                if writer:
+                    writer.drain(store)
+                ui.set_progress((min(store.total, self.frequency) / self.frequency) * 100)
+                ui.poll()
+
+            engine.run_until(lambda: not self.collecting or store.total >= self.frequency, tick)
+            for port, error in engine.errors:
+                ui.log(f"Erro durante a coleta de dados ({port}): {str(error)}")
+            if writer:
+                writer.drain(store)
+                writer.close()
+                if writer.lost:
+                    ui.log(f"Aviso: {writer.lost} amostras não foram gravadas em {self.session_path}.")
+            else:
+                store.truncate(self.frequency)
+            ui.flush()
+            self.data_signal.emit(store)
         except Exception as e:
             self.log_signal.emit(f"Erro durante a coleta de dados: {str(e)}")
+        finally:
+            if writer:
+                writer.close()
+
+    def stop(self):
+        self.collecting = False
 
 class PredictionThread(QThread):
     log_signal = pyqtSignal(str)
     prediction_signal = pyqtSignal(str)
 
-    def __init__(self, model, data):
+    def __init__(self, model, session_path):
         super().__init__()
         self.model = model
-        self.data = data
+        self.session_path = session_path
 
     def run(self):
         try:
-            df = pd.DataFrame(self.data, columns=['beatsPerMinute', 'beatAvg', 'GSR'])
-            predictions = self.model.predict(df)
-            prediction_counts = pd.Series(predictions).value_counts()
-            most_common = prediction_counts.idxmax()
+            probabilities = window_probabilities(self.model, self.session_path, ['beatsPerMinute', 'beatAvg', 'GSR'])
+            if not len(probabilities):
+                raise ValueError("amostras insuficientes para uma janela de previsão")
+            if probabilities.cached:
+                self.log_signal.emit("Previsão reaproveitada do cache (mesmas amostras e mesmo modelo).")
+            most_common = probabilities.majority()
             result_message = f"Tipo de emoção sentida: {most_common}"
             self.prediction_signal.emit(result_message)
             self.log_signal.emit(result_message)
         except Exception as e:
             self.log_signal.emit(f"Erro durante a previsão: {str(e)}")
 
+class LivePredictionThread(QThread):
+    log_signal = pyqtSignal(str)
+    prediction_signal = pyqtSignal(str)
+    settled_signal = pyqtSignal()
+
+    def __init__(self, store, raw_columns, cadence=LIVE_CADENCE_SECONDS, early_stopping=None, model=None):
+        super().__init__()
+        self.store = store
+        self.raw_columns = raw_columns
+        self.cadence = cadence
+        self.early_stopping = early_stopping
+        self.model = model
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            run_live(self.store, LivePredictor(self.raw_columns, early_stopping=self.early_stopping, model=self.model), self.stopped,
+                     lambda estimates: self.prediction_signal.emit(format_estimates(estimates)), self.cadence,
+                     self.settled_signal.emit)
+        except Exception as e:
+            self.log_signal.emit(f"Erro durante a previsão ao vivo: {str(e)}")
+
+    def stop(self):
+        self.stopped.set()
+
 class PredictionResultDialog(QDialog):
     def __init__(self, message):
         super().__init__()
@@ -72,20 +127,23 @@ class MainWindow(QWidget):
     def initUI(self):
         layout = QVBoxLayout()
 
-        self.port_label = QLabel("Selecione a Porta Serial:")
+        self.port_label = QLabel("Selecione a(s) Porta(s) Serial(is):")
         layout.addWidget(self.port_label)
 
-        self.port_combo = QComboBox(self)
-        ports = serial.tools.list_ports.comports()
-        for port in ports:
-            self.port_combo.addItem(port.device)
-        layout.addWidget(self.port_combo)
+        self.port_list = QListWidget(self)
+        self.port_list.setSelectionMode(QAbstractItemView.MultiSelection)
+        for port in list_serial_ports():
+            self.port_list.addItem(port)
+        if self.port_list.count():
+            self.port_list.item(0).setSelected(True)
+        self.port_list.setMaximumHeight(100)
+        layout.addWidget(self.port_list)
 
         self.duration_label = QLabel("Selecione a duração da coleta (minutos):")
         layout.addWidget(self.duration_label)
 
         self.duration_spin = QSpinBox(self)
-        self.duration_spin.setRange(1, 5)
+        self.duration_spin.setRange(1, 120)
         layout.addWidget(self.duration_spin)
         
         self.frequency_label = QLabel("Selecione a frequência de coleta por minuto:")
@@ -95,6 +153,36 @@ class MainWindow(QWidget):
         self.frequency_combo.addItems(["64", "128", "256"])
         layout.addWidget(self.frequency_combo)
 
+        self.protocol_label = QLabel("Protocolo Serial:")
+        layout.addWidget(self.protocol_label)
+
+        self.protocol_combo = QComboBox(self)
+        self.protocol_combo.addItems(["Texto (ASCII)", "Binário"])
+        layout.addWidget(self.protocol_combo)
+
+        self.live_checkbox = QCheckBox("Previsão ao vivo durante a coleta", self)
+        self.live_checkbox.setChecked(True)
+        layout.addWidget(self.live_checkbox)
+
+        self.cadence_label = QLabel("Intervalo da previsão ao vivo (segundos):")
+        layout.addWidget(self.cadence_label)
+
+        self.cadence_spin = QSpinBox(self)
+        self.cadence_spin.setRange(1, 60)
+        self.cadence_spin.setValue(int(LIVE_CADENCE_SECONDS))
+        layout.addWidget(self.cadence_spin)
+
+        self.early_stop_checkbox = QCheckBox("Encerrar a coleta assim que a previsão estiver definida", self)
+        layout.addWidget(self.early_stop_checkbox)
+
+        self.min_duration_label = QLabel("Duração mínima com encerramento antecipado (segundos):")
+        layout.addWidget(self.min_duration_label)
+
+        self.min_duration_spin = QSpinBox(self)
+        self.min_duration_spin.setRange(10, 3600)
+        self.min_duration_spin.setValue(EARLY_STOP_MIN_SECONDS)
+        layout.addWidget(self.min_duration_spin)
+
         self.collect_button = QPushButton('Iniciar Coleta', self)
         self.collect_button.clicked.connect(self.collect_data)
         layout.addWidget(self.collect_button)
@@ -107,16 +195,21 @@ class MainWindow(QWidget):
         self.progress_bar = QProgressBar(self)
         layout.addWidget(self.progress_bar)
 
-        self.output = QTextEdit(self)
-        self.output.setReadOnly(True)
+        self.live_label = QLabel("", self)
+        layout.addWidget(self.live_label)
+
+        self.output = LogOutput(self)
         layout.addWidget(self.output)
 
         self.setLayout(layout)
         self.setWindowTitle('MindTV App')
         self.show()
 
-    def get_selected_port(self):
-        return self.port_combo.currentText()
+    def get_selected_ports(self):
+        return [self.port_list.item(i).text() for i in range(self.port_list.count()) if self.port_list.item(i).isSelected()]
+
+    def get_binary_protocol(self):
+        return self.protocol_combo.currentText() == "Binário"
 
     def get_duration(self):
         return self.duration_spin.value()
@@ -125,31 +218,47 @@ class MainWindow(QWidget):
         return int(self.frequency_combo.currentText())
 
     def collect_data(self):
-        port = self.get_selected_port()
-        frequency = self.get_frequency() * self.get_duration() # Obter a frequência de coleta em minutos
-        self.output.append(f"Iniciando coleta de dados na porta {port} por {self.get_duration()} minutos...")
+        ports = self.get_selected_ports()
+        if not ports:
+            self.output.append("Erro: selecione pelo menos uma porta serial.")
+            return
+        frequency = self.get_frequency() * self.get_duration() * len(ports) # Obter a frequência de coleta em minutos
+        self.output.append(f"Iniciando coleta de dados na(s) porta(s) {', '.join(ports)} por {self.get_duration()} minutos...")
+
+        self.session_path = new_session_path()
+        self.output.append(f"Gravando a sessão em {self.session_path}")
 
         self.collect_button.setEnabled(False)
-        self.data_collection_thread = DataCollectionThread(port, frequency)
+        self.data_collection_thread = DataCollectionThread(ports, frequency, self.get_binary_protocol(), self.session_path)
         self.data_collection_thread.log_signal.connect(self.log_output)
         self.data_collection_thread.data_signal.connect(self.save_data)
         self.data_collection_thread.progress_signal.connect(self.update_progress)
+        if self.live_checkbox.isChecked() or self.early_stop_checkbox.isChecked():
+            early_stopping = EarlyStopping(min_seconds=self.min_duration_spin.value()) if self.early_stop_checkbox.isChecked() else None
+            self.live_label.setText(format_estimates([]))
+            self.live_thread = LivePredictionThread(self.data_collection_thread.store, ['beatsPerMinute', 'beatAvg', 'GSR'], self.cadence_spin.value(), early_stopping, remote_model())
+            self.live_thread.log_signal.connect(self.log_output)
+            self.live_thread.prediction_signal.connect(self.live_label.setText)
+            self.live_thread.settled_signal.connect(self.stop_early)
+            self.data_collection_thread.finished.connect(self.live_thread.stop)
+            self.live_thread.start()
         self.data_collection_thread.start()
 
     def save_data(self, data):
-        df = pd.DataFrame(data, columns=['beatsPerMinute', 'beatAvg', 'GSR'])
-        df.to_csv('collected_data.csv', index=False)
-        self.output.append("Dados coletados e salvos em collected_data.csv")
+        self.output.append(f"Coleta concluída: {data.total} amostras gravadas em {self.session_path}.")
         self.predict_button.setEnabled(True)
 
     def update_progress(self, value):
         self.progress_bar.setValue(value)
 
+    def stop_early(self):
+        self.output.append("Previsão definida para todos os participantes; encerrando a coleta antes do tempo máximo.")
+        self.data_collection_thread.stop()
+
     def predict_content(self):
         try:
-            model = load('trained_model.joblib')
-            data = pd.read_csv('collected_data.csv')
-            self.prediction_thread = PredictionThread(model, data)
+            model = remote_model() or get_model()
+            self.prediction_thread = PredictionThread(model, self.session_path)
             self.prediction_thread.log_signal.connect(self.log_output)
             self.prediction_thread.prediction_signal.connect(self.show_prediction_result)
             self.predict_button.setEnabled(False)
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from compiled_forest import MODEL_FILE, compiled_path, file_signature, load_model_file, model_file
+
+MAX_MODELS = 4
+# Entre a troca do .joblib e a do arquivo compilado por `save_model`, o
+# compilado ainda aponta para o .joblib anterior; durante esse intervalo o
+# modelo já carregado continua em uso em vez de carregar o .joblib.
+REPLACE_GRACE_SECONDS = 2.0
+
+
+class ModelRegistry:
+    """Modelos carregados uma vez e reaproveitados entre previsões, com política LRU.
+
+    Cada entrada é identificada pelo caminho e pela assinatura (tamanho,
+    mtime, inode) do .joblib e do arquivo compilado. `get` compara as
+    assinaturas a cada chamada: quando o treinamento substitui o modelo (com
+    `save_model`, que grava em temporário e renomeia), a próxima chamada
+    carrega a versão nova, enquanto quem ainda usa a anterior continua com ela
+    intacta. Florestas compiladas são mapeadas em memória, e as páginas são
+    compartilhadas por todos os processos que usam o mesmo arquivo. Cada
+    modelo carregado recebe `model_id_` (ver `model_id`).
+    """
+
+    def __init__(self, max_models=MAX_MODELS, grace_seconds=REPLACE_GRACE_SECONDS):
+        self.max_models = max_models
+        self.grace_seconds = grace_seconds
+        self.models = OrderedDict()
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self.stale_since = {}
+        self.loads = 0
+
+    def _key(self, path):
+        return path, tuple(file_signature(path) or ()), tuple(file_signature(compiled_path(path)) or ())
+
+    def _cached(self, key):
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+                return self.models[key]
+        return None
+
+    def _current(self, path):
+        with self.lock:
+            return next((model for key, model in reversed(self.models.items()) if key[0] == path), None)
+
+    def get(self, path=MODEL_FILE):
+        key = self._key(path)
+        model = self._cached(key)
+        if model is not None:
+            return model
+        # Uma carga por vez: chamadas simultâneas esperam e reaproveitam o resultado.
+        with self.load_lock:
+            key = self._key(path)
+            model = self._cached(key)
+            if model is not None:
+                return model
+            file = model_file(path)
+            current = self._current(path)
+            if file == path and key[2] and current is not None:
+                stale_since = self.stale_since.setdefault(path, time.monotonic())
+                if time.monotonic() - stale_since < self.grace_seconds:
+                    return current
+            self.stale_since.pop(path, None)
+            model = load_model_file(file)
+            model.model_id_ = model_id(key)
+            with self.lock:
+                self.loads += 1
+                # Versões anteriores do mesmo caminho não voltam a ser usadas.
+                for old in [old for old in self.models if old[0] == path]:
+                    del self.models[old]
+                self.models[key] = model
+                while len(self.models) > self.max_models:
+                    self.models.popitem(last=False)
+        return model
+
+    def version(self, path=MODEL_FILE):
+        return getattr(self.get(path), 'model_version_', None)
+
+    def clear(self):
+        with self.lock:
+            self.models.clear()
+            self.stale_since.clear()
+
+
+def model_id(key):
+    """Identidade de uma versão do modelo: caminho absoluto e assinaturas dos arquivos.
+
+    Como `save_model` grava em temporário e renomeia, cada modelo salvo tem
+    outra identidade, sem precisar ler o arquivo todo para calcular um hash.
+    """
+    path, signature, compiled = key
+    return hashlib.sha256(json.dumps([os.path.abspath(path), signature, compiled]).encode()).hexdigest()
+
+
+registry = ModelRegistry()
+
+
+def get_model(path=MODEL_FILE):
+    """Modelo atual em `path`, pelo registro compartilhado do processo."""
+    return registry.get(path)
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+from sample_store import SampleStore
+from serial_protocol import UNKNOWN_PARTICIPANT
+
+PARTICIPANTS = 10
+# O firmware envia as linhas de todos os participantes em sequência e pausa 50 ms
+# entre ciclos; uma pausa maior que CYCLE_GAP indica o início de um novo ciclo.
+CYCLE_GAP = 0.025
+
+
+class ParticipantDemux:
+    """Atribui cada registro de uma porta ao seu participante.
+
+    Registros que já trazem o índice (quadros binários, linhas com 5 campos)
+    são mantidos. Os demais recebem a posição no ciclo de `participants`
+    linhas, reiniciada em 0 sempre que a leitura anterior foi há mais de `gap`
+    segundos, o que ressincroniza o ciclo após linhas perdidas.
+    """
+
+    def __init__(self, participants=PARTICIPANTS, gap=CYCLE_GAP):
+        self.participants = participants
+        self.gap = gap
+        self.position = 0
+        self.last_time = None
+        self.resyncs = 0
+
+    def assign(self, records, t):
+        if not len(records):
+            return records
+        if self.last_time is not None and t - self.last_time > self.gap and self.position:
+            self.position = 0
+            self.resyncs += 1
+        self.last_time = t
+        unknown = np.flatnonzero(records['participant'] == UNKNOWN_PARTICIPANT)
+        if len(unknown):
+            records['participant'][unknown] = (self.position + np.arange(len(unknown))) % self.participants
+            self.position = (self.position + len(unknown)) % self.participants
+        return records
+
+
+def majority_by_participant(participants, predictions, n_participants=PARTICIPANTS):
+    """Rótulo mais frequente de cada participante (None para quem não tem amostras)."""
+    labels, codes = np.unique(predictions, return_inverse=True)
+    votes = np.zeros((n_participants, len(labels)), dtype=np.int64)
+    np.add.at(votes, (participants, codes), 1)
+    winners = votes.argmax(axis=1)
+    return [labels[winner] if votes[p].any() else None for p, winner in enumerate(winners)]
+
+
+class ParticipantBuffers:
+    """Um SampleStore por participante, alimentado com amostras já demultiplexadas."""
+
+    def __init__(self, participants=PARTICIPANTS, max_samples=None):
+        self.stores = [SampleStore(max_samples=max_samples) for _ in range(participants)]
+
+    def extend(self, samples):
+        order = np.argsort(samples['participant'], kind='stable')
+        grouped = samples[order]
+        bounds = np.searchsorted(grouped['participant'], np.arange(len(self.stores) + 1))
+        for participant, store in enumerate(self.stores):
+            chunk = grouped[bounds[participant]:bounds[participant + 1]]
+            store.append(chunk, chunk['t'])
+
+    def windows(self, size=None):
+        return [store.view()[-size:] if size else store.view() for store in self.stores]
+
+    def predict(self, model, columns, size=None):
+        """Prevê todos os participantes com uma única chamada a `model.predict`."""
+        windows = self.windows(size)
+        samples = np.concatenate(windows)
+        if not len(samples):
+            return [None] * len(self.stores)
+        participants = np.repeat(np.arange(len(windows)), [len(window) for window in windows])
+        X = pd.DataFrame({column: samples[column] for column in columns})
+        return majority_by_participant(participants, model.predict(X), len(self.stores))
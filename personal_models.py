@@ -0,0 +1,226 @@
+"""Modelos por participante, treinados com as sessões de cada pessoa sobre o modelo global.
+
+    python personal_models.py train NOME dados/ sessoes/*.mtv
+    python personal_models.py list
+
+Sessões do main-10p.py identificam quem estava em cada sensor pelo campo
+`people` do cabeçalho; CSVs são considerados inteiramente da pessoa indicada.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from compiled_forest import MODEL_FILE, COMPILED_EXTENSION, compiled_path, save_model
+from features import FEATURE_NAMES, FeatureConfig, attach_config, config_from_model, extract_features, predict_proba_samples, predict_samples, training_windows
+from model_registry import ModelRegistry, get_model
+from session_log import SESSION_EXTENSION, SessionReader
+
+PERSONAL_MODELS_DIR = 'modelos_pessoais'
+# Modelos pessoais mantidos carregados ao mesmo tempo (o global fica no registro principal).
+PERSONAL_CACHE_MODELS = 8
+
+personal_registry = ModelRegistry(PERSONAL_CACHE_MODELS)
+
+
+def person_model_path(person, directory=PERSONAL_MODELS_DIR):
+    name = re.sub(r'[^\w.-]+', '_', person.strip()).strip('._')
+    if not name:
+        raise ValueError(f"Nome de participante inválido: {person!r}")
+    return os.path.join(directory, name + '.joblib')
+
+
+def person_frames(files, person):
+    """Dados de `person` em cada arquivo (caminho, digest): o sensor dela nas sessões, o arquivo inteiro nos CSVs."""
+    from ingestion import load_dataset
+
+    frames = []
+    for path, digest in files:
+        df = load_dataset(path, digest)
+        if path.endswith(SESSION_EXTENSION):
+            people = SessionReader(path).header.get('people') or []
+            if person not in people:
+                continue
+            df = df[df['participant'] == people.index(person)]
+        frames.append((path, digest, df))
+    return frames
+
+
+def train_personal_model(person, files, global_path=MODEL_FILE, directory=PERSONAL_MODELS_DIR, trainer=None):
+    """Treina e salva o modelo de `person`; devolve (modelo, caminho).
+
+    A floresta é treinada com as janelas da pessoa mais a amostra de janelas
+    guardada no modelo global (`replay_X_`), com as janelas da pessoa pesando
+    no total o mesmo que a amostra: o modelo aprende a linha de base dela sem
+    esquecer as classes que ela ainda não assistiu.
+    """
+    from training import ForestTrainer, load_previous_model, update_history
+
+    base = load_previous_model(global_path)
+    config = (config_from_model(base) if base is not None else None) or FeatureConfig()
+    frames = [(path, digest, df) for path, digest, df in person_frames(files, person) if len(df)]
+    if not frames:
+        raise ValueError(f"Nenhum dado de {person} nos arquivos informados")
+    windows = [training_windows([df], config) for _, _, df in frames]
+    X = pd.concat([X for X, _ in windows], ignore_index=True)
+    y = np.concatenate([y for _, y in windows])
+    if not len(y):
+        raise ValueError(f"Dados de {person} insuficientes para formar uma janela")
+    X_train, y_train, weights = X, y, None
+    if base is not None and len(getattr(base, 'replay_y_', [])):
+        replay = pd.DataFrame(base.replay_X_, columns=FEATURE_NAMES)
+        X_train = pd.concat([X, replay], ignore_index=True)
+        y_train = np.concatenate([y, base.replay_y_])
+        weights = np.concatenate([np.full(len(y), max(1.0, len(replay) / len(y))), np.ones(len(replay))])
+    model = (trainer or ForestTrainer()).fit(X_train, y_train, sample_weight=weights)
+    if model is None:
+        return None, None
+    path = person_model_path(person, directory)
+    previous = load_previous_model(path)
+    records = [(file, digest, len(window_y)) for (file, digest, _), (_, window_y) in zip(frames, windows)]
+    update_history(model, None, X, y, records, getattr(previous, 'model_version_', 0) + 1)
+    model.person_ = person
+    model.base_version_ = getattr(base, 'model_version_', None)
+    os.makedirs(directory, exist_ok=True)
+    save_model(attach_config(model, config), path)
+    return model, path
+
+
+class PersonalModels:
+    """Previsão de uma sala: cada participante com o seu modelo, ou o global se não tiver um.
+
+    `people[i]` é o nome de quem está no sensor `i` ('' ou ausente: modelo
+    global). Os modelos pessoais são carregados só quando alguém da sala os
+    usa e ficam no registro `personal_registry` (LRU de PERSONAL_CACHE_MODELS).
+    Os atributos das janelas são calculados uma vez para a sala toda, e os
+    participantes que usam o mesmo modelo são previstos numa única chamada.
+    """
+
+    def __init__(self, people=(), directory=PERSONAL_MODELS_DIR, global_path=MODEL_FILE, registry=None, base=None):
+        self.people = list(people)
+        self.directory = directory
+        self.global_path = global_path
+        self.registry = registry or personal_registry
+        self.base = base
+
+    def global_model(self):
+        """`base` (por exemplo, o RemoteModel do serviço de previsão) ou o modelo global do registro."""
+        return self.base or get_model(self.global_path)
+
+    def person(self, slot):
+        return self.people[slot].strip() if slot < len(self.people) and self.people[slot] else ''
+
+    def personal_model(self, slot):
+        """Modelo pessoal do participante `slot`, ou None."""
+        person = self.person(slot)
+        if not person:
+            return None
+        path = person_model_path(person, self.directory)
+        if not (os.path.exists(path) or os.path.exists(compiled_path(path))):
+            return None
+        model = self.registry.get(path)
+        if getattr(model, 'feature_config_', None) != getattr(self.global_model(), 'feature_config_', None):
+            return None
+        return model
+
+    def model_for(self, slot):
+        return self.personal_model(slot) or self.global_model()
+
+    @property
+    def classes_(self):
+        return self.global_model().classes_
+
+    @property
+    def feature_config_(self):
+        return getattr(self.global_model(), 'feature_config_', None)
+
+    @property
+    def model_id_(self):
+        """Identidade da combinação de modelos da sala (ver `model_registry.model_id`), ou None."""
+        base = getattr(self.global_model(), 'model_id_', None)
+        if base is None:
+            return None
+        personal = [getattr(self.personal_model(slot), 'model_id_', None) for slot in range(len(self.people))]
+        return hashlib.sha256(json.dumps([base, personal]).encode()).hexdigest()
+
+    def describe(self, slot):
+        person = self.person(slot)
+        if not person:
+            return "modelo global"
+        return f"{person}, modelo pessoal" if self.personal_model(slot) is not None else f"{person}, modelo global"
+
+    def predict_samples(self, samples, raw_columns, extractors=None):
+        """Como `features.predict_samples`, escolhendo o modelo de cada participante."""
+        base = self.global_model()
+        config = config_from_model(base)
+        if config is None:
+            # Modelo global antigo (amostras brutas): sem modelos pessoais.
+            return predict_samples(base, samples, raw_columns, extractors)
+        X, keys, _ = extract_features(samples, config, extractors)
+        owners = keys % 256
+        predictions = np.empty(len(X), dtype=object)
+        for model, mask in self._groups(owners):
+            predictions[mask] = model.predict(X[mask])
+        return predictions, owners
+
+    def predict_proba_samples(self, samples, raw_columns, extractors=None):
+        """Como `features.predict_proba_samples`, com as colunas na ordem das classes do modelo global."""
+        base = self.global_model()
+        config = config_from_model(base)
+        if config is None:
+            return predict_proba_samples(base, samples, raw_columns, extractors)
+        X, keys, _ = extract_features(samples, config, extractors)
+        owners = keys % 256
+        proba = np.zeros((len(X), len(base.classes_)))
+        for model, mask in self._groups(owners):
+            columns = pd.DataFrame(model.predict_proba(X[mask]), columns=model.classes_)
+            proba[mask] = columns.reindex(columns=base.classes_, fill_value=0.0).to_numpy()
+        return proba, owners
+
+    def _groups(self, owners):
+        """(modelo, máscara das janelas) de cada modelo usado; participantes com o mesmo modelo são previstos juntos."""
+        groups = {}
+        for slot in np.unique(owners):
+            model = self.model_for(int(slot))
+            groups.setdefault(id(model), (model, []))[1].append(slot)
+        return [(model, np.isin(owners, slots)) for model, slots in groups.values()]
+
+
+def main():
+    from ingestion import ingest
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    train = commands.add_parser('train', help="treina o modelo pessoal de um participante")
+    train.add_argument('person')
+    train.add_argument('entries', nargs='+', help="arquivos, pastas ou padrões de dados")
+    train.add_argument('--global-model', default=MODEL_FILE)
+    train.add_argument('--directory', default=PERSONAL_MODELS_DIR)
+    listing = commands.add_parser('list', help="lista os modelos pessoais")
+    listing.add_argument('--directory', default=PERSONAL_MODELS_DIR)
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        if not os.path.isdir(args.directory):
+            print("Nenhum modelo pessoal.")
+            return
+        for name in sorted(os.listdir(args.directory)):
+            if name.endswith(COMPILED_EXTENSION):
+                model = personal_registry.get(os.path.join(args.directory, name[:-len(COMPILED_EXTENSION)] + '.joblib'))
+                print(f"{name[:-len(COMPILED_EXTENSION)]}: versão {getattr(model, 'model_version_', '?')}, "
+                      f"{model.n_estimators} árvores, classes: {', '.join(map(str, model.classes_))}")
+        return
+
+    report = ingest(args.entries)
+    for path, message in report.errors:
+        print(f"Arquivo ignorado: {path}: {message}")
+    model, path = train_personal_model(args.person, report.files, args.global_model, args.directory)
+    print(f"Modelo pessoal de {args.person} salvo em {path} (versão {model.model_version_}, classes: {', '.join(map(str, model.classes_))})")
+
+
+if __name__ == '__main__':
+    main()
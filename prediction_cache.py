@@ -0,0 +1,236 @@
+"""Cache em disco das probabilidades por janela das sessões já previstas.
+
+    python prediction_cache.py [--max-mb 256] [--clear]
+
+Cada entrada é identificada pelo sha256 das amostras da sessão, pela
+identidade do modelo (`model_id_`, atribuída pelo registro de modelos) e
+pela configuração de atributos. Guarda a probabilidade de cada classe em
+cada janela e o participante da janela, não só o rótulo final: outra regra
+de agregação pode ser aplicada sem prever de novo. A pasta tem tamanho
+limitado; ao passar do limite, as entradas lidas há mais tempo são removidas
+(a data de modificação de uma entrada é atualizada a cada leitura).
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+from features import sample_predictor
+from session_log import EXPORT_CHUNK_SIZE, SessionReader
+
+PREDICTION_CACHE_DIR = 'cache_previsoes'
+PREDICTION_CACHE_BYTES = 256 * 1024 * 1024
+CACHE_FORMAT = 2
+CACHE_EXTENSION = '.npz'
+
+
+class WindowProbabilities:
+    """Probabilidades das janelas de uma sessão: classes, participante de cada janela e matriz janelas x classes."""
+
+    def __init__(self, classes, owners, proba, cached=False):
+        self.classes = np.asarray(classes)
+        self.owners = np.asarray(owners)
+        self.proba = np.asarray(proba, dtype=np.float32)
+        self.cached = cached
+
+    def __len__(self):
+        return len(self.proba)
+
+    def _select(self, participant):
+        return self.proba if participant is None else self.proba[self.owners == participant]
+
+    def labels(self):
+        """Rótulo previsto de cada janela."""
+        return self.classes[np.argmax(self.proba, axis=1)] if len(self) else self.classes[:0]
+
+    def majority(self, participant=None):
+        """Rótulo mais frequente entre as janelas do participante (ou da sessão toda), como no PredictionThread."""
+        proba = self._select(participant)
+        if not len(proba):
+            return None
+        return self.classes[np.argmax(np.bincount(np.argmax(proba, axis=1), minlength=len(self.classes)))]
+
+    def mean(self, participant=None):
+        """Média das probabilidades de cada classe nas janelas do participante (ou da sessão toda)."""
+        proba = self._select(participant)
+        return proba.mean(axis=0) if len(proba) else np.zeros(len(self.classes), dtype=np.float32)
+
+
+class PredictionCache:
+    """Entradas `<chave>.npz` em `directory`, com tamanho total limitado a `max_bytes` (LRU)."""
+
+    def __init__(self, directory=PREDICTION_CACHE_DIR, max_bytes=PREDICTION_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        return os.path.join(self.directory, key + CACHE_EXTENSION)
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with np.load(path) as data:
+                classes = data['classes']
+                if str(data['classes_dtype']) == 'object':
+                    classes = classes.astype(object)
+                result = WindowProbabilities(classes, data['owners'], data['proba'], cached=True)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # Entrada corrompida (por exemplo, disco cheio durante a gravação).
+            self._remove(path)
+            return None
+        return result
+
+    def put(self, key, result):
+        """Grava `result`; classes que não são números nem textos (exigiriam pickle) não são guardadas."""
+        classes = result.classes
+        if classes.dtype == object:
+            # Rótulos de texto do sklearn: gravados como texto e devolvidos como object, como vieram do modelo.
+            if not all(isinstance(name, str) for name in classes):
+                return
+            stored = classes.astype(str)
+        elif classes.dtype.kind in 'biufU':
+            stored = classes
+        else:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(prefix='.tmp-', suffix=CACHE_EXTENSION, dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, classes=stored, classes_dtype=np.array(classes.dtype.str if classes.dtype != object else 'object'),
+                         owners=result.owners.astype(np.uint8), proba=result.proba)
+            os.replace(temporary, self.path(key))
+        except BaseException:
+            self._remove(temporary)
+            raise
+        self.evict()
+
+    def entries(self):
+        """(data de modificação, tamanho, caminho) de cada entrada."""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return entries
+        for name in names:
+            if not name.endswith(CACHE_EXTENSION) or name.startswith('.tmp-'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, max_bytes=None):
+        """Remove as entradas usadas há mais tempo até o total caber em `max_bytes`; devolve quantas foram removidas."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+prediction_cache = PredictionCache()
+
+
+def sample_chunks(source, chunk_size=EXPORT_CHUNK_SIZE):
+    """Blocos de amostras de `source`: caminho de uma sessão .mtv ou array de amostras (SAMPLE_DTYPE)."""
+    if isinstance(source, str):
+        return SessionReader(source).chunks(chunk_size)
+    return (source[start:start + chunk_size] for start in range(0, len(source), chunk_size))
+
+
+def samples_digest(source):
+    """sha256 das amostras (sem o cabeçalho): a sessão gravada e as mesmas amostras em memória têm o mesmo digest."""
+    digest = hashlib.sha256()
+    for chunk in sample_chunks(source):
+        digest.update(np.ascontiguousarray(chunk).view(np.uint8))
+    return digest.hexdigest()
+
+
+def cache_key(model, digest, raw_columns):
+    """Chave da entrada, ou None se o modelo não tem identidade (não veio do registro nem do serviço de previsão)."""
+    identity = getattr(model, 'model_id_', None)
+    if identity is None:
+        return None
+    features = getattr(model, 'feature_config_', None) or {'columns': list(raw_columns)}
+    key = {'format': CACHE_FORMAT, 'samples': digest, 'model': identity, 'features': features}
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def window_probabilities(model, source, raw_columns, cache=prediction_cache):
+    """WindowProbabilities de `source` (ver `sample_chunks`), lidas do cache quando já calculadas.
+
+    A previsão é feita em blocos, como em `session_log.predict_session`.
+    `cache=None` desativa o cache.
+    """
+    digest = key = None
+    if cache is not None:
+        digest = samples_digest(source)
+        key = cache_key(model, digest, raw_columns)
+        if key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+    predict = sample_predictor(model, proba=True)
+    extractors = {}
+    probas, owners = [], []
+    for chunk in sample_chunks(source):
+        proba, owner = predict(chunk, raw_columns, extractors)
+        probas.append(proba)
+        owners.append(owner)
+    classes = np.asarray(model.classes_)
+    result = WindowProbabilities(
+        classes,
+        np.concatenate(owners) if owners else np.zeros(0, dtype=np.int64),
+        np.concatenate(probas) if probas else np.zeros((0, len(classes))),
+    )
+    # Não grava se o modelo mudou durante a previsão (serviço de previsão que recarregou o modelo).
+    if key is not None and key == cache_key(model, digest, raw_columns):
+        cache.put(key, result)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mostra, reduz ou apaga o cache de previsões.")
+    parser.add_argument('--directory', default=PREDICTION_CACHE_DIR)
+    parser.add_argument('--max-mb', type=float, help="remove as entradas usadas há mais tempo até caber neste tamanho")
+    parser.add_argument('--clear', action='store_true', help="apaga todas as entradas")
+    args = parser.parse_args()
+
+    cache = PredictionCache(args.directory)
+    removed = 0
+    if args.clear:
+        removed = cache.evict(0)
+    elif args.max_mb is not None:
+        removed = cache.evict(int(args.max_mb * 1024 * 1024))
+    entries = cache.entries()
+    print(f"{len(entries)} sessões em cache ({sum(size for _, size, _ in entries) / 1024 / 1024:.1f} MB) em {args.directory}"
+          + (f"; {removed} removidas" if removed else ""))
+
+
+if __name__ == '__main__':
+    main()
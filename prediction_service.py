@@ -0,0 +1,472 @@
+"""Serviço local de previsão: um processo mantém o modelo carregado e atende todas as interfaces.
+
+    python prediction_service.py serve [--socket mindtv_previsao.sock] [--port 8765] [--batch-ms 5]
+    python prediction_service.py stats
+    python prediction_service.py load --streams 128 --seconds 10
+
+O protocolo é HTTP/1.1, por um socket Unix ou por localhost:
+`GET /model` (classes, versão e configuração de atributos), `GET /stats`
+(fila e latências) e `POST /predict`, cujo corpo são as linhas de atributos
+em float32 (cabeçalho `X-Features` com o número de colunas). Os clientes
+calculam os atributos das janelas, como fariam com o modelo local, e
+`RemoteModel` pode ser usado no lugar do modelo em `predict_samples` e
+`predict_session`.
+"""
+import argparse
+import http.client
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from compiled_forest import MODEL_FILE
+from model_registry import get_model
+
+PREDICTION_SERVICE = 'unix:mindtv_previsao.sock'
+SERVICE_PORT = 8765
+# Uma requisição espera no máximo BATCH_DEADLINE_MS por outras antes de o lote ser previsto.
+BATCH_DEADLINE_MS = 5.0
+MAX_BATCH_ROWS = 4096
+LATENCY_SAMPLES = 10000
+REQUEST_TIMEOUT = 10.0
+# Conexões aguardando aceitação: todos os coletores podem conectar ao mesmo tempo.
+LISTEN_BACKLOG = 1024
+STATS_INTERVAL = 10.0
+
+
+class PendingRequest:
+    def __init__(self, X):
+        self.X = X
+        self.arrival = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class PredictionService:
+    """Fila de requisições previstas em micro-lotes por uma única thread.
+
+    A thread pega a requisição mais antiga e junta as que chegarem até
+    `batch_ms` depois dela (ou até `max_batch` linhas); as requisições do lote
+    com o mesmo número de colunas são previstas numa chamada a `predict_proba`
+    e cada uma recebe a sua parte. Um erro afeta só as requisições do grupo
+    em que ocorreu. O modelo vem do registro a cada lote, e um modelo novo salvo pelo
+    treinamento passa a ser usado sem reiniciar o serviço.
+    """
+
+    def __init__(self, model_path=MODEL_FILE, batch_ms=BATCH_DEADLINE_MS, max_batch=MAX_BATCH_ROWS):
+        self.model_path = model_path
+        self.batch_seconds = batch_ms / 1000.0
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.lock = threading.Lock()
+        self.requests = self.rows = self.batches = self.errors = 0
+        self.max_queue_depth = 0
+        self.thread = None
+
+    def model(self):
+        return get_model(self.model_path)
+
+    def n_features(self):
+        model = self.model()
+        names = getattr(model, 'feature_names_in_', None)
+        return getattr(model, 'n_features_in_', None) or (len(names) if names is not None else None)
+
+    def model_info(self):
+        model = self.model()
+        names = getattr(model, 'feature_names_in_', None)
+        return {
+            'classes': np.asarray(model.classes_).tolist(),
+            'feature_config': getattr(model, 'feature_config_', None),
+            'feature_names': list(names) if names is not None else None,
+            'model_version': getattr(model, 'model_version_', None),
+            'model_id': getattr(model, 'model_id_', None),
+        }
+
+    def start(self):
+        self.model()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.queue.put(None)
+        if self.thread:
+            self.thread.join()
+
+    def predict(self, X, timeout=REQUEST_TIMEOUT):
+        """(classes, probabilidades, identidade do modelo) das linhas de `X`, previstas junto com as demais requisições da fila."""
+        request = PendingRequest(X)
+        self.queue.put(request)
+        if not request.done.wait(timeout):
+            raise TimeoutError("a previsão não terminou dentro do prazo")
+        if request.error:
+            raise request.error
+        return request.result
+
+    def _collect(self, first):
+        batch, rows = [first], len(first.X)
+        deadline = first.arrival + self.batch_seconds
+        while rows < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                request = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                self.queue.put(None)
+                break
+            batch.append(request)
+            rows += len(request.X)
+        return batch
+
+    def run(self):
+        while True:
+            first = self.queue.get()
+            if first is None:
+                return
+            depth = self.queue.qsize() + 1
+            batch = self._collect(first)
+            groups = {}
+            for request in batch:
+                groups.setdefault(request.X.shape[1], []).append(request)
+            for requests in groups.values():
+                self._predict(requests)
+            now = time.monotonic()
+            with self.lock:
+                self.max_queue_depth = max(self.max_queue_depth, depth)
+                self.batches += 1
+                for request in batch:
+                    self.requests += 1
+                    self.rows += len(request.X)
+                    self.errors += request.error is not None
+                    self.latencies.append(now - request.arrival)
+            for request in batch:
+                request.done.set()
+
+    def _predict(self, requests):
+        try:
+            model = self.model()
+            X = np.concatenate([request.X for request in requests])
+            names = getattr(model, 'feature_names_in_', None)
+            if names is not None and len(names) == X.shape[1]:
+                X = pd.DataFrame(X, columns=list(names))
+            proba = model.predict_proba(X) if len(X) else np.zeros((0, len(model.classes_)))
+            classes = np.asarray(model.classes_)
+            identity = getattr(model, 'model_id_', None)
+            start = 0
+            for request in requests:
+                request.result = (classes, proba[start:start + len(request.X)], identity)
+                start += len(request.X)
+        except Exception as e:
+            for request in requests:
+                request.error = e
+
+    def stats(self):
+        with self.lock:
+            latencies = np.array(self.latencies) * 1000
+            return {
+                'queue_depth': self.queue.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+                'requests': self.requests,
+                'rows': self.rows,
+                'batches': self.batches,
+                'errors': self.errors,
+                'mean_batch_rows': self.rows / self.batches if self.batches else 0.0,
+                'mean_batch_requests': self.requests / self.batches if self.batches else 0.0,
+                'latency_ms_p50': float(np.percentile(latencies, 50)) if len(latencies) else None,
+                'latency_ms_p99': float(np.percentile(latencies, 99)) if len(latencies) else None,
+            }
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        service = self.server.service
+        try:
+            if self.path == '/model':
+                self._send(200, service.model_info())
+            elif self.path == '/stats':
+                self._send(200, service.stats())
+            else:
+                self._send(404, {'error': f"caminho desconhecido: {self.path}"})
+        except Exception as e:
+            self._send(500, {'error': str(e)})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path != '/predict':
+            self._send(404, {'error': f"caminho desconhecido: {self.path}"})
+            return
+        service = self.server.service
+        try:
+            width = int(self.headers.get('X-Features', 0))
+            expected = service.n_features()
+        except ValueError:
+            width, expected = 0, None
+        if width <= 0 or (expected is not None and width != expected) or len(body) % (4 * width):
+            self._send(400, {'error': f"esperadas linhas de {expected} atributos float32; "
+                                      f"recebidos {len(body)} bytes com X-Features {self.headers.get('X-Features')}"})
+            return
+        try:
+            X = np.frombuffer(body, dtype=np.float32).reshape(-1, width)
+            classes, proba, identity = service.predict(X)
+            self._send(200, {'classes': classes.tolist(), 'probabilities': proba.tolist(), 'model_id': identity})
+        except Exception as e:
+            self._send(500, {'error': str(e)})
+
+    def address_string(self):
+        return str(self.client_address[0]) if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        super().server_bind()
+
+
+def serve(service, address):
+    """Servidor HTTP do serviço em `address` ('unix:caminho' ou 'http://127.0.0.1:porta'), já escutando."""
+    if address.startswith('unix:'):
+        server = UnixHTTPServer(address[len('unix:'):], PredictionHandler)
+    else:
+        host, _, port = address.removeprefix('http://').rpartition(':')
+        server = LocalHTTPServer((host or '127.0.0.1', int(port)), PredictionHandler)
+    server.service = service
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=REQUEST_TIMEOUT):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class RemoteModel:
+    """Cliente do serviço com a interface de previsão de um modelo (`classes_`, `predict`, `predict_proba`).
+
+    Cada thread usa a sua própria conexão, mantida aberta entre as requisições.
+    """
+
+    def __init__(self, address=PREDICTION_SERVICE, timeout=REQUEST_TIMEOUT):
+        self.address = address
+        self.timeout = timeout
+        self.local = threading.local()
+        self.refresh()
+
+    def _connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            if self.address.startswith('unix:'):
+                connection = UnixHTTPConnection(self.address[len('unix:'):], self.timeout)
+            else:
+                connection = http.client.HTTPConnection(self.address.removeprefix('http://'), timeout=self.timeout)
+            self.local.connection = connection
+        return connection
+
+    def request(self, method, path, body=None, headers=None):
+        connection = self._connection()
+        try:
+            connection.request(method, path, body, headers or {})
+            response = connection.getresponse()
+            payload = json.loads(response.read())
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self.local.connection = None
+            raise
+        if response.status != 200:
+            raise RuntimeError(f"serviço de previsão: {payload.get('error')}")
+        return payload
+
+    def refresh(self):
+        info = self.request('GET', '/model')
+        self.classes_ = np.array(info['classes'])
+        self.model_version_ = info['model_version']
+        self.model_id_ = info['model_id']
+        if info['feature_config']:
+            self.feature_config_ = info['feature_config']
+        elif hasattr(self, 'feature_config_'):
+            del self.feature_config_
+        if info['feature_names']:
+            self.feature_names_in_ = info['feature_names']
+
+    def predict_proba(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        payload = self.request('POST', '/predict', X.tobytes(), {'X-Features': str(X.shape[1]),
+                                                               'Content-Type': 'application/octet-stream'})
+        classes = np.array(payload['classes'])
+        proba = np.array(payload['probabilities']).reshape(len(X), len(classes))
+        if payload['model_id'] != self.model_id_:
+            # O serviço recarregou o modelo: classes e configuração de atributos podem ter mudado.
+            config = getattr(self, 'feature_config_', None)
+            self.refresh()
+            if getattr(self, 'feature_config_', None) != config:
+                raise RuntimeError("o modelo do serviço de previsão foi trocado por outro com outros atributos; "
+                                   "repita a previsão")
+        self.classes_ = classes
+        return proba
+
+    def predict(self, X):
+        proba = self.predict_proba(X)
+        return self.classes_[np.argmax(proba, axis=1)] if len(proba) else self.classes_[:0]
+
+    def stats(self):
+        return self.request('GET', '/stats')
+
+
+def remote_model(address=PREDICTION_SERVICE):
+    """RemoteModel do serviço em `address`, ou None se ele não estiver rodando."""
+    if address.startswith('unix:') and not os.path.exists(address[len('unix:'):]):
+        return None
+    try:
+        return RemoteModel(address, timeout=REQUEST_TIMEOUT)
+    except (OSError, http.client.HTTPException, RuntimeError):
+        return None
+
+
+def generate_load(address, streams, seconds, rate, windows=1):
+    """Simula `streams` coletores, cada um enviando `rate` requisições de `windows` janelas por segundo."""
+    client = RemoteModel(address)
+    n_features = len(client.feature_names_in_) if getattr(client, 'feature_names_in_', None) else 9
+    latencies = [[] for _ in range(streams)]
+    errors = [0] * streams
+    start = time.monotonic() + 0.5
+    stop = start + seconds
+
+    def stream(index):
+        rng = np.random.default_rng(index)
+        try:
+            local = RemoteModel(address)
+        except (OSError, http.client.HTTPException, RuntimeError):
+            errors[index] += 1
+            return
+        tick = start + rng.uniform(0, 1 / rate)
+        while tick < stop:
+            delay = tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            X = rng.normal(size=(windows, n_features)).astype(np.float32)
+            sent = time.monotonic()
+            try:
+                local.predict(X)
+                latencies[index].append(time.monotonic() - sent)
+            except Exception:
+                errors[index] += 1
+            tick += 1 / rate
+
+    threads = [threading.Thread(target=stream, args=(index,), daemon=True) for index in range(streams)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+    done = np.concatenate([np.array(values) for values in latencies]) * 1000
+    return {
+        'streams': streams,
+        'requests': int(len(done)),
+        'errors': int(sum(errors)),
+        'requests_per_second': len(done) / elapsed,
+        'latency_ms_p50': float(np.percentile(done, 50)) if len(done) else None,
+        'latency_ms_p99': float(np.percentile(done, 99)) if len(done) else None,
+        'latency_ms_max': float(done.max()) if len(done) else None,
+        'server': client.stats(),
+    }
+
+
+def format_stats(stats):
+    p50, p99 = stats['latency_ms_p50'], stats['latency_ms_p99']
+    return (f"{stats['requests']} requisições, {stats['rows']} janelas em {stats['batches']} lotes "
+            f"(média de {stats['mean_batch_requests']:.1f} requisições por lote); fila: {stats['queue_depth']} "
+            f"(máx. {stats['max_queue_depth']}); latência p50 {p50 or 0:.1f} ms, p99 {p99 or 0:.1f} ms; "
+            f"erros: {stats['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_parser = commands.add_parser('serve', help="inicia o serviço")
+    serve_parser.add_argument('--socket', default=PREDICTION_SERVICE[len('unix:'):], help="socket Unix ('' desativa)")
+    serve_parser.add_argument('--port', type=int, help=f"também atende por HTTP em 127.0.0.1 (por exemplo {SERVICE_PORT})")
+    serve_parser.add_argument('--model', default=MODEL_FILE)
+    serve_parser.add_argument('--batch-ms', type=float, default=BATCH_DEADLINE_MS, help="espera máxima para formar um lote")
+    serve_parser.add_argument('--max-batch', type=int, default=MAX_BATCH_ROWS, help="janelas por lote")
+    for name in ('stats', 'load'):
+        command = commands.add_parser(name)
+        command.add_argument('--address', default=PREDICTION_SERVICE, help="'unix:caminho' ou 'http://127.0.0.1:porta'")
+    load = commands.choices['load']
+    load.add_argument('--streams', type=int, default=128, help="coletores simultâneos")
+    load.add_argument('--seconds', type=float, default=10.0)
+    load.add_argument('--rate', type=float, default=2.0, help="requisições por segundo de cada coletor")
+    load.add_argument('--windows', type=int, default=1, help="janelas por requisição")
+    args = parser.parse_args()
+
+    if args.command == 'stats':
+        print(format_stats(RemoteModel(args.address).stats()))
+    elif args.command == 'load':
+        result = generate_load(args.address, args.streams, args.seconds, args.rate, args.windows)
+        print(f"{result['streams']} coletores: {result['requests']} requisições ({result['requests_per_second']:.0f}/s), "
+              f"{result['errors']} erros; latência no cliente p50 {result['latency_ms_p50']:.1f} ms, "
+              f"p99 {result['latency_ms_p99']:.1f} ms, máx. {result['latency_ms_max']:.1f} ms")
+        print(f"Serviço: {format_stats(result['server'])}")
+    else:
+        service = PredictionService(args.model, args.batch_ms, args.max_batch).start()
+        servers = [serve(service, f'unix:{args.socket}')] if args.socket else []
+        if args.port:
+            servers.append(serve(service, f'http://127.0.0.1:{args.port}'))
+        if not servers:
+            raise SystemExit("Informe --socket ou --port")
+        print(f"Serviço de previsão ativo ({', '.join(str(server.server_address) for server in servers)}), "
+              f"modelo versão {service.model_info()['model_version']}")
+        try:
+            while True:
+                time.sleep(STATS_INTERVAL)
+                print(format_stats(service.stats()), flush=True)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for server in servers:
+                server.shutdown()
+                server.server_close()
+            service.stop()
+            if args.socket and os.path.exists(args.socket):
+                os.unlink(args.socket)
+
+
+if __name__ == '__main__':
+    main()
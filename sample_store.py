@@ -0,0 +1,115 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from serial_protocol import CHANNELS
+
+SAMPLE_DTYPE = np.dtype([
+    ('t', '<f8'),
+    ('source', 'u1'),
+    ('participant', 'u1'),
+    ('irValue', '<f4'),
+    ('beatsPerMinute', '<f4'),
+    ('beatAvg', '<f4'),
+    ('GSR', '<f4'),
+])
+CHUNK_SIZE = 4096
+
+
+class SampleStore:
+    """Armazenamento pré-alocado das amostras de uma coleta.
+
+    As amostras ficam em um array estruturado (`SAMPLE_DTYPE`) que cresce em
+    blocos de `chunk_size`. Com `max_samples` o array tem tamanho fixo e
+    funciona como buffer circular, guardando apenas as amostras mais recentes.
+    O tempo `t` é medido em segundos com relógio monotônico desde `t0`.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, max_samples=None):
+        self.chunk_size = chunk_size
+        self.max_samples = max_samples
+        self.data = np.zeros(max_samples or chunk_size, dtype=SAMPLE_DTYPE)
+        self.head = 0
+        self.size = 0
+        self.total = 0
+        self.lock = threading.Lock()
+        self.t0 = time.monotonic()
+
+    def __len__(self):
+        return self.size
+
+    def now(self):
+        return time.monotonic() - self.t0
+
+    def append(self, records, t=None, source=0):
+        n = len(records)
+        if not n:
+            return
+        with self.lock:
+            # Carimbado dentro do lock: com várias fontes a ordem no array segue a ordem temporal.
+            times = np.broadcast_to(self.now() if t is None else t, (n,))
+            if self.max_samples is None:
+                self._reserve(self.size + n)
+                self._write(self.size, records, times, source)
+                self.size += n
+            else:
+                capacity = len(self.data)
+                if n > capacity:
+                    records, times = records[-capacity:], times[-capacity:]
+                    n = capacity
+                end = (self.head + self.size) % capacity
+                first = min(n, capacity - end)
+                self._write(end, records[:first], times[:first], source)
+                self._write(0, records[first:], times[first:], source)
+                self.size += n
+                if self.size > capacity:
+                    self.head = (self.head + self.size - capacity) % capacity
+                    self.size = capacity
+            self.total += len(records)
+
+    def _reserve(self, needed):
+        if needed <= len(self.data):
+            return
+        capacity = max(needed, len(self.data) + len(self.data) // 2)
+        capacity = -(-capacity // self.chunk_size) * self.chunk_size
+        data = np.zeros(capacity, dtype=SAMPLE_DTYPE)
+        data[:self.size] = self.data[:self.size]
+        self.data = data
+
+    def _write(self, start, records, times, source):
+        target = self.data[start:start + len(records)]
+        target['t'] = times
+        target['source'] = source
+        for name in SAMPLE_DTYPE.names[2:]:
+            if name in records.dtype.names:
+                target[name] = records[name]
+
+    def truncate(self, size):
+        with self.lock:
+            self.size = min(self.size, size)
+
+    def view(self):
+        """Amostras em ordem cronológica (sem cópia, exceto quando o buffer circular deu a volta)."""
+        with self.lock:
+            end = self.head + self.size
+            if end <= len(self.data):
+                return self.data[self.head:end]
+            return np.concatenate((self.data[self.head:], self.data[:end - len(self.data)]))
+
+    def since(self, total):
+        """Cópia das amostras recebidas depois das primeiras `total`.
+
+        Devolve também quantas dessas amostras já foram sobrescritas pelo
+        buffer circular e não estão mais disponíveis.
+        """
+        with self.lock:
+            missing = self.total - total
+            kept = min(missing, self.size)
+            end = self.head + self.size
+            return self.data[np.arange(end - kept, end) % len(self.data)], missing - kept
+
+    def to_dataframe(self, columns=CHANNELS):
+        samples = self.view()
+        return pd.DataFrame({column: samples[column] for column in columns})
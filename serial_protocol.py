@@ -0,0 +1,204 @@
+import numpy as np
+
+# Quadro binário enviado pelo firmware (little-endian, 16 bytes):
+#   sync(2) seq(u16) participant(u8) irValue(u32) beatsPerMinute(u16) beatAvg(u16) GSR(u16) checksum(u8)
+# O checksum é a soma (mod 256) dos bytes entre o sync e o próprio checksum.
+SYNC = b'\xaa\x55'
+FRAME_DTYPE = np.dtype([
+    ('sync', '<u2'),
+    ('seq', '<u2'),
+    ('participant', 'u1'),
+    ('irValue', '<u4'),
+    ('beatsPerMinute', '<u2'),
+    ('beatAvg', '<u2'),
+    ('GSR', '<u2'),
+    ('checksum', 'u1'),
+])
+FRAME_SIZE = FRAME_DTYPE.itemsize
+
+RECORD_DTYPE = np.dtype([
+    ('seq', '<u2'),
+    ('participant', 'u1'),
+    ('irValue', '<f4'),
+    ('beatsPerMinute', '<f4'),
+    ('beatAvg', '<f4'),
+    ('GSR', '<f4'),
+])
+CHANNELS = ['irValue', 'beatsPerMinute', 'beatAvg', 'GSR']
+
+# Número de campos de cada formato de linha de texto e as colunas correspondentes.
+ASCII_LAYOUTS = {
+    3: CHANNELS[1:],
+    4: CHANNELS,
+    5: ['participant'] + CHANNELS,
+}
+# Linhas de texto sem índice: o participante é atribuído depois pelo ParticipantDemux.
+UNKNOWN_PARTICIPANT = 0xFF
+
+_FRAME_OFFSETS = np.arange(FRAME_SIZE)
+
+
+def encode_frame(seq, participant, ir_value, bpm, beat_avg, gsr):
+    frame = np.zeros(1, dtype=FRAME_DTYPE)
+    frame['sync'] = int.from_bytes(SYNC, 'little')
+    frame['seq'] = seq & 0xFFFF
+    frame['participant'] = participant
+    frame['irValue'] = ir_value
+    frame['beatsPerMinute'] = bpm
+    frame['beatAvg'] = beat_avg
+    frame['GSR'] = gsr
+    raw = bytearray(frame.tobytes())
+    raw[-1] = sum(raw[2:-1]) & 0xFF
+    return bytes(raw)
+
+
+def frames_to_records(frames):
+    records = np.empty(len(frames), dtype=RECORD_DTYPE)
+    for name in RECORD_DTYPE.names:
+        records[name] = frames[name]
+    return records
+
+
+def decode_frames(buffer):
+    """Decodifica todos os quadros completos de `buffer`.
+
+    Retorna (records, consumed, bad_frames): `consumed` é quantos bytes do
+    início do buffer podem ser descartados; o restante pode conter um quadro
+    incompleto e deve ser reaproveitado na próxima leitura.
+    """
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    n = len(data)
+    if n < 2:
+        return np.empty(0, dtype=RECORD_DTYPE), 0, 0
+
+    starts = np.flatnonzero((data[:-1] == SYNC[0]) & (data[1:] == SYNC[1]))
+    complete = starts[starts + FRAME_SIZE <= n]
+
+    bad_frames = 0
+    if len(complete):
+        rows = data[complete[:, None] + _FRAME_OFFSETS]
+        checksum = rows[:, 2:-1].sum(axis=1, dtype=np.uint32) & 0xFF
+        valid = checksum == rows[:, -1]
+        good = complete[valid]
+        # Um falso sync dentro de um quadro válido pode passar no checksum;
+        # nesse caso (raro) resolvemos as sobreposições sequencialmente.
+        if len(good) > 1 and np.any(np.diff(good) < FRAME_SIZE):
+            kept = []
+            end = 0
+            for start in good:
+                if start >= end:
+                    kept.append(start)
+                    end = start + FRAME_SIZE
+            good = np.asarray(kept, dtype=complete.dtype)
+        frames = data[good[:, None] + _FRAME_OFFSETS].copy().view(FRAME_DTYPE).ravel()
+        records = frames_to_records(frames)
+        bad_frames = int(len(complete) - np.count_nonzero(valid))
+        consumed = int(good[-1]) + FRAME_SIZE if len(good) else 0
+    else:
+        records = np.empty(0, dtype=RECORD_DTYPE)
+        consumed = 0
+
+    pending = starts[starts >= consumed]
+    pending = pending[pending + FRAME_SIZE > n]
+    if len(pending):
+        consumed = int(pending[0])
+    elif data[-1] == SYNC[0]:
+        consumed = n - 1
+    else:
+        consumed = n
+    return records, consumed, bad_frames
+
+
+def parse_ascii_lines(lines):
+    """Converte linhas de texto em registros, na ordem em que chegaram.
+
+    Formatos aceitos: `bpm,avg,gsr`, `ir,bpm,avg,gsr` e `participante,ir,bpm,avg,gsr`.
+    Linhas com outro número de campos ou valores não numéricos são ignoradas.
+    """
+    n_fields = np.array([line.count(b',') + 1 for line in lines], dtype=np.int64)
+    records = np.zeros(len(lines), dtype=RECORD_DTYPE)
+    records['irValue'] = np.nan
+    records['participant'] = UNKNOWN_PARTICIPANT
+    valid = np.zeros(len(lines), dtype=bool)
+    for size, columns in ASCII_LAYOUTS.items():
+        index = np.flatnonzero(n_fields == size)
+        if not len(index):
+            continue
+        try:
+            values = np.array(b','.join([lines[i] for i in index]).split(b',')).astype(np.float32)
+            values = values.reshape(-1, size)
+        except ValueError:
+            parsed, ok = [], []
+            for i in index:
+                try:
+                    parsed.append([float(field) for field in lines[i].split(b',')])
+                    ok.append(i)
+                except ValueError:
+                    continue
+            values = np.array(parsed, dtype=np.float32).reshape(-1, size)
+            index = np.asarray(ok, dtype=np.int64)
+        for k, column in enumerate(columns):
+            records[column][index] = values[:, k]
+        valid[index] = True
+    return records[valid]
+
+
+class FrameDecoder:
+    """Decodificador incremental de quadros binários."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.frames = 0
+        self.bad_frames = 0
+        self.lost_frames = 0
+        self.last_seq = None
+
+    def feed(self, data):
+        self.buffer += data
+        records, consumed, bad_frames = decode_frames(self.buffer)
+        del self.buffer[:consumed]
+        self.bad_frames += bad_frames
+        if len(records):
+            seq = records['seq'].astype(np.int64)
+            if self.last_seq is not None:
+                seq = np.concatenate(([self.last_seq], seq))
+            gaps = (np.diff(seq) - 1) % 0x10000
+            self.lost_frames += int(gaps.sum())
+            self.last_seq = int(seq[-1])
+            self.frames += len(records)
+        return records
+
+    def messages(self, records):
+        return format_records(records)
+
+
+class AsciiDecoder:
+    """Decodificador incremental do protocolo de texto (uma amostra por linha)."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.lines = []
+
+    def feed(self, data):
+        self.buffer += data
+        end = self.buffer.rfind(b'\n')
+        if end < 0:
+            self.lines = []
+            return np.empty(0, dtype=RECORD_DTYPE)
+        self.lines = bytes(self.buffer[:end]).replace(b'\r', b'').split(b'\n')
+        del self.buffer[:end + 1]
+        return parse_ascii_lines(self.lines)
+
+    def messages(self, records):
+        return [line.decode('utf-8', 'replace') for line in self.lines]
+
+
+def make_decoder(binary=False):
+    return FrameDecoder() if binary else AsciiDecoder()
+
+
+def format_records(records):
+    return [
+        f"IR: {r['irValue']:.0f}, BPM: {r['beatsPerMinute']:.0f}, Avg BPM: {r['beatAvg']:.0f}, GSR: {r['GSR']:.0f}"
+        for r in records
+    ]
@@ -0,0 +1,51 @@
+import glob
+import os
+import tempfile
+
+import serial
+import serial.tools.list_ports
+
+from serial_protocol import make_decoder
+
+# Dispositivos simulados (fake_serial_device.py) publicam aqui um link para o seu pseudo-terminal.
+SIMULATED_PORTS_DIR = os.path.join(tempfile.gettempdir(), 'mindtv_ports')
+
+
+def list_serial_ports():
+    ports = [port.device for port in serial.tools.list_ports.comports()]
+    simulated = sorted(glob.glob(os.path.join(SIMULATED_PORTS_DIR, 'sim*')))
+    return ports + [link for link in simulated if os.path.exists(link)]
+
+
+class SerialReader:
+    """Leitura em blocos de uma porta serial, sem espera ativa.
+
+    Cada `read()` bloqueia por no máximo `timeout` segundos aguardando dados e
+    então lê tudo o que já chegou de uma vez para um buffer reutilizável. Os
+    registros completos são devolvidos já decodificados.
+    """
+
+    def __init__(self, port, binary=False, baudrate=115200, timeout=0.1, chunk_size=4096):
+        self.ser = serial.Serial(port, baudrate, timeout=timeout)
+        self.decoder = make_decoder(binary)
+        self.buffer = bytearray(chunk_size)
+        self.view = memoryview(self.buffer)
+        self.bytes_read = 0
+
+    def read(self):
+        size = min(max(1, self.ser.in_waiting), len(self.buffer))
+        count = self.ser.readinto(self.view[:size])
+        self.bytes_read += count
+        return self.decoder.feed(self.view[:count])
+
+    def messages(self, records):
+        return self.decoder.messages(records)
+
+    def close(self):
+        self.ser.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,270 @@
+import argparse
+import json
+import os
+import struct
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from features import sample_predictor
+from sample_store import SAMPLE_DTYPE
+
+# Arquivo de sessão: SESSION_MAGIC, tamanho do cabeçalho (u32), cabeçalho JSON e
+# em seguida os registros SAMPLE_DTYPE brutos, acrescentados durante a coleta.
+# Sessões longas são divididas em segmentos: sessao.mtv, sessao.1.mtv, sessao.2.mtv...
+SESSION_MAGIC = b'MTVSES1\n'
+SESSION_HEADER = struct.Struct('<I')
+SESSIONS_DIR = 'sessoes'
+SESSION_EXTENSION = '.mtv'
+FLUSH_INTERVAL = 1.0
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+SEGMENT_MAX_SECONDS = 15 * 60
+# Amostras mantidas em memória durante uma coleta gravada em disco.
+SESSION_BUFFER_SAMPLES = 65536
+EXPORT_CHUNK_SIZE = 100000
+
+
+def new_session_path(directory=SESSIONS_DIR):
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, time.strftime('sessao_%Y%m%d_%H%M%S'))
+    path = base + SESSION_EXTENSION
+    counter = 1
+    while os.path.exists(path):
+        path = f"{base}_{counter}{SESSION_EXTENSION}"
+        counter += 1
+    return path
+
+
+def segment_path(path, index):
+    if not index:
+        return path
+    base, extension = os.path.splitext(path)
+    return f"{base}.{index}{extension}"
+
+
+def session_segments(path):
+    segments = [path]
+    while os.path.exists(segment_path(path, len(segments))):
+        segments.append(segment_path(path, len(segments)))
+    return segments
+
+
+def next_csv_filename(base_filename='coleta_dados', extension='.csv'):
+    filename = base_filename + extension
+    counter = 1
+    while os.path.exists(filename):
+        filename = f"{base_filename}({counter}){extension}"
+        counter += 1
+    return filename
+
+
+class SessionWriter:
+    """Grava as amostras de uma coleta em disco à medida que chegam.
+
+    `drain(store)` acrescenta ao arquivo as amostras que chegaram ao
+    `SampleStore` desde a chamada anterior; a cada `flush_interval` segundos
+    o arquivo é sincronizado com o disco, de modo que uma falha perde no
+    máximo esse intervalo de dados. Um novo segmento é aberto quando o atual
+    passa de `max_segment_bytes` ou de `max_segment_seconds` (None desativa).
+    """
+
+    def __init__(self, path, metadata=None, flush_interval=FLUSH_INTERVAL,
+                 max_segment_bytes=SEGMENT_MAX_BYTES, max_segment_seconds=SEGMENT_MAX_SECONDS):
+        self.path = path
+        self.metadata = metadata or {}
+        self.flush_interval = flush_interval
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+        self.segments = []
+        self.file = None
+        self.drained = 0
+        self.written = 0
+        self.lost = 0
+        self._open_segment()
+
+    def _open_segment(self):
+        if self.file:
+            self.close()
+        self.segments.append(segment_path(self.path, len(self.segments)))
+        self.file = open(self.segments[-1], 'wb')
+        header = json.dumps({
+            'dtype': SAMPLE_DTYPE.descr,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'segment': len(self.segments) - 1,
+            **self.metadata,
+        }).encode()
+        self.file.write(SESSION_MAGIC + SESSION_HEADER.pack(len(header)) + header)
+        self.segment_bytes = 0
+        self.segment_started = time.monotonic()
+        self.flush()
+
+    def _segment_full(self):
+        return ((self.max_segment_bytes and self.segment_bytes >= self.max_segment_bytes)
+                or (self.max_segment_seconds and time.monotonic() - self.segment_started >= self.max_segment_seconds))
+
+    def drain(self, store):
+        samples, lost = store.since(self.drained)
+        self.drained += len(samples) + lost
+        self.lost += lost
+        self.write(samples)
+
+    def write(self, samples):
+        if len(samples):
+            if self._segment_full():
+                self._open_segment()
+            data = np.ascontiguousarray(samples, dtype=SAMPLE_DTYPE).tobytes()
+            self.file.write(data)
+            self.segment_bytes += len(data)
+            self.written += len(samples)
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_header(f):
+    if f.read(len(SESSION_MAGIC)) != SESSION_MAGIC:
+        raise ValueError(f"{f.name} não é um arquivo de sessão do MindTV")
+    raw = f.read(SESSION_HEADER.size)
+    if len(raw) < SESSION_HEADER.size:
+        raise ValueError(f"Cabeçalho incompleto em {f.name}")
+    (size,) = SESSION_HEADER.unpack(raw)
+    header = json.loads(f.read(size))
+    return header, f.tell()
+
+
+def open_segment(path):
+    """Cabeçalho e amostras (memmap somente leitura) de um segmento gravado.
+
+    Um registro incompleto no fim do arquivo, deixado por uma coleta
+    interrompida, é ignorado.
+    """
+    with open(path, 'rb') as f:
+        header, offset = read_header(f)
+    count = (os.path.getsize(path) - offset) // SAMPLE_DTYPE.itemsize
+    if not count:
+        return header, np.zeros(0, dtype=SAMPLE_DTYPE)
+    return header, np.memmap(path, dtype=SAMPLE_DTYPE, mode='r', offset=offset, shape=(count,))
+
+
+class SessionReader:
+    """Uma sessão gravada, com todos os seus segmentos, lida como um único conjunto.
+
+    Os segmentos são mapeados em memória; `chunks` percorre as amostras em
+    blocos e `column` monta apenas as colunas pedidas.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.segments = [open_segment(segment) for segment in session_segments(path)]
+        self.header = self.segments[0][0]
+
+    def __len__(self):
+        return sum(len(samples) for _, samples in self.segments)
+
+    def chunks(self, chunk_size=EXPORT_CHUNK_SIZE):
+        for _, samples in self.segments:
+            for start in range(0, len(samples), chunk_size):
+                yield samples[start:start + chunk_size]
+
+    def column(self, name, dtype=np.float32):
+        values = np.empty(len(self), dtype=dtype)
+        start = 0
+        for _, samples in self.segments:
+            values[start:start + len(samples)] = samples[name]
+            start += len(samples)
+        return values
+
+    def to_dataframe(self, columns):
+        """Colunas pedidas e, se a sessão registrou o conteúdo assistido, a coluna Content."""
+        df = pd.DataFrame({column: self.column(column) for column in columns})
+        if self.header.get('content'):
+            df['Content'] = pd.Categorical.from_codes(np.zeros(len(df), dtype=np.int8), [self.header['content']])
+        return df
+
+
+def recover_session(path):
+    """Remove registros incompletos no fim dos segmentos e devolve o número de amostras.
+
+    Um último segmento sem cabeçalho completo (falha logo após a rotação) é removido.
+    """
+    total = 0
+    segments = session_segments(path)
+    for index, segment in enumerate(segments):
+        with open(segment, 'rb') as f:
+            try:
+                _, offset = read_header(f)
+            except ValueError:
+                if index and index == len(segments) - 1:
+                    os.remove(segment)
+                    break
+                raise
+        count, partial = divmod(os.path.getsize(segment) - offset, SAMPLE_DTYPE.itemsize)
+        if partial:
+            os.truncate(segment, offset + count * SAMPLE_DTYPE.itemsize)
+        total += count
+    return total
+
+
+def export_session_csv(path, columns, content, filename=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Exporta a sessão para o layout de `coleta_dados(N).csv`, em blocos."""
+    filename = filename or next_csv_filename()
+    pd.DataFrame(columns=columns + ['Content']).to_csv(filename, index=False)
+    for chunk in SessionReader(path).chunks(chunk_size):
+        df = pd.DataFrame({column: chunk[column] for column in columns})
+        df['Content'] = content
+        df.to_csv(filename, mode='a', header=False, index=False)
+    return filename
+
+
+def predict_session(model, path, columns, participants=1, chunk_size=EXPORT_CHUNK_SIZE):
+    """Rótulo mais frequente de cada participante, prevendo a sessão em blocos.
+
+    `columns` são as colunas usadas por modelos antigos, treinados com amostras
+    brutas; os demais recebem os atributos por janela de `features`.
+    """
+    votes = [Counter() for _ in range(participants)]
+    extractors = {}
+    predict = sample_predictor(model)
+    for chunk in SessionReader(path).chunks(chunk_size):
+        predictions, owners = predict(chunk, columns, extractors)
+        if participants == 1:
+            owners = np.zeros(len(predictions), dtype=np.int64)
+        counts = pd.DataFrame({'participant': owners, 'label': predictions}).value_counts()
+        for (participant, label), count in counts.items():
+            votes[participant][label] += count
+    return [counter.most_common(1)[0][0] if counter else None for counter in votes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recupera e exporta sessões de coleta gravadas em disco.")
+    parser.add_argument('session')
+    parser.add_argument('--content', required=True, help="tipo de conteúdo assistido (coluna Content)")
+    parser.add_argument('--participant', action='store_true', help="inclui a coluna participant")
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    count = recover_session(args.session)
+    columns = (['participant'] if args.participant else []) + ['irValue', 'beatsPerMinute', 'beatAvg', 'GSR']
+    filename = export_session_csv(args.session, columns, args.content, args.output)
+    print(f"{count} amostras exportadas para {filename}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Gerador de sessões sintéticas de coleta, para testar o treinamento em escala.
+
+    python synthetic_data.py dados_sinteticos/ --rows 1000000 [--participants 10] [--noise 1.0] [--format mtv]
+
+Cada sessão tem um tipo de conteúdo (sorteado segundo `--mix`) e vários
+participantes, tirados de um grupo fixo de pessoas que se repete entre as
+sessões. Cada pessoa tem linha de base e reatividade próprias; cada conteúdo
+desloca o BPM e o GSR e muda a oscilação do GSR. Sobre isso vêm ruído
+correlacionado no tempo, deriva lenta do GSR e perdas de contato do sensor
+(irValue baixo e BPM zerado). Os valores são inteiros, como os enviados pelo Arduino.
+"""
+import argparse
+import os
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from sample_store import SAMPLE_DTYPE
+from session_log import SESSION_EXTENSION, SessionWriter
+
+DEFAULT_CONTENTS = ['Programa esportivo', 'Telejornal', 'Filme de terror', 'Filme de comedia', 'Desenho animado']
+SAMPLE_RATE = 10.0
+SESSION_ROWS = 200000
+PEOPLE_POOL = 20
+DROPOUT_RATE = 0.002
+NOISE_SMOOTHING = 20
+
+
+def parse_mix(text, contents=DEFAULT_CONTENTS):
+    """'Telejornal=3,Filme de terror=1' -> {conteúdo: peso}; vazio: todos os conteúdos com o mesmo peso."""
+    if not text:
+        return {content: 1.0 for content in contents}
+    mix = {}
+    for item in text.split(','):
+        content, _, weight = item.partition('=')
+        mix[content.strip()] = float(weight) if weight else 1.0
+    return mix
+
+
+def content_profile(content):
+    """Efeito de um conteúdo, fixo para cada nome: excitação (desloca BPM e GSR) e período da oscilação do GSR em segundos."""
+    rng = np.random.default_rng(zlib.crc32(content.encode()))
+    return float(rng.uniform(0.0, 1.0)), float(rng.uniform(4.0, 30.0))
+
+
+def people_profiles(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{
+        'name': f'P{index + 1:02d}',
+        'bpm': rng.normal(72, 8),
+        'gsr': rng.normal(320, 60),
+        'reactivity': rng.uniform(0.5, 1.5),
+        'ir': rng.normal(90000, 10000),
+    } for index in range(count)]
+
+
+def smooth_noise(rng, size, scale):
+    """Ruído branco suavizado (correlacionado entre amostras vizinhas)."""
+    kernel = np.exp(-np.arange(NOISE_SMOOTHING) / (NOISE_SMOOTHING / 4))
+    kernel /= np.sqrt((kernel ** 2).sum())
+    return scale * np.convolve(rng.normal(size=size + len(kernel) - 1), kernel, 'valid')
+
+
+def person_signals(rng, person, profile, cycles, noise=1.0, dropout=DROPOUT_RATE, rate=SAMPLE_RATE):
+    """irValue, beatsPerMinute, beatAvg e GSR de uma pessoa ao longo de `cycles` amostras."""
+    arousal, period = profile
+    t = np.arange(cycles) / rate
+    react = person['reactivity'] * arousal
+    bpm = person['bpm'] + 25 * react + smooth_noise(rng, cycles, 4 * noise)
+    beat_avg = np.convolve(np.concatenate((np.full(15, bpm[0]), bpm)), np.ones(16) / 16, 'valid')
+    drift = np.cumsum(rng.normal(0, 0.3 * noise, cycles))
+    gsr = (person['gsr'] + 150 * react + 20 * (0.5 + react) * np.sin(2 * np.pi * t / period + rng.uniform(0, 2 * np.pi))
+           + drift - drift.mean() + smooth_noise(rng, cycles, 10 * noise))
+    ir = person['ir'] + 3000 * np.sin(2 * np.pi * t * bpm / 60) + smooth_noise(rng, cycles, 1500 * noise)
+    lost = rng.random(cycles) < dropout
+    # Uma perda de contato dura cerca de um segundo.
+    lost = np.convolve(lost, np.ones(int(rate)), 'same') > 0
+    ir[lost] = rng.uniform(1000, 20000, lost.sum())
+    bpm[lost] = 0
+    beat_avg[lost] = 0
+    return [np.maximum(np.rint(values), 0) for values in (ir, bpm, beat_avg, gsr)]
+
+
+def synthetic_session(rows, content, people, profiles, noise=1.0, dropout=DROPOUT_RATE, rate=SAMPLE_RATE, seed=0):
+    """Amostras (SAMPLE_DTYPE) de uma sessão, intercaladas por participante como na coleta."""
+    rng = np.random.default_rng(seed)
+    cycles = -(-rows // len(people))
+    samples = np.zeros(cycles * len(people), dtype=SAMPLE_DTYPE)
+    samples['t'] = np.repeat(np.arange(cycles) / rate, len(people))
+    for slot, person in enumerate(people):
+        view = samples[slot::len(people)]
+        view['participant'] = slot
+        for name, values in zip(('irValue', 'beatsPerMinute', 'beatAvg', 'GSR'),
+                                person_signals(rng, person, profiles[content], cycles, noise, dropout, rate)):
+            view[name] = values
+    return samples[:rows]
+
+
+def session_plan(rows, mix, session_rows=SESSION_ROWS, seed=0):
+    """Tamanho e conteúdo de cada sessão; com sessões suficientes, todo conteúdo do mix aparece."""
+    contents = list(mix)
+    sessions = max(-(-rows // session_rows), min(len(contents), max(1, rows // 200)))
+    sizes = np.full(sessions, rows // sessions)
+    sizes[:rows % sessions] += 1
+    rng = np.random.default_rng(seed)
+    weights = np.array([mix[content] for content in contents], dtype=float)
+    weights /= weights.sum()
+    if sessions >= len(contents):
+        picks = list(range(len(contents))) + list(rng.choice(len(contents), sessions - len(contents), p=weights))
+    else:
+        picks = list(rng.choice(len(contents), sessions, replace=False, p=weights))
+    labels = [contents[pick] for pick in rng.permutation(picks)]
+    return list(zip(sizes.tolist(), labels))
+
+
+def generate_dataset(directory, rows, participants=4, mix=None, noise=1.0, session_rows=SESSION_ROWS,
+                     people_pool=PEOPLE_POOL, dropout=DROPOUT_RATE, file_format='mtv', seed=0):
+    """Grava em `directory` sessões sintéticas somando `rows` amostras e devolve os caminhos.
+
+    `file_format` 'mtv' grava sessões como as do main-10p.py (com os nomes dos
+    participantes no cabeçalho); 'csv' grava um CSV por sessão com as colunas
+    participant, irValue, beatsPerMinute, beatAvg, GSR e Content.
+    """
+    mix = mix or parse_mix(None)
+    profiles = {content: content_profile(content) for content in mix}
+    pool = people_profiles(max(people_pool, participants), seed)
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for index, (size, content) in enumerate(session_plan(rows, mix, session_rows, seed)):
+        people = [pool[i] for i in rng.choice(len(pool), participants, replace=False)]
+        samples = synthetic_session(size, content, people, profiles, noise, dropout, seed=seed * 100003 + index)
+        names = [person['name'] for person in people]
+        if file_format == 'csv':
+            path = os.path.join(directory, f'sintetico_{index:05d}.csv')
+            df = pd.DataFrame({name: samples[name] for name in ('participant', 'irValue', 'beatsPerMinute', 'beatAvg', 'GSR')})
+            df['Content'] = content
+            df.to_csv(path, index=False, float_format='%.0f')
+        else:
+            path = os.path.join(directory, f'sintetico_{index:05d}{SESSION_EXTENSION}')
+            metadata = {'content': content, 'people': names, 'synthetic': {'noise': noise, 'seed': seed}}
+            with SessionWriter(path, metadata, max_segment_seconds=None) as writer:
+                writer.write(samples)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directory')
+    parser.add_argument('--rows', type=int, default=100000, help="total de amostras (todas as sessões e participantes)")
+    parser.add_argument('--participants', type=int, default=4, help="participantes por sessão")
+    parser.add_argument('--mix', help="pesos dos conteúdos, por exemplo 'Telejornal=3,Filme de terror=1'")
+    parser.add_argument('--noise', type=float, default=1.0, help="escala do ruído (0 = sinais limpos)")
+    parser.add_argument('--session-rows', type=int, default=SESSION_ROWS)
+    parser.add_argument('--people', type=int, default=PEOPLE_POOL, help="pessoas distintas no conjunto")
+    parser.add_argument('--dropout', type=float, default=DROPOUT_RATE, help="perdas de contato por amostra")
+    parser.add_argument('--format', choices=['mtv', 'csv'], default='mtv')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    paths = generate_dataset(args.directory, args.rows, args.participants, parse_mix(args.mix), args.noise,
+                             args.session_rows, args.people, args.dropout, args.format, args.seed)
+    print(f"{len(paths)} sessões, {args.rows} amostras gravadas em {args.directory}")
+
+
+if __name__ == '__main__':
+    main()
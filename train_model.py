@@ -1,30 +1,34 @@
 from builtins import Exception, input, print, str
-import pandas as pd
 from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report
-import joblib
+from compiled_forest import save_model
+from features import FeatureConfig, attach_config, training_windows
+from ingestion import ingest, load_dataset
+from training import ForestTrainer
 
 def train_model(input_csvs, output_model='trained_model.pkl'):
     try:
-        dataframes = [pd.read_csv(csv_file) for csv_file in input_csvs]
-        df = pd.concat(dataframes)
-
-        X = df[['IR', 'BPM', 'Avg_BPM', 'GSR']]
-        y = df['Label']
+        report = ingest(input_csvs)
+        for path, message in report.errors:
+            print(f"Arquivo ignorado: {path}: {message}")
+        print(report.summary())
+        dataframes = [load_dataset(path, digest) for path, digest in report.files]
+        config = FeatureConfig()
+        X, y = training_windows(dataframes, config)
 
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        model = RandomForestClassifier(n_estimators=100, random_state=42)
-        model.fit(X_train, y_train)
+        trainer = ForestTrainer(on_progress=lambda percent: print(f"Treinamento: {percent}%"))
+        model = attach_config(trainer.fit(X_train, y_train), config)
+        print(trainer.report(model))
         
         predictions = model.predict(X_test)
         print(classification_report(y_test, predictions))
 
-        joblib.dump(model, output_model)
+        save_model(model, output_model)
         print(f"Modelo salvo em {output_model}")
     except Exception as e:
         print(f"Erro durante o treinamento do modelo: {str(e)}")
 
 if __name__ == "__main__":
-    input_csvs = input("Digite os arquivos CSV separados por vírgula: ").split(',')
+    input_csvs = [entry.strip() for entry in input("Digite os arquivos CSV, pastas ou padrões (ex.: dados/*.csv) separados por vírgula: ").split(",")]
     train_model(input_csvs)
@@ -0,0 +1,190 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import load
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
+from sklearn.tree._tree import Tree
+
+from dataset_cache import load_csv
+from features import FEATURE_NAMES, SENSOR_COLUMNS, attach_config, training_windows
+from session_log import SESSION_EXTENSION, SessionReader
+
+N_ESTIMATORS = 100
+TREES_PER_CHUNK = 10
+# Treino incremental: árvores acrescentadas por rodada, limite da floresta e
+# tamanho da amostra de janelas antigas reaproveitada em cada rodada.
+INCREMENTAL_TREES = 20
+MAX_TREES = 300
+REPLAY_SAMPLES = 20000
+
+
+class ForestTrainer:
+    """Treina um RandomForestClassifier em blocos de árvores, usando todos os núcleos.
+
+    A floresta cresce com `warm_start` de `trees_per_chunk` em
+    `trees_per_chunk` árvores, cada bloco construído em paralelo (`n_jobs`).
+    Entre blocos `on_progress(percentual)` é chamado e `cancel()` é
+    verificado; ao cancelar, `fit` devolve a floresta parcial (ou None se
+    nenhum bloco terminou). O resultado é o mesmo de um único `fit` com
+    `n_estimators` árvores e o mesmo `random_state`. `params` são repassados
+    ao RandomForestClassifier (max_depth, min_samples_leaf...).
+    """
+
+    def __init__(self, n_estimators=N_ESTIMATORS, trees_per_chunk=TREES_PER_CHUNK, n_jobs=-1,
+                 random_state=42, on_progress=None, params=None):
+        self.n_estimators = n_estimators
+        self.trees_per_chunk = trees_per_chunk
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.on_progress = on_progress
+        self.params = params or {}
+        self.cancelled = threading.Event()
+        self.chunk_seconds = []
+        self.seconds = 0.0
+
+    def cancel(self):
+        self.cancelled.set()
+
+    @property
+    def cores(self):
+        return os.cpu_count() if self.n_jobs in (None, -1) else self.n_jobs
+
+    def fit(self, X, y, sample_weight=None):
+        model = RandomForestClassifier(n_estimators=0, warm_start=True, n_jobs=self.n_jobs,
+                                       random_state=self.random_state, **self.params)
+        start = time.perf_counter()
+        while model.n_estimators < self.n_estimators and not self.cancelled.is_set():
+            chunk_start = time.perf_counter()
+            model.n_estimators = min(model.n_estimators + self.trees_per_chunk, self.n_estimators)
+            model.fit(X, y, sample_weight=sample_weight)
+            self.chunk_seconds.append(time.perf_counter() - chunk_start)
+            if self.on_progress:
+                self.on_progress(100 * model.n_estimators // self.n_estimators)
+        self.seconds = time.perf_counter() - start
+        return model if self.chunk_seconds else None
+
+    def report(self, model):
+        trees = len(model.estimators_) if model is not None else 0
+        return f"{trees} árvores em {self.seconds:.1f} s usando {self.cores} núcleo(s)"
+
+
+def unseen_files(model, files):
+    """Arquivos (caminho, digest) de `files` ainda não usados no treino de `model`."""
+    seen = {session['digest'] for session in getattr(model, 'sessions_seen_', [])}
+    return [(path, digest) for path, digest in files if digest not in seen]
+
+
+def _expand_classes(tree, index, n_classes):
+    # As árvores de uma floresta guardam as classes como índices de classes_ da floresta.
+    state = tree.tree_.__getstate__()
+    values = np.zeros(state['values'].shape[:2] + (n_classes,))
+    values[:, :, index] = state['values']
+    state['values'] = values
+    expanded = Tree(tree.n_features_in_, np.array([n_classes], dtype=np.intp), tree.n_outputs_)
+    expanded.__setstate__(state)
+    tree.tree_ = expanded
+    tree.classes_ = np.arange(n_classes, dtype=np.float64)
+    tree.n_classes_ = n_classes
+
+
+def merge_forests(model, extra, max_trees=MAX_TREES):
+    """Acrescenta as árvores de `extra` a `model`, unindo as classes das duas florestas.
+
+    Se o total passar de `max_trees`, as árvores mais antigas são descartadas.
+    """
+    classes = np.union1d(model.classes_, extra.classes_)
+    for forest in (model, extra):
+        if len(forest.classes_) != len(classes):
+            index = np.searchsorted(classes, forest.classes_)
+            for tree in forest.estimators_:
+                _expand_classes(tree, index, len(classes))
+    model.estimators_ = (model.estimators_ + extra.estimators_)[-max_trees:]
+    model.n_estimators = len(model.estimators_)
+    model.classes_ = classes
+    model.n_classes_ = len(classes)
+    return model
+
+
+def update_history(model, previous, X, y, sessions, version=None, seed=0):
+    """Registra no modelo a versão, as sessões vistas e uma amostra das janelas de treino.
+
+    `previous` é o modelo cujo histórico é continuado (None num treino do
+    zero). A amostra (`replay_X_`, `replay_y_`) tem no máximo REPLAY_SAMPLES
+    janelas escolhidas uniformemente entre todas as já vistas, e é misturada
+    aos dados novos no próximo treino incremental.
+    """
+    version = version or getattr(previous, 'model_version_', 0) + 1
+    rng = np.random.default_rng(seed + version)
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y)
+    old_seen = getattr(previous, 'windows_seen_', 0)
+    total = old_seen + len(X)
+    keep = min(REPLAY_SAMPLES, total)
+    from_new = min(len(X), rng.binomial(keep, len(X) / total)) if total else 0
+    from_old = min(keep - from_new, len(getattr(previous, 'replay_y_', [])))
+    new_rows = rng.choice(len(X), from_new, replace=False)
+    if from_old:
+        old_rows = rng.choice(len(previous.replay_y_), from_old, replace=False)
+        model.replay_X_ = np.concatenate((previous.replay_X_[old_rows], X[new_rows]))
+        model.replay_y_ = np.concatenate((previous.replay_y_[old_rows], y[new_rows]))
+    else:
+        model.replay_X_, model.replay_y_ = X[new_rows], y[new_rows]
+    model.windows_seen_ = total
+    model.model_version_ = version
+    model.sessions_seen_ = list(getattr(previous, 'sessions_seen_', [])) + [
+        {'file': os.path.basename(path), 'digest': digest, 'windows': windows, 'version': model.model_version_}
+        for path, digest, windows in sessions
+    ]
+    return model
+
+
+def read_training_file(path, digest=None):
+    """Dados de treino de uma sessão gravada ou de um CSV (pelo cache de `dataset_cache`)."""
+    if path.endswith(SESSION_EXTENSION):
+        return SessionReader(path).to_dataframe(['source', 'participant'] + SENSOR_COLUMNS)
+    return load_csv(path, digest)
+
+
+def can_extend(model, config):
+    return model is not None and getattr(model, 'feature_config_', None) == config.to_dict() and hasattr(model, 'replay_y_')
+
+
+def train_sessions(trainer, sessions, config, previous=None, incremental=False):
+    """Treina com `sessions` [(caminho, digest, DataFrame)] e devolve o modelo (None se cancelado sem árvores).
+
+    No modo incremental, `previous` ganha INCREMENTAL_TREES árvores treinadas
+    só com as janelas novas mais a amostra de janelas antigas guardada no
+    modelo; o custo depende do tamanho dos dados novos, não do acervo todo.
+    Se os dados novos trazem uma classe que o modelo não conhece, as árvores
+    antigas nunca votariam nela: a floresta é refeita do zero com as janelas
+    novas mais a amostra guardada, que também tem tamanho limitado.
+    """
+    windows = [training_windows([df], config) for _, _, df in sessions]
+    X = pd.concat([X for X, _ in windows], ignore_index=True)
+    y = np.concatenate([y for _, y in windows])
+    records = [(path, digest, len(y)) for (path, digest, _), (_, y) in zip(sessions, windows)]
+    if incremental:
+        new_classes = np.setdiff1d(y, previous.classes_).size > 0
+        if not new_classes:
+            trainer.n_estimators = INCREMENTAL_TREES
+        replay = pd.DataFrame(previous.replay_X_, columns=FEATURE_NAMES)
+        extra = trainer.fit(pd.concat([X, replay], ignore_index=True), np.concatenate([y, previous.replay_y_]))
+        if extra is None:
+            return None
+        model = extra if new_classes else merge_forests(previous, extra)
+        update_history(model, previous, X, y, records)
+    else:
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        model = trainer.fit(X_train, y_train)
+        if model is None:
+            return None
+        update_history(model, None, X, y, records, getattr(previous, 'model_version_', 0) + 1)
+    return attach_config(model, config)
+
+
+def load_previous_model(path='trained_model.joblib'):
+    return load(path) if os.path.exists(path) else None
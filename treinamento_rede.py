@@ -1,37 +1,60 @@
-from builtins import Exception, range, str, super
+from builtins import Exception, str, super
 import sys
-import pandas as pd
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QPushButton, QLabel, QFileDialog, QTextEdit
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QPushButton, QLabel, QFileDialog, QCheckBox, QProgressBar, QListWidget, QLineEdit
 from PyQt5.QtCore import QThread, pyqtSignal
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from joblib import dump
+from compiled_forest import save_model
+from features import FeatureConfig
+from ingestion import ingest, load_dataset
+from training import ForestTrainer, can_extend, load_previous_model, train_sessions, unseen_files
+from ui_updates import LogOutput
 
 class TrainingThread(QThread):
     log_signal = pyqtSignal(str)
+    progress_signal = pyqtSignal(int)
 
-    def __init__(self, file_paths):
+    def __init__(self, entries, keep_partial=True, incremental=False):
         super().__init__()
-        self.file_paths = file_paths
+        self.entries = entries
+        self.keep_partial = keep_partial
+        self.incremental = incremental
+        self.trainer = ForestTrainer(on_progress=self.progress_signal.emit)
+
+    def cancel(self):
+        self.trainer.cancel()
 
     def run(self):
         try:
-            dfs = []
-            for file_path in self.file_paths:
-                if file_path:
-                    df = pd.read_csv(file_path)
-                    if 'Content' not in df.columns:
-                        self.log_signal.emit(f"Erro: o arquivo {file_path} não contém a coluna 'Content'.")
-                        return
-                    dfs.append(df)
-            data = pd.concat(dfs, ignore_index=True)
-            X = data[['irValue', 'beatsPerMinute', 'beatAvg', 'GSR']]
-            y = data['Content']
-            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-            model = RandomForestClassifier(n_estimators=100, random_state=42)
-            model.fit(X_train, y_train)
-            dump(model, 'trained_model.joblib')
-            self.log_signal.emit("Treinamento concluído e modelo salvo como 'trained_model.joblib'.")
+            config = FeatureConfig()
+            previous = load_previous_model()
+            incremental = self.incremental and can_extend(previous, config)
+            if self.incremental and not incremental:
+                self.log_signal.emit("O modelo atual não permite treino incremental; treinando do zero.")
+            self.log_signal.emit("Lendo os arquivos de dados...")
+            report = ingest(self.entries, on_progress=self.progress_signal.emit, cancelled=self.trainer.cancelled)
+            for path, message in report.errors:
+                self.log_signal.emit(f"Arquivo ignorado: {path}: {message}")
+            for path, message in report.warnings:
+                self.log_signal.emit(f"Aviso: {path}: {message}")
+            self.log_signal.emit(report.summary())
+            if self.trainer.cancelled.is_set():
+                self.log_signal.emit("Treinamento cancelado; nenhum modelo foi salvo.")
+                return
+            files = unseen_files(previous, report.files) if incremental else report.files
+            if len(files) < len(report.files):
+                self.log_signal.emit(f"{len(report.files) - len(files)} arquivo(s) já usado(s) pelo modelo atual ignorado(s).")
+            if not files:
+                self.log_signal.emit("Nenhuma sessão nova para treinar.")
+                return
+            sessions = [(path, digest, load_dataset(path, digest)) for path, digest in files]
+            model = train_sessions(self.trainer, sessions, config, previous, incremental)
+            if not self.trainer.cancelled.is_set():
+                save_model(model)
+                self.log_signal.emit(f"Treinamento concluído e modelo salvo como 'trained_model.joblib' (versão {model.model_version_}, {self.trainer.report(model)}).")
+            elif model is not None and self.keep_partial:
+                save_model(model)
+                self.log_signal.emit(f"Treinamento cancelado; modelo parcial salvo como 'trained_model.joblib' (versão {model.model_version_}, {self.trainer.report(model)}).")
+            else:
+                self.log_signal.emit("Treinamento cancelado; nenhum modelo foi salvo.")
         except Exception as e:
             self.log_signal.emit(f"Erro durante o treinamento: {str(e)}")
 
@@ -43,47 +66,109 @@ class MainWindow(QWidget):
     def initUI(self):
         layout = QVBoxLayout()
 
-        self.import_buttons = []
-        for i in range(5):
-            import_button = QPushButton(f'Selecionar arquivo CSV {i+1}', self)
-            import_button.clicked.connect(lambda _, x=i: self.import_csv(x))
-            layout.addWidget(import_button)
-            self.import_buttons.append(import_button)
+        self.entries_list = QListWidget(self)
+        layout.addWidget(self.entries_list)
+
+        self.add_files_button = QPushButton('Adicionar arquivos CSV ou sessões', self)
+        self.add_files_button.clicked.connect(self.add_files)
+        layout.addWidget(self.add_files_button)
+
+        self.add_folder_button = QPushButton('Adicionar pasta', self)
+        self.add_folder_button.clicked.connect(self.add_folder)
+        layout.addWidget(self.add_folder_button)
+
+        self.pattern_input = QLineEdit(self)
+        self.pattern_input.setPlaceholderText('Padrão de arquivos, ex.: dados/**/*.csv')
+        self.pattern_input.returnPressed.connect(self.add_pattern)
+        layout.addWidget(self.pattern_input)
+
+        self.add_pattern_button = QPushButton('Adicionar padrão', self)
+        self.add_pattern_button.clicked.connect(self.add_pattern)
+        layout.addWidget(self.add_pattern_button)
+
+        self.clear_entries_button = QPushButton('Limpar lista', self)
+        self.clear_entries_button.clicked.connect(self.clear_entries)
+        layout.addWidget(self.clear_entries_button)
 
         self.train_button = QPushButton('Treinar Modelo', self)
         self.train_button.clicked.connect(self.train_model)
         layout.addWidget(self.train_button)
 
-        self.output = QTextEdit(self)
-        self.output.setReadOnly(True)
+        self.incremental_check = QCheckBox('Treino incremental (acrescentar sessões novas ao modelo atual)', self)
+        layout.addWidget(self.incremental_check)
+
+        self.keep_partial_check = QCheckBox('Manter modelo parcial ao cancelar', self)
+        self.keep_partial_check.setChecked(True)
+        layout.addWidget(self.keep_partial_check)
+
+        self.cancel_button = QPushButton('Cancelar Treinamento', self)
+        self.cancel_button.clicked.connect(self.cancel_training)
+        self.cancel_button.setEnabled(False)
+        layout.addWidget(self.cancel_button)
+
+        self.train_progress_bar = QProgressBar(self)
+        layout.addWidget(self.train_progress_bar)
+
+        self.output = LogOutput(self)
         layout.addWidget(self.output)
 
         self.setLayout(layout)
         self.setWindowTitle('Treinamento da Rede')
         self.show()
 
-        self.file_paths = [None] * 5
+        self.entries = []
 
-    def import_csv(self, index):
+    def add_files(self):
         options = QFileDialog.Options()
-        file_path, _ = QFileDialog.getOpenFileName(self, "Selecionar arquivo CSV", "", "CSV Files (*.csv);;All Files (*)", options=options)
-        if file_path:
-            self.file_paths[index] = file_path
-            self.output.append(f"Arquivo {index+1} selecionado: {file_path}")
+        file_paths, _ = QFileDialog.getOpenFileNames(self, "Selecionar arquivos de dados", "", "CSV ou Sessões MindTV (*.csv *.mtv);;All Files (*)", options=options)
+        for file_path in file_paths:
+            self.add_entry(file_path)
+
+    def add_folder(self):
+        directory = QFileDialog.getExistingDirectory(self, "Selecionar pasta com arquivos de dados")
+        if directory:
+            self.add_entry(directory)
+
+    def add_pattern(self):
+        pattern = self.pattern_input.text().strip()
+        if pattern:
+            self.add_entry(pattern)
+            self.pattern_input.clear()
+
+    def add_entry(self, entry):
+        if entry not in self.entries:
+            self.entries.append(entry)
+            self.entries_list.addItem(entry)
+
+    def clear_entries(self):
+        self.entries.clear()
+        self.entries_list.clear()
 
     def train_model(self):
-        if not self.file_paths[0]:
-            self.output.append("Erro: pelo menos um arquivo CSV deve ser selecionado.")
+        if not self.entries:
+            self.output.append("Erro: selecione pelo menos um arquivo, pasta ou padrão de arquivos.")
             return
         self.output.append("Iniciando o treinamento do modelo...")
         self.train_button.setEnabled(False)
-        self.training_thread = TrainingThread(self.file_paths)
+        self.cancel_button.setEnabled(True)
+        self.train_progress_bar.setValue(0)
+        self.training_thread = TrainingThread(self.entries, self.keep_partial_check.isChecked(), self.incremental_check.isChecked())
         self.training_thread.log_signal.connect(self.log_output)
+        self.training_thread.progress_signal.connect(self.train_progress_bar.setValue)
+        self.training_thread.finished.connect(self.training_finished)
         self.training_thread.start()
 
+    def cancel_training(self):
+        self.training_thread.cancel()
+        self.cancel_button.setEnabled(False)
+        self.output.append("Cancelando o treinamento após o bloco de árvores atual...")
+
+    def training_finished(self):
+        self.train_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+
     def log_output(self, message):
         self.output.append(message)
-        self.train_button.setEnabled(True)
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import deque
+
+from PyQt5.QtWidgets import QPlainTextEdit
+
+LOG_MAX_LINES = 5000
+UI_REFRESH_HZ = 20
+
+
+class LogOutput(QPlainTextEdit):
+    """Área de log somente leitura que mantém apenas as últimas `max_lines` linhas."""
+
+    def __init__(self, parent=None, max_lines=LOG_MAX_LINES):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setMaximumBlockCount(max_lines)
+
+    def append(self, text):
+        self.appendPlainText(text)
+
+
+class UiThrottle:
+    """Agrupa logs e progresso na thread de trabalho e os envia à interface em lotes.
+
+    `log` e `progress` são chamáveis (normalmente `sinal.emit`). Mensagens são
+    enviadas no máximo `rate` vezes por segundo, como um único texto com várias
+    linhas, e o progresso só é enviado quando o percentual muda. `log` e
+    `log_many` podem ser chamados de outras threads.
+    """
+
+    def __init__(self, log, progress=None, rate=UI_REFRESH_HZ, max_pending=LOG_MAX_LINES):
+        self.emit_log = log
+        self.emit_progress = progress
+        self.interval = 1.0 / rate
+        self.pending = deque(maxlen=max_pending)
+        self.lock = threading.Lock()
+        self.progress = None
+        self.sent_progress = None
+        self.last_flush = time.monotonic()
+
+    def log(self, message):
+        with self.lock:
+            self.pending.append(message)
+
+    def log_many(self, messages):
+        with self.lock:
+            self.pending.extend(messages)
+
+    def set_progress(self, value):
+        self.progress = int(value)
+
+    def poll(self):
+        if time.monotonic() - self.last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        with self.lock:
+            text = '\n'.join(self.pending)
+            self.pending.clear()
+        if text:
+            self.emit_log(text)
+        if self.emit_progress and self.progress is not None and self.progress != self.sent_progress:
+            self.sent_progress = self.progress
+            self.emit_progress(self.progress)